@@ -0,0 +1,226 @@
+"""
+Micro-benchmarks das funções puras executadas a cada turno/lembrete.
+
+Cobre a grade de horários, a checagem de sobreposição, a busca de disponibilidade
+(sobre o Calendar em memória de benchmarks/loadtest, sem latência) com agendas
+esparsas, densas e lotadas, o reset de sessão com históricos de tamanhos variados,
+o parse do resumo dos eventos nos lembretes e a formatação de `get_user_data`.
+
+O resultado pode ser salvo como baseline JSON e comparado em execuções futuras
+(mesma máquina/Python para números comparáveis).
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_hot_paths [--repeticoes 5] [--filtro is_slot_busy]
+        [--salvar baseline_hot_paths.json] [--comparar baseline_hot_paths.json --tolerancia 0.10]
+"""
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+from benchmarks.loadtest.fakes import CalendarFalso, Latencia, proximo_dia_util
+
+RAIZ = Path(__file__).resolve().parents[1]
+BASELINE_VERSAO = 1
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DADOS SINTÉTICOS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Agendas por dia (horário de Brasília): nenhuma, poucas e muitas marcações
+# (blocos de 20 min até as 18h, livres só 18:00 e 19:00), e dia inteiro ocupado
+AGENDAS = {
+    "vazia": (),
+    "esparsa": (("12:00", "13:00"),),
+    "densa": tuple(
+        (f"{h:02d}:{m:02d}", f"{h:02d}:{m + 20:02d}") for h in range(7, 18) for m in (0, 30)
+    ),
+    "lotada": (("07:00", "20:00"),),
+}
+
+def _blocos_do_dia(dia: str, agenda: str) -> list:
+    return [{"start": f"{dia}T{ini}:00-03:00", "end": f"{dia}T{fim}:00-03:00"} for ini, fim in AGENDAS[agenda]]
+
+def _calendar(agenda: str) -> CalendarFalso:
+    calendar = CalendarFalso(Latencia(0))
+    calendar.BLOCOS_OCUPADOS = AGENDAS[agenda]
+    return calendar
+
+def _historico(linhas: int) -> str:
+    """Histórico no formato do Redis ("[User]: ..." / "[Bot]: ..."), do mais novo ao mais antigo."""
+    falas = []
+    for i in range(linhas):
+        if i % 2 == 0:
+            falas.append(f"[Bot]: Claro! Os horários disponíveis são 09:00, 10:00 e 14:00. (turno {i})")
+        else:
+            falas.append(f"[User]: Quero cancelar e começar de novo, turno {i}")
+    return "\n".join(falas)
+
+RESUMOS_EVENTO = {
+    "valido": "CONSUL Nome:Maria Aparecida da Silva - Cliente ID:5511999999999@c.us",
+    "fora_do_padrao": "Reunião interna da equipe de atendimento - sala 2",
+}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CASOS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _casos_agenda(casos: dict):
+    from services.service_api_calendar import (
+        ServicesCalendar,
+        buscar_disponibilidade_escalonada,
+        gerar_horarios_disponiveis,
+        is_slot_busy,
+    )
+
+    dia = proximo_dia_util().isoformat()
+    casos["gerar_horarios_disponiveis"] = gerar_horarios_disponiveis
+
+    for agenda in ("esparsa", "densa"):
+        blocos = _blocos_do_dia(dia, agenda)
+        casos[f"is_slot_busy[{agenda}]"] = lambda b=blocos: is_slot_busy("19:00", b, dia, 60)
+
+    for agenda in ("vazia", "esparsa", "densa"):
+        calendar = _calendar(agenda)
+        casos[f"buscar_horarios_disponiveis[{agenda}]"] = (
+            lambda c=calendar: ServicesCalendar.buscar_horarios_disponiveis(c, dia, 60)
+        )
+
+    # "lotada" percorre as três margens inteiras (4 -> 10 -> 30 dias) sem achar slot
+    for agenda in ("esparsa", "densa", "lotada"):
+        calendar = _calendar(agenda)
+        casos[f"buscar_disponibilidade_escalonada[{agenda}]"] = (
+            lambda c=calendar: buscar_disponibilidade_escalonada(c, limite_slots=3)
+        )
+
+def _casos_reset(casos: dict):
+    from core_ia.services_agents.tool_reset import finalizar_user
+
+    for linhas in (10, 100, 1000):
+        historico = _historico(linhas)
+        casos[f"finalizar_user[{linhas} linhas]"] = lambda h=historico: finalizar_user(h)
+
+def _casos_lembretes(casos: dict):
+    from workers.lembretes.lembrets import extract_phone_and_name
+
+    for nome, resumo in RESUMOS_EVENTO.items():
+        casos[f"extract_phone_and_name[{nome}]"] = lambda r=resumo: extract_phone_and_name(r)
+
+def _casos_formatacao(casos: dict):
+    from django.conf import settings
+    if not settings.configured:
+        settings.configure(USE_TZ=True, TIME_ZONE='America/Sao_Paulo')
+
+    from chatbot_api.formatters import formatar_consultas_ativas, formatar_consultas_futuras
+
+    agora = datetime.now(timezone.utc)
+    usuarios = {
+        "sem_consultas": SimpleNamespace(
+            appointment1_datetime=None, appointment1_gcal_id=None,
+            appointment2_datetime=None, appointment2_gcal_id=None,
+        ),
+        "duas_consultas": SimpleNamespace(
+            appointment1_datetime=agora + timedelta(days=9, hours=3), appointment1_gcal_id="a1b2c3d4e5f6g7h8i9j0",
+            appointment2_datetime=agora + timedelta(days=2), appointment2_gcal_id="q1r2s3t4u5v6w7x8y9z0",
+        ),
+    }
+    for nome, user in usuarios.items():
+        casos[f"formatar_consultas_futuras[{nome}]"] = lambda u=user: formatar_consultas_futuras(u, agora)
+        casos[f"formatar_consultas_ativas[{nome}]"] = lambda u=user: formatar_consultas_ativas(u, agora)
+
+GRUPOS = (
+    ("agenda", _casos_agenda),
+    ("reset de sessão", _casos_reset),
+    ("lembretes", _casos_lembretes),
+    ("formatação get_user_data", _casos_formatacao),
+)
+
+def montar_casos() -> dict:
+    """Monta os casos; um grupo cujas dependências não estão instaladas é pulado com aviso."""
+    casos = {}
+    for nome, montar in GRUPOS:
+        try:
+            montar(casos)
+        except ImportError as e:
+            print(f"⚠️ Grupo '{nome}' pulado: {e}")
+    return casos
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MEDIÇÃO / BASELINE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def medir(funcao, repeticoes: int) -> dict:
+    """µs por chamada: mínimo e mediana de `repeticoes` rodadas calibradas por autorange."""
+    timer = timeit.Timer(funcao)
+    numero, _ = timer.autorange()
+    tempos = [t / numero * 1e6 for t in timer.repeat(repeat=repeticoes, number=numero)]
+    return {"us_min": min(tempos), "us_mediana": statistics.median(tempos), "chamadas_por_rodada": numero}
+
+def comparar(atual: dict, baseline: dict, tolerancia: float) -> int:
+    """Imprime a variação da mediana por caso. :return: número de regressões acima da tolerância."""
+    regressoes = 0
+    print(f"\n== Comparação com baseline ({baseline.get('criado_em', '?')}, tolerância {tolerancia:.0%}) ==")
+    for nome, resultado in atual.items():
+        anterior = baseline.get("casos", {}).get(nome)
+        if anterior is None:
+            print(f"{nome:<48} (novo)")
+            continue
+        variacao = resultado["us_mediana"] / anterior["us_mediana"] - 1
+        marca = ""
+        if variacao > tolerancia:
+            marca = "  ❌ regressão"
+            regressoes += 1
+        elif variacao < -tolerancia:
+            marca = "  ✅ melhora"
+        print(f"{nome:<48} {anterior['us_mediana']:>10.2f} -> {resultado['us_mediana']:>10.2f} µs  {variacao:+7.1%}{marca}")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--filtro', help="mede apenas os casos cujo nome contém o texto")
+    parser.add_argument('--salvar', type=Path, help="grava os resultados como baseline JSON")
+    parser.add_argument('--comparar', type=Path, help="baseline JSON para comparação")
+    parser.add_argument('--tolerancia', type=float, default=0.10, help="variação aceitável da mediana")
+    args = parser.parse_args()
+
+    # O worker importa `core_ia.*` com workers/ no path; a busca escalonada loga a cada margem
+    sys.path.insert(0, str(RAIZ / 'workers'))
+    logging.disable(logging.WARNING)
+
+    casos = montar_casos()
+    if args.filtro:
+        casos = {nome: f for nome, f in casos.items() if args.filtro in nome}
+
+    resultados = {}
+    print(f"{'caso':<48} {'mín (µs)':>10} {'mediana (µs)':>13}")
+    for nome, funcao in casos.items():
+        resultados[nome] = medir(funcao, args.repeticoes)
+        print(f"{nome:<48} {resultados[nome]['us_min']:>10.2f} {resultados[nome]['us_mediana']:>13.2f}")
+
+    if args.salvar:
+        args.salvar.write_text(json.dumps({
+            "versao": BASELINE_VERSAO,
+            "criado_em": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "casos": resultados,
+        }, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\nBaseline gravada em {args.salvar}")
+
+    if args.comparar:
+        baseline = json.loads(args.comparar.read_text(encoding='utf-8'))
+        if baseline.get("versao") != BASELINE_VERSAO:
+            sys.exit(f"Baseline {args.comparar} tem versão {baseline.get('versao')}; esperado {BASELINE_VERSAO}.")
+        if comparar(resultados, baseline, args.tolerancia):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
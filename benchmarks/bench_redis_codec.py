@@ -0,0 +1,85 @@
+"""
+Micro-benchmark do codec de valores do Redis (services/redis_codec.py).
+
+Compara tamanho do payload e CPU de encode/decode entre o formato antigo
+(json.dumps / str(value) por campo) e os codecs disponíveis (JSON compacto e msgpack).
+Não precisa de Redis: mede apenas a serialização do caminho por mensagem.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.bench_redis_codec [--iteracoes 50000]
+"""
+
+import argparse
+import json
+import timeit
+
+from services.redis_codec import (
+    CODEC_JSON,
+    CODEC_MSGPACK,
+    SCHEMA_PERFIL,
+    codificar,
+    decodificar,
+    codificar_campo_sessao,
+    decodificar_campo_sessao,
+    msgpack,
+)
+
+PERFIL_EXEMPLO = {
+    "status": "SUCCESS",
+    "chat_id": "5511999999999@c.us",
+    "username": "Maria da Silva",
+    "appointments": [
+        {
+            "appointment_number": 1,
+            "data": "21/10/2026",
+            "hora": "14:00",
+            "slot": 1,
+            "gcal_id": "a1b2c3d4e5f6g7h8i9j0klmnop",
+            "datetime_iso": "2026-10-21T17:00:00+00:00",
+        },
+        {
+            "appointment_number": 2,
+            "data": "28/10/2026",
+            "hora": "09:00",
+            "slot": 2,
+            "gcal_id": "q1r2s3t4u5v6w7x8y9z0abcdef",
+            "datetime_iso": "2026-10-28T12:00:00+00:00",
+        },
+    ],
+}
+
+SESSAO_EXEMPLO = {"registration_step": "AGENT_DATE_CONFIRM", "tentativas": 2}
+
+def _medir(nome: str, encode, decode, iteracoes: int):
+    bruto = encode()
+    tamanho = sum(len(v) for v in bruto.values()) if isinstance(bruto, dict) else len(bruto)
+    t_enc = timeit.timeit(encode, number=iteracoes) / iteracoes * 1e6
+    t_dec = timeit.timeit(lambda: decode(bruto), number=iteracoes) / iteracoes * 1e6
+    print(f"{nome:<28} {tamanho:>6} B   encode {t_enc:7.2f} µs   decode {t_dec:7.2f} µs")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iteracoes', type=int, default=50000)
+    args = parser.parse_args()
+    n = args.iteracoes
+
+    print(f"== Perfil de usuário (cache:user_profile:*) — {n} iterações ==")
+    _medir("legado json.dumps", lambda: json.dumps(PERFIL_EXEMPLO).encode('utf-8'), json.loads, n)
+    _medir("codec JSON compacto", lambda: codificar(PERFIL_EXEMPLO, SCHEMA_PERFIL, CODEC_JSON),
+           lambda b: decodificar(b, SCHEMA_PERFIL), n)
+    if msgpack is not None:
+        _medir("codec msgpack", lambda: codificar(PERFIL_EXEMPLO, SCHEMA_PERFIL, CODEC_MSGPACK),
+               lambda b: decodificar(b, SCHEMA_PERFIL), n)
+    else:
+        print("codec msgpack                (msgpack não instalado)")
+
+    print(f"\n== Estado de sessão (session:*) — {n} iterações ==")
+    _medir("legado str(value)",
+           lambda: {k: str(v).encode('utf-8') for k, v in SESSAO_EXEMPLO.items()},
+           lambda d: {k: v.decode('utf-8') for k, v in d.items()}, n)
+    _medir("campos tipados",
+           lambda: {k: codificar_campo_sessao(v) for k, v in SESSAO_EXEMPLO.items()},
+           lambda d: {k: decodificar_campo_sessao(v) for k, v in d.items()}, n)
+
+if __name__ == '__main__':
+    main()
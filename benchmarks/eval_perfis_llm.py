@@ -0,0 +1,149 @@
+"""
+Avaliação offline dos perfis de LLM do roteador (workers/core_ia/services_agents/llm_profiles.py).
+
+Reproduz a chamada do Agent_router (mesmo prompt e interpretação do perfil) sobre um
+conjunto rotulado de históricos e compara, por variante de perfil: acurácia, rótulos
+inválidos (saída fora de ROTAS_ROUTER antes da normalização), latência p50/p95 e
+tokens de saída. Não usa Redis, WAHA nem BaaS; só a API do Groq.
+
+Uso (na raiz do projeto, com GROQ_API_KEY):
+    python -m benchmarks.eval_perfis_llm \\
+        --modelos llama-3.1-8b-instant,llama-3.3-70b-versatile [--max-tokens 16] \\
+        [--dados benchmarks/dados/roteamento_rotulado.jsonl] [--repeticoes 1] [--saida relatorio.json]
+
+    --falso: roda contra o Groq falso de benchmarks/loadtest (valida o harness, sem custo).
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from benchmarks.loadtest.fakes import GroqFalso, Latencia
+
+RAIZ = Path(__file__).resolve().parents[1]
+DADOS_PADRAO = Path(__file__).with_name('dados') / 'roteamento_rotulado.jsonl'
+
+def carregar_amostras(caminho: Path) -> list[dict]:
+    """:return: [{"historico", "esperado"}] na ordem do arquivo JSON Lines."""
+    with open(caminho, encoding='utf-8') as f:
+        amostras = [json.loads(linha) for linha in f if linha.strip()]
+    if not amostras:
+        raise ValueError(f"Nenhuma amostra em {caminho}")
+    return amostras
+
+def percentil(valores: list[float], p: float) -> float:
+    """Percentil por posição mais próxima (nearest-rank)."""
+    if not valores:
+        return float('nan')
+    ordenados = sorted(valores)
+    return ordenados[max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))]
+
+def avaliar_perfil(client, perfil, prompt: str, amostras: list[dict], repeticoes: int = 1) -> dict:
+    latencias_ms, tokens_saida = [], []
+    acertos = invalidos = erros = 0
+    confusao = defaultdict(Counter)
+
+    for _ in range(repeticoes):
+        for amostra in amostras:
+            mensagens = [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": amostra['historico']},
+            ]
+            inicio = time.perf_counter()
+            try:
+                resposta = client.chat.completions.create(messages=mensagens, **perfil.parametros())
+            except Exception as e:
+                erros += 1
+                print(f"  ⚠️ {perfil.nome}: {type(e).__name__}: {e}", file=sys.stderr)
+                continue
+            latencias_ms.append((time.perf_counter() - inicio) * 1000)
+
+            bruto = resposta.choices[0].message.content
+            uso = getattr(resposta, 'usage', None)
+            if uso is not None and uso.completion_tokens is not None:
+                tokens_saida.append(uso.completion_tokens)
+
+            rotulo = perfil.interpretar(bruto)
+            invalidos += (bruto or '').strip() not in perfil.opcoes
+            acertos += rotulo == amostra['esperado']
+            confusao[amostra['esperado']][rotulo] += 1
+
+    total = len(amostras) * repeticoes
+    return {
+        "perfil": perfil.nome,
+        "modelo": perfil.modelo,
+        "max_tokens": perfil.max_tokens,
+        "amostras": total,
+        "acuracia": round(acertos / total, 4) if total else None,
+        "rotulos_invalidos": invalidos,
+        "erros": erros,
+        "latencia_p50_ms": round(percentil(latencias_ms, 50), 1),
+        "latencia_p95_ms": round(percentil(latencias_ms, 95), 1),
+        "tokens_saida_medio": round(sum(tokens_saida) / len(tokens_saida), 1) if tokens_saida else None,
+        "confusao": {esperado: dict(obtidos) for esperado, obtidos in confusao.items()},
+    }
+
+def imprimir(resultados: list[dict]):
+    print(f"{'perfil':<40} {'acurácia':>8} {'inválidos':>9} {'erros':>5} {'p50 ms':>8} {'p95 ms':>8} {'tokens':>6}")
+    for r in resultados:
+        acuracia = f"{r['acuracia'] * 100:.1f}%" if r['acuracia'] is not None else '-'
+        print(f"{r['perfil']:<40} {acuracia:>8} {r['rotulos_invalidos']:>9} {r['erros']:>5} "
+              f"{r['latencia_p50_ms']:>8} {r['latencia_p95_ms']:>8} {r['tokens_saida_medio'] or '-':>6}")
+    for r in resultados:
+        erros_rotulo = {
+            esperado: {obtido: n for obtido, n in obtidos.items() if obtido != esperado}
+            for esperado, obtidos in r['confusao'].items()
+        }
+        erros_rotulo = {k: v for k, v in erros_rotulo.items() if v}
+        if erros_rotulo:
+            print(f"\n-- {r['perfil']}: classificações erradas (esperado -> obtido) --")
+            for esperado, obtidos in erros_rotulo.items():
+                print(f"  {esperado} -> {obtidos}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Avaliação offline dos perfis de LLM do roteador.")
+    parser.add_argument('--dados', type=Path, default=DADOS_PADRAO)
+    parser.add_argument('--modelos', default='', help="Modelos a comparar (vírgula). Padrão: o do perfil 'router'.")
+    parser.add_argument('--max-tokens', type=int, default=None)
+    parser.add_argument('--repeticoes', type=int, default=1)
+    parser.add_argument('--saida', type=Path, default=None, help="Grava os resultados em JSON")
+    parser.add_argument('--falso', action='store_true', help="Usa o Groq falso local em vez da API")
+    args = parser.parse_args()
+
+    groq_falso = None
+    if args.falso:
+        groq_falso = GroqFalso(Latencia(media_ms=5, seed=1))
+        os.environ['GROQ_BASE_URL'] = groq_falso.iniciar()
+        os.environ.setdefault('GROQ_API_KEY', 'avaliacao')
+
+    sys.path.insert(0, str(RAIZ / 'workers'))
+    from groq import Groq
+    from core_ia.services_agents.llm_profiles import perfil
+    from core_ia.services_agents.prompts_agents import prompt_router
+
+    base = perfil('router')
+    if args.max_tokens:
+        base = base.com(max_tokens=args.max_tokens)
+    modelos = [m.strip() for m in args.modelos.split(',') if m.strip()] or [base.modelo]
+    variantes = [base.com(modelo=m, nome=f"router[{m}]") for m in modelos]
+
+    amostras = carregar_amostras(args.dados)
+    client = Groq(api_key=os.environ.get('GROQ_API_KEY'))
+    try:
+        resultados = [avaliar_perfil(client, v, prompt_router, amostras, args.repeticoes) for v in variantes]
+    finally:
+        if groq_falso is not None:
+            groq_falso.parar()
+
+    imprimir(resultados)
+    if args.saida:
+        args.saida.write_text(json.dumps(resultados, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"\nResultados gravados em {args.saida}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+"""
+Harness de carga determinístico do pipeline (fila -> WhatsAppWorker -> resposta).
+
+Groq, WAHA e o BaaS Django são substituídos por servidores HTTP locais (fakes.py);
+o Google Calendar, por um objeto em memória com a mesma interface do cliente
+googleapiclient. Apenas o Redis é real.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.loadtest --taxa 20 --mensagens 500 --workers 4
+"""
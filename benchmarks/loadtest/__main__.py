@@ -0,0 +1,257 @@
+"""
+Replay de payloads na fila new_user_queue contra o WhatsAppWorker real, com Groq,
+WAHA, BaaS e Google Calendar falsos (benchmarks/loadtest/fakes.py).
+
+Mede, por mensagem, o tempo ponta a ponta entre o enfileiramento (received_at do
+envelope) e o fim do processamento no worker, e reporta p50/p95/p99 e vazão.
+
+Requer apenas um Redis acessível (REDIS_HOST/REDIS_PORT); por padrão usa os bancos
+15 (fila/sessões) e 14 (idempotência) para não tocar nos dados do ambiente.
+
+Uso (na raiz do projeto):
+    python -m benchmarks.loadtest --taxa 20 --mensagens 500 --workers 4 \\
+        [--payloads benchmarks/loadtest/payloads_exemplo.jsonl] [--saida relatorio.json]
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from itertools import cycle
+from pathlib import Path
+
+from benchmarks.loadtest.fakes import BaasFalso, CalendarFalso, GroqFalso, Latencia, WahaFalso
+
+RAIZ = Path(__file__).resolve().parents[2]
+PAYLOADS_PADRAO = Path(__file__).with_name('payloads_exemplo.jsonl')
+QUEUE_NAME = "new_user_queue"
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PAYLOADS (webhook WAHA gravado ou {"from", "body"}) -> ENVELOPE v1 DO GATEWAY
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def carregar_textos(caminho: Path) -> list[tuple[str, str]]:
+    """:return: [(body, type)] na ordem do arquivo JSON Lines."""
+    textos = []
+    with open(caminho, encoding='utf-8') as f:
+        for linha in f:
+            linha = linha.strip()
+            if not linha:
+                continue
+            item = json.loads(linha)
+            mensagem = item.get('payload') or item
+            tipo = (mensagem.get('_data') or {}).get('type') or item.get('type') or 'chat'
+            textos.append((mensagem.get('body') or '', tipo))
+    if not textos:
+        raise ValueError(f"Nenhum payload em {caminho}")
+    return textos
+
+def montar_envelope(execucao: str, indice: int, chat_id: str, body: str, tipo: str) -> bytes:
+    """Mesmo formato publicado pelo gateway (go_gateway/services/envelope), sem carimbo."""
+    agora_ms = int(time.time() * 1000)
+    return json.dumps({
+        "v": 1,
+        "event_id": f"evt-{execucao}-{indice}",
+        "message_id": f"carga-{execucao}-{indice}",
+        "from": chat_id,
+        "body": body,
+        "type": tipo,
+        "timestamp": agora_ms // 1000,
+        "received_at": agora_ms,
+    }).encode('utf-8')
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MEDIÇÃO
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class Registro:
+    """Latências (ms) por mensagem concluída, coletadas pelos workers."""
+
+    def __init__(self):
+        self.latencias_ms = []
+        self.falhas = 0
+        self.fim = None
+        self._lock = threading.Lock()
+
+    def concluir(self, raw_payload: bytes, falhou: bool):
+        agora = time.time()
+        try:
+            received_at = json.loads(raw_payload).get('received_at')
+        except ValueError:
+            received_at = None
+        with self._lock:
+            if falhou:
+                self.falhas += 1
+            if received_at:
+                self.latencias_ms.append(agora * 1000 - received_at)
+            self.fim = agora
+
+    @property
+    def concluidas(self) -> int:
+        with self._lock:
+            return len(self.latencias_ms)
+
+def percentil(valores: list[float], p: float) -> float:
+    """Percentil por posição mais próxima (nearest-rank)."""
+    if not valores:
+        return float('nan')
+    ordenados = sorted(valores)
+    posicao = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[posicao]
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# EXECUÇÃO
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def preparar_ambiente(args, groq_url: str, waha_url: str, baas_url: str):
+    """Aponta o worker para os fakes ANTES de importar os módulos que leem o ambiente."""
+    os.environ['GROQ_API_KEY'] = 'loadtest'
+    os.environ['GROQ_BASE_URL'] = groq_url
+    os.environ['WAHA_API_URL'] = waha_url
+    os.environ['WAHA_API_KEY'] = 'loadtest'
+    os.environ['DJANGO_BAAS_URL'] = f"{baas_url}/api/v1/"
+    os.environ['DJANGO_BAAS_API_TOKEN'] = 'loadtest'
+    os.environ['REDIS_DB'] = str(args.redis_db)
+    os.environ['IDEMPOTENCY_REDIS_DB'] = str(args.redis_db_idempotencia)
+    os.environ.setdefault('REDIS_HOST', 'localhost')
+    os.environ.setdefault('TRACING_EXPORTER', 'none')
+
+    # O worker roda como `python workers/whatsapp_worker.py` e importa `core_ia.*`
+    for caminho in (str(RAIZ), str(RAIZ / 'workers')):
+        if caminho not in sys.path:
+            sys.path.insert(0, caminho)
+
+def criar_worker_medido(registro: Registro):
+    from workers.whatsapp_worker import WhatsAppWorker
+
+    class WorkerMedido(WhatsAppWorker):
+        def process_incoming_message_data(self, raw_json_payload):
+            falhou = False
+            try:
+                super().process_incoming_message_data(raw_json_payload)
+            except Exception:
+                falhou = True
+                raise
+            finally:
+                registro.concluir(raw_json_payload, falhou)
+
+    return WorkerMedido()
+
+def reproduzir(redis_client, textos, args, execucao: str) -> float:
+    """Enfileira `args.mensagens` envelopes a `args.taxa` msg/s. :return: instante inicial."""
+    intervalo = 1 / args.taxa
+    base_chat = 550000000000 + int(execucao[:6], 16) % 10**6 * 10**4
+    proximo_texto = cycle(textos)
+    inicio = time.time()
+
+    for i in range(args.mensagens):
+        alvo = inicio + i * intervalo
+        espera = alvo - time.time()
+        if espera > 0:
+            time.sleep(espera)
+        body, tipo = next(proximo_texto)
+        chat_id = f"{base_chat + i % args.usuarios}@c.us"
+        redis_client.rpush(QUEUE_NAME, montar_envelope(execucao, i, chat_id, body, tipo))
+
+    return inicio
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payloads', type=Path, default=PAYLOADS_PADRAO)
+    parser.add_argument('--mensagens', type=int, default=200)
+    parser.add_argument('--taxa', type=float, default=10.0, help="mensagens por segundo")
+    parser.add_argument('--usuarios', type=int, default=50, help="chat_ids distintos (round-robin)")
+    parser.add_argument('--workers', type=int, default=1, help="instâncias de WhatsAppWorker (threads)")
+    parser.add_argument('--latencia-groq', type=float, default=400.0, help="ms")
+    parser.add_argument('--latencia-waha', type=float, default=30.0, help="ms")
+    parser.add_argument('--latencia-baas', type=float, default=15.0, help="ms")
+    parser.add_argument('--latencia-calendar', type=float, default=120.0, help="ms")
+    parser.add_argument('--jitter', type=float, default=0.2, help="fração da média")
+    parser.add_argument('--pct-registrados', type=int, default=80)
+    parser.add_argument('--redis-db', type=int, default=15)
+    parser.add_argument('--redis-db-idempotencia', type=int, default=14)
+    parser.add_argument('--timeout', type=float, default=120.0, help="s de espera pelo fim da fila")
+    parser.add_argument('--saida', type=Path, help="grava o relatório em JSON")
+    parser.add_argument('--verbose', action='store_true', help="mantém os logs INFO do worker")
+    args = parser.parse_args()
+
+    textos = carregar_textos(args.payloads)
+
+    groq = GroqFalso(Latencia(args.latencia_groq, args.jitter, seed=1))
+    waha = WahaFalso(Latencia(args.latencia_waha, args.jitter, seed=2))
+    baas = BaasFalso(Latencia(args.latencia_baas, args.jitter, seed=3), args.pct_registrados)
+    calendar = CalendarFalso(Latencia(args.latencia_calendar, args.jitter, seed=4))
+    preparar_ambiente(args, groq.iniciar(), waha.iniciar(), baas.iniciar())
+
+    from services.redis_client import get_redis_client
+    from services.service_api_calendar import ServicesCalendar
+    ServicesCalendar.service = calendar
+
+    redis_client = get_redis_client()
+    redis_client.delete(QUEUE_NAME)
+
+    registro = Registro()
+    workers = [criar_worker_medido(registro) for _ in range(args.workers)]
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    for n, worker in enumerate(workers):
+        threading.Thread(target=worker.listen_queue, name=f"worker-{n}", daemon=True).start()
+
+    execucao = uuid.uuid4().hex[:8]
+    print(f"▶ execução {execucao}: {args.mensagens} mensagens a {args.taxa:g} msg/s, "
+          f"{args.workers} worker(s), {args.usuarios} usuários")
+    inicio = reproduzir(redis_client, textos, args, execucao)
+    fim_enfileiramento = time.time()
+
+    limite = fim_enfileiramento + args.timeout
+    while registro.concluidas < args.mensagens and time.time() < limite:
+        time.sleep(0.1)
+
+    latencias = registro.latencias_ms
+    duracao = (registro.fim or time.time()) - inicio
+    relatorio = {
+        "execucao": execucao,
+        "parametros": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "enviadas": args.mensagens,
+        "concluidas": len(latencias),
+        "falhas": registro.falhas,
+        "taxa_alvo": args.taxa,
+        "taxa_enfileiramento": args.mensagens / max(fim_enfileiramento - inicio, 1e-9),
+        "vazao": len(latencias) / max(duracao, 1e-9),
+        "latencia_ms": {
+            "p50": percentil(latencias, 50),
+            "p95": percentil(latencias, 95),
+            "p99": percentil(latencias, 99),
+            "max": max(latencias) if latencias else float('nan'),
+        },
+        "chamadas": {
+            "groq": dict(groq.chamadas),
+            "waha": dict(waha.chamadas),
+            "baas": dict(baas.chamadas),
+            "calendar": dict(calendar.chamadas),
+        },
+    }
+
+    lat = relatorio["latencia_ms"]
+    print(f"✔ concluídas {relatorio['concluidas']}/{args.mensagens} (falhas: {registro.falhas}) "
+          f"em {duracao:.1f}s — vazão {relatorio['vazao']:.2f} msg/s")
+    print(f"  ponta a ponta: p50 {lat['p50']:.0f} ms   p95 {lat['p95']:.0f} ms   "
+          f"p99 {lat['p99']:.0f} ms   max {lat['max']:.0f} ms")
+    for servico, chamadas in relatorio["chamadas"].items():
+        print(f"  {servico:<9} {chamadas}")
+
+    if args.saida:
+        args.saida.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"  relatório gravado em {args.saida}")
+
+    for servico in (groq, waha, baas):
+        servico.parar()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# LATÊNCIA CONFIGURÁVEL E DETERMINÍSTICA
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class Latencia:
+    """
+    Latência simulada: média (ms) ± jitter (fração da média), sorteada com seed fixa
+    para que duas execuções com os mesmos parâmetros tenham a mesma sequência.
+    """
+
+    def __init__(self, media_ms: float, jitter: float = 0.2, seed: int = 42):
+        self.media_ms = media_ms
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def dormir(self):
+        if self.media_ms <= 0:
+            return
+        with self._lock:
+            fator = 1 + self._rng.uniform(-self.jitter, self.jitter)
+        time.sleep(self.media_ms * fator / 1000)
+
+def proximo_dia_util(a_partir_de: date | None = None) -> date:
+    """Próximo dia (a partir de amanhã) que não seja domingo."""
+    dia = (a_partir_de or date.today()) + timedelta(days=1)
+    while dia.weekday() == 6:
+        dia += timedelta(days=1)
+    return dia
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SERVIDOR HTTP BASE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class _HandlerBase(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _ler_json(self) -> dict:
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        if not tamanho:
+            return {}
+        try:
+            return json.loads(self.rfile.read(tamanho))
+        except ValueError:
+            return {}
+
+    def _responder(self, status: int, corpo: dict):
+        dados = json.dumps(corpo).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        self.server.fake.latencia.dormir()
+        status, corpo = self.server.fake.tratar('GET', self.path, {})
+        self._responder(status, corpo)
+
+    def do_POST(self):
+        payload = self._ler_json()
+        self.server.fake.latencia.dormir()
+        status, corpo = self.server.fake.tratar('POST', self.path, payload)
+        self._responder(status, corpo)
+
+class ServicoFalso:
+    """Base dos serviços HTTP falsos: sobe um ThreadingHTTPServer numa porta livre."""
+
+    def __init__(self, latencia: Latencia):
+        self.latencia = latencia
+        self.chamadas = Counter()
+        self._lock = threading.Lock()
+        self._servidor = None
+
+    def contar(self, rota: str):
+        with self._lock:
+            self.chamadas[rota] += 1
+
+    def tratar(self, metodo: str, caminho: str, payload: dict) -> tuple[int, dict]:
+        raise NotImplementedError
+
+    def iniciar(self, host: str = '127.0.0.1') -> str:
+        self._servidor = ThreadingHTTPServer((host, 0), _HandlerBase)
+        self._servidor.daemon_threads = True
+        self._servidor.fake = self
+        threading.Thread(target=self._servidor.serve_forever, name=type(self).__name__, daemon=True).start()
+        return f"http://{host}:{self._servidor.server_address[1]}"
+
+    def parar(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# GROQ (API compatível com OpenAI): respostas roteirizadas por agente
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Palavras-chave da última fala do usuário -> intenção devolvida pelo roteador
+ROTAS_ROTEADOR = (
+    (('atendente', 'humano'), 'ativar_agent_atendimento_humano'),
+    (('cancelar', 'minhas consultas', 'ver consulta'), 'ativar_agent_ver_cancel'),
+    (('marcar', 'agendar', 'horário', 'horario'), 'ativar_agent_marc'),
+)
+
+class GroqFalso(ServicoFalso):
+    """
+    POST .../chat/completions com um roteiro fixo por agente, identificado pelas tools:
+      - sem tools + prompt do roteador -> intenção por palavra-chave (ROTAS_ROTEADOR, senão info)
+      - ver_horarios_disponiveis       -> tool call para o próximo dia útil
+      - agendar_consulta_1h            -> tool call às HORA_AGENDAMENTO do próximo dia útil
+      - demais (registro, cancelamento, info, resposta pós-tool) -> texto fixo
+    """
+
+    HORA_AGENDAMENTO = "10:00"
+
+    def __init__(self, latencia: Latencia):
+        super().__init__(latencia)
+        self._seq = 0
+
+    def _proximo_id(self) -> int:
+        with self._lock:
+            self._seq += 1
+            return self._seq
+
+    @staticmethod
+    def _ultima_fala(mensagens: list) -> str:
+        conteudo = next((m.get('content') or '' for m in reversed(mensagens) if m.get('role') == 'user'), '')
+        linhas = [l for l in conteudo.splitlines() if l.strip()]
+        return (linhas[-1] if linhas else conteudo).lower()
+
+    def _roteiro(self, payload: dict) -> tuple[str, str | None, dict | None]:
+        """:return: (agente, texto, tool_call {name, arguments}) para a requisição."""
+        mensagens = payload.get('messages') or []
+        nomes_tools = {t['function']['name'] for t in payload.get('tools') or []}
+        ja_tem_resultado = any(m.get('role') == 'tool' for m in mensagens)
+        sistema = next((m.get('content') or '' for m in mensagens if m.get('role') == 'system'), '')
+        dia = proximo_dia_util().isoformat()
+
+        if ja_tem_resultado:
+            return 'pos_tool', "Pronto! Posso ajudar em algo mais?", None
+        if 'ver_horarios_disponiveis' in nomes_tools:
+            return 'date_search', None, {'name': 'ver_horarios_disponiveis', 'arguments': {'data': dia}}
+        if 'agendar_consulta_1h' in nomes_tools:
+            inicio = f"{dia}T{self.HORA_AGENDAMENTO}:00-03:00"
+            return 'date_confirm', None, {'name': 'agendar_consulta_1h', 'arguments': {'start_time_str': inicio}}
+        if 'cancelar_consulta' in nomes_tools:
+            return 'cancel', "Você não possui consultas ativas no momento.", None
+        if 'enviar_dados_user' in nomes_tools:
+            return 'register', "Olá! Para continuar, você concorda com o uso dos seus dados (LGPD)? Qual o seu nome?", None
+        if 'ativar_agent_marc' in sistema:
+            fala = self._ultima_fala(mensagens)
+            for palavras, intencao in ROTAS_ROTEADOR:
+                if any(p in fala for p in palavras):
+                    return 'router', intencao, None
+            return 'router', 'ativar_agent_info', None
+        return 'info', "Atendemos de segunda a sábado, das 07h às 20h.", None
+
+    def tratar(self, metodo, caminho, payload):
+        if not caminho.rstrip('/').endswith('/chat/completions'):
+            return 404, {"error": {"message": f"rota desconhecida: {caminho}"}}
+
+        agente, texto, tool = self._roteiro(payload)
+        self.contar(agente)
+        n = self._proximo_id()
+
+        mensagem = {"role": "assistant", "content": texto}
+        if tool is not None:
+            mensagem["tool_calls"] = [{
+                "id": f"call_{n}",
+                "type": "function",
+                "function": {"name": tool['name'], "arguments": json.dumps(tool['arguments'])},
+            }]
+
+        return 200, {
+            "id": f"chatcmpl-{n}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get('model', 'fake'),
+            "choices": [{
+                "index": 0,
+                "message": mensagem,
+                "finish_reason": "tool_calls" if tool is not None else "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# WAHA: registra o horário de cada resposta enviada (fim do ponta a ponta)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class WahaFalso(ServicoFalso):
+
+    def __init__(self, latencia: Latencia):
+        super().__init__(latencia)
+        self.respostas = []  # (chat_id, time.time())
+
+    def tratar(self, metodo, caminho, payload):
+        rota = caminho.rsplit('/', 1)[-1]
+        self.contar(rota)
+        if rota == 'sendText':
+            with self._lock:
+                self.respostas.append((payload.get('chatId'), time.time()))
+        return 201 if rota.startswith('send') else 200, {"id": f"waha-{rota}"}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BaaS DJANGO: usuários registrados por hash estável do chat_id
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class BaasFalso(ServicoFalso):
+    """
+    /api/v1/ mínimo usado pelo worker. Uma fração fixa dos chat_ids (pct_registrados)
+    já está registrada; o restante recebe 404 e cai no agente de registro.
+    """
+
+    def __init__(self, latencia: Latencia, pct_registrados: int = 80):
+        super().__init__(latencia)
+        self.pct_registrados = pct_registrados
+
+    def _registrado(self, chat_id: str) -> bool:
+        digitos = ''.join(c for c in chat_id if c.isdigit()) or '0'
+        return int(digitos[-4:]) % 100 < self.pct_registrados
+
+    def tratar(self, metodo, caminho, payload):
+        partes = [p for p in caminho.split('?')[0].split('/') if p]
+        # ['api', 'v1', ...]
+        rota = partes[2:] if partes[:2] == ['api', 'v1'] else partes
+
+        if metodo == 'GET' and len(rota) == 2 and rota[0] == 'user':
+            self.contar('user')
+            chat_id = rota[1]
+            if not self._registrado(chat_id):
+                return 404, {"status": "NOT_FOUND", "message": "Usuário não registrado."}
+            return 200, {"status": "SUCCESS", "chat_id": chat_id, "username": "Paciente Carga", "appointments": []}
+
+        if metodo == 'GET' and len(rota) == 3 and rota[0] == 'user' and rota[2] == 'agendamentos':
+            self.contar('agendamentos')
+            return 200, {"status": "SUCCESS", "appointments": []}
+
+        if metodo == 'POST':
+            chave = '/'.join(rota)
+            self.contar(chave)
+            if chave == 'agendamentos/salvar':
+                return 201, {"status": "SUCCESS", "numero_consulta": 1}
+            if chave in ('agendamentos/cancelar', 'user/register', 'metrics/log', 'cleanup'):
+                return 200, {"status": "SUCCESS"}
+
+        return 404, {"status": "ERROR", "message": f"rota desconhecida: {caminho}"}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# GOOGLE CALENDAR (em memória, mesma interface encadeada do googleapiclient)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class _Requisicao:
+    def __init__(self, latencia: Latencia, resultado):
+        self._latencia = latencia
+        self._resultado = resultado
+
+    def execute(self):
+        self._latencia.dormir()
+        return self._resultado() if callable(self._resultado) else self._resultado
+
+class CalendarFalso:
+    """
+    Substitui `ServicesCalendar.service`: events().list/insert/delete e freebusy().query.
+    Cada dia tem os mesmos blocos ocupados (BLOCOS_OCUPADOS, horário de Brasília);
+    freebusy devolve os blocos de todos os dias que tocam [timeMin, timeMax).
+    """
+
+    FUSO = timezone(timedelta(hours=-3))
+
+    BLOCOS_OCUPADOS = (("12:00", "13:00"), ("16:00", "17:00"))
+
+    def __init__(self, latencia: Latencia):
+        self.latencia = latencia
+        self.chamadas = Counter()
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def _contar(self, rota: str):
+        with self._lock:
+            self.chamadas[rota] += 1
+
+    def events(self):
+        return _Eventos(self)
+
+    def freebusy(self):
+        return _Freebusy(self)
+
+    def _instante(self, valor: str) -> datetime:
+        instante = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+        return instante if instante.tzinfo else instante.replace(tzinfo=self.FUSO)
+
+    def _ocupados(self, corpo: dict) -> dict:
+        inicio, fim = self._instante(corpo['timeMin']), self._instante(corpo['timeMax'])
+        busy = []
+        dia = inicio.astimezone(self.FUSO).date()
+        while dia <= fim.astimezone(self.FUSO).date():
+            for ini, fim_bloco in self.BLOCOS_OCUPADOS:
+                bloco_ini = self._instante(f"{dia}T{ini}:00-03:00")
+                bloco_fim = self._instante(f"{dia}T{fim_bloco}:00-03:00")
+                if bloco_ini < fim and bloco_fim > inicio:
+                    busy.append({"start": bloco_ini.isoformat(), "end": bloco_fim.isoformat()})
+            dia += timedelta(days=1)
+        return {"calendars": {item['id']: {"busy": busy} for item in corpo.get('items', [])}}
+
+    def _novo_evento(self) -> dict:
+        with self._lock:
+            self._seq += 1
+            n = self._seq
+        return {"id": f"fakeevt{n:08d}", "htmlLink": f"https://calendar.local/event?eid={n}"}
+
+class _Eventos:
+    def __init__(self, calendar: CalendarFalso):
+        self._calendar = calendar
+
+    def list(self, **kwargs):
+        self._calendar._contar('events.list')
+        return _Requisicao(self._calendar.latencia, {"items": []})
+
+    def insert(self, **kwargs):
+        self._calendar._contar('events.insert')
+        return _Requisicao(self._calendar.latencia, self._calendar._novo_evento)
+
+    def delete(self, **kwargs):
+        self._calendar._contar('events.delete')
+        return _Requisicao(self._calendar.latencia, "")
+
+class _Freebusy:
+    def __init__(self, calendar: CalendarFalso):
+        self._calendar = calendar
+
+    def query(self, body: dict):
+        self._calendar._contar('freebusy.query')
+        return _Requisicao(self._calendar.latencia, lambda: self._calendar._ocupados(body))
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_ready
 
 # Define o módulo de settings do Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chatbot.settings')
@@ -11,4 +12,9 @@ app = Celery('chatbot')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Auto-descobre tarefas em todos os apps instalados
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+@worker_ready.connect
+def configurar_waha_ao_iniciar(sender, **kwargs):
+    """Configura a sessão/HMAC do WAHA uma vez por subida do worker (espera o WAHA iniciar)."""
+    sender.app.send_task("configurar_sessao_waha_task", countdown=10)
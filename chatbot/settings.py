@@ -34,6 +34,16 @@ CELERY_BEAT_SCHEDULE = {
     'cleanup-expired-appointments-daily': {
         'task': 'cleanup_expired_appointments_task', 
         'schedule': crontab(hour=3, minute=0),
+    },
+
+    'compactar-metricas-diarias-daily': {
+        'task': 'compactar_metricas_diarias_task',
+        'schedule': crontab(hour=3, minute=30),
+    },
+
+    'garantir-particoes-metricas-daily': {
+        'task': 'garantir_particoes_metricas_task',
+        'schedule': crontab(hour=4, minute=0),
     }
 }
 # -------------
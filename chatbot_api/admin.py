@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserRegister, LogMetrica # <--- APPOINTMENT REMOVIDO DA IMPORTAÇÃO
+from .models import UserRegister, LogMetrica, MetricaDiaria, ConfiguracaoAgenda # <--- APPOINTMENT REMOVIDO DA IMPORTAÇÃO
 
 @admin.register(UserRegister)
 class UserRegisterAdmin(admin.ModelAdmin):
@@ -48,4 +48,38 @@ class LogMetricaAdmin(admin.ModelAdmin):
         return False
         
     def has_change_permission(self, request, obj=None):
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(MetricaDiaria)
+class MetricaDiariaAdmin(admin.ModelAdmin):
+    list_display = (
+        'data',
+        'tipo_metrica',
+        'status',
+        'cliente_id',
+        'total',
+    )
+    list_filter = (
+        'tipo_metrica',
+        'status',
+        'data'
+    )
+    search_fields = ('cliente_id',)
+    ordering = ('-data',)
+
+    # Rollup derivado de LogMetrica: somente leitura
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ConfiguracaoAgenda)
+class ConfiguracaoAgendaAdmin(admin.ModelAdmin):
+    list_display = (
+        'nome',
+        'ativo',
+        'atualizado_em',
+    )
+    list_filter = ('ativo',)
+    search_fields = ('nome',)
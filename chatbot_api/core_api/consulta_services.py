@@ -7,7 +7,6 @@ from datetime import datetime
 # from django.db import transaction
 # from django.utils import timezone
 # from chatbot_api.models import UserRegister
-from django.db import transaction
 from chatbot_api.models import UserRegister
 from datetime import datetime
 from django.utils import timezone
@@ -27,41 +26,20 @@ class ConsultaService:
         (NÃO FAZ I/O DE REDIS)
         """
         try:
-            with transaction.atomic():
-                user = UserRegister.objects.select_for_update().get(chat_id=chat_id)
-                new_datetime = datetime.fromisoformat(start_time_iso)
-                agora = timezone.now()
-                
-                is_slot1_free = not user.appointment1_gcal_id or (user.appointment1_datetime and user.appointment1_datetime < agora)
-                
-                if is_slot1_free:
-                    user.appointment1_datetime = new_datetime
-                    user.appointment1_gcal_id = google_event_id
-                    user.save(update_fields=['appointment1_datetime', 'appointment1_gcal_id'])
-                    
-                    # ... (código de métricas inalterado) ...
-                    
-                    logger.info(f"✅ Agendamento salvo no slot 1 - Cliente: {chat_id}")
-                    
-                    # 🎯 RETORNO REFATORADO: Retorna o status e os dados de negócio
-                    return {"status": "SUCCESS", "slot": 1, "data": new_datetime.strftime('%d/%m/%Y às %H:%M')}
+            new_datetime = datetime.fromisoformat(start_time_iso)
+            slot = UserRegister.ocupar_slot_livre(chat_id, new_datetime, google_event_id)
 
-                is_slot2_free = not user.appointment2_gcal_id or (user.appointment2_datetime and user.appointment2_datetime < agora)
+            if slot is not None:
+                logger.info(f"✅ Agendamento salvo no slot {slot} - Cliente: {chat_id}")
                 
-                if is_slot2_free:
-                    user.appointment2_datetime = new_datetime
-                    user.appointment2_gcal_id = google_event_id
-                    user.save(update_fields=['appointment2_datetime', 'appointment2_gcal_id'])
+                # 🎯 RETORNO REFATORADO: Retorna o status e os dados de negócio
+                return {"status": "SUCCESS", "slot": slot, "data": new_datetime.strftime('%d/%m/%Y às %H:%M')}
 
-                    # ... (código de métricas inalterado) ...
-                    
-                    logger.info(f"✅ Agendamento salvo no slot 2 - Cliente: {chat_id}")
-                    
-                    # 🎯 RETORNO REFATORADO: Retorna o status e os dados de negócio
-                    return {"status": "SUCCESS", "slot": 2, "data": new_datetime.strftime('%d/%m/%Y às %H:%M')}
-                else:
-                    # 🎯 RETORNO REFATORADO: Retorna a falha
-                    return {"status": "FAILURE", "message": "Limite de agendamentos atingido. Você pode ter no máximo 2 consultas ativas."}
+            if not UserRegister.objects.filter(chat_id=chat_id).exists():
+                raise UserRegister.DoesNotExist
+
+            # 🎯 RETORNO REFATORADO: Retorna a falha
+            return {"status": "FAILURE", "message": "Limite de agendamentos atingido. Você pode ter no máximo 2 consultas ativas."}
                     
         except UserRegister.DoesNotExist:
             # ... (código de métricas inalterado) ...
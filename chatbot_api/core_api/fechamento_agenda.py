@@ -0,0 +1,206 @@
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+
+from django.db import DatabaseError, transaction
+from django.db.models import Case, CharField, DateTimeField, F, Q, Value, When
+from django.utils import timezone
+
+from chatbot_api.models import UserRegister
+from chatbot_api.signals import agendar_invalidacao_perfis
+from services.service_api_calendar import ServicesCalendar
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FECHAMENTO DA AGENDA EM LOTE (dias em que a clínica não atende)
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# 1 SELECT das consultas do período -> batch HTTP no Google Calendar (50 deletes por
+# round trip) -> 1 UPDATE com CASE/WHEN limpando só os slots cujo evento foi removido
+# -> avisos via WhatsApp enfileirados no Celery (após o commit), espaçados para respeitar o WAHA.
+#
+# Se o UPDATE falhar depois do batch, os gcal_ids removidos são logados e devolvidos
+# (codigo FALHA_BANCO): rodar o mesmo fechamento de novo conclui a operação, pois evento
+# já inexistente (404/410) conta como removido no Calendar.
+
+ERRO_PERIODO_INVALIDO = 'PERIODO_INVALIDO'
+ERRO_CALENDAR_INDISPONIVEL = 'CALENDAR_INDISPONIVEL'
+ERRO_FALHA_BANCO = 'FALHA_BANCO'
+
+NOTIFICACOES_POR_MINUTO = int(os.environ.get('FECHAMENTO_NOTIFICACOES_POR_MINUTO', 30))
+
+MENSAGEM_FECHAMENTO = (
+    "Olá {nome}! Precisamos cancelar sua consulta do dia *{data}* às {hora}"
+    "{motivo}. Pedimos desculpas pelo transtorno. "
+    "Responda esta mensagem quando quiser remarcar."
+)
+
+def _limites_periodo(data_inicio: date, data_fim: date) -> tuple[datetime, datetime]:
+    """[00:00 de data_inicio, 00:00 do dia seguinte a data_fim) no fuso local."""
+    fuso = timezone.get_current_timezone()
+    inicio = timezone.make_aware(datetime.combine(data_inicio, time.min), fuso)
+    fim = timezone.make_aware(datetime.combine(data_fim + timedelta(days=1), time.min), fuso)
+    return inicio, fim
+
+def consultas_no_periodo(data_inicio: date, data_fim: date) -> list[dict]:
+    """
+    Consultas (com evento no Calendar) nos dois slots, numa única consulta ao banco.
+
+    :return: [{chat_id, username, numero_consulta, datetime, gcal_id}] ordenadas por data
+    """
+    inicio, fim = _limites_periodo(data_inicio, data_fim)
+    filtros = {
+        numero: Q(**{
+            f'appointment{numero}_datetime__gte': inicio,
+            f'appointment{numero}_datetime__lt': fim,
+            f'appointment{numero}_gcal_id__gt': '',
+        })
+        for numero in UserRegister.NUMEROS_SLOT
+    }
+
+    usuarios = UserRegister.objects.filter(filtros[1] | filtros[2]).values(
+        'chat_id', 'username',
+        'appointment1_datetime', 'appointment1_gcal_id',
+        'appointment2_datetime', 'appointment2_gcal_id',
+    )
+
+    consultas = []
+    for user in usuarios:
+        for numero in UserRegister.NUMEROS_SLOT:
+            dt = user[f'appointment{numero}_datetime']
+            gcal_id = user[f'appointment{numero}_gcal_id']
+            if gcal_id and dt and inicio <= dt < fim:
+                consultas.append({
+                    "chat_id": user['chat_id'],
+                    "username": user['username'],
+                    "numero_consulta": numero,
+                    "datetime": dt,
+                    "gcal_id": gcal_id,
+                })
+
+    consultas.sort(key=lambda c: c['datetime'])
+    return consultas
+
+def limpar_slots_por_evento(gcal_ids: list[str]) -> int:
+    """
+    Limpa, num único UPDATE, os slots (1 e/ou 2) cujo gcal_id está em `gcal_ids`.
+    O CASE preserva o outro slot do mesmo usuário.
+
+    :return: número de usuários atualizados
+    """
+    if not gcal_ids:
+        return 0
+
+    campos = {}
+    filtro = Q()
+    for numero in UserRegister.NUMEROS_SLOT:
+        no_lote = Q(**{f'appointment{numero}_gcal_id__in': gcal_ids})
+        filtro |= no_lote
+        for campo, tipo in ((f'appointment{numero}_datetime', DateTimeField()),
+                            (f'appointment{numero}_gcal_id', CharField())):
+            campos[campo] = Case(When(no_lote, then=Value(None)), default=F(campo), output_field=tipo)
+
+    afetados = UserRegister.objects.filter(filtro)
+    chat_ids = list(afetados.values_list('chat_id', flat=True))
+    atualizados = afetados.update(**campos)
+    agendar_invalidacao_perfis(chat_ids)
+    return atualizados
+
+def enfileirar_notificacoes(consultas: list[dict], motivo: str = '') -> int:
+    """
+    Agenda um aviso por consulta cancelada, espaçados por `countdown` para não passar de
+    NOTIFICACOES_POR_MINUTO no WAHA, independentemente de quantos workers Celery existam.
+    """
+    from chatbot_api.tasks import notificar_fechamento_agenda_task
+
+    intervalo = 60 / max(NOTIFICACOES_POR_MINUTO, 1)
+    sufixo_motivo = f" ({motivo})" if motivo else ""
+
+    for i, consulta in enumerate(consultas):
+        local_dt = timezone.localtime(consulta['datetime'])
+        mensagem = MENSAGEM_FECHAMENTO.format(
+            nome=consulta['username'],
+            data=local_dt.strftime('%d/%m/%Y'),
+            hora=local_dt.strftime('%H:%M'),
+            motivo=sufixo_motivo,
+        )
+        notificar_fechamento_agenda_task.apply_async(
+            args=[consulta['chat_id'], consulta['gcal_id'], mensagem],
+            countdown=round(i * intervalo, 2),
+        )
+    return len(consultas)
+
+def fechar_agenda(data_inicio: date, data_fim: date, motivo: str = '', notificar: bool = True,
+                  simular: bool = False) -> dict:
+    """
+    Cancela todas as consultas de [data_inicio, data_fim]: Calendar em batch, banco em um
+    UPDATE e avisos enfileirados. Slots cujo evento não pôde ser removido ficam intactos
+    (e são reportados em `falhas`) para não deixar evento órfão na agenda.
+    """
+    if data_fim < data_inicio:
+        return {"status": "ERROR", "codigo": ERRO_PERIODO_INVALIDO,
+                "message": "data_fim deve ser maior ou igual a data_inicio."}
+
+    consultas = consultas_no_periodo(data_inicio, data_fim)
+    logger.info(f"📕 Fechamento {data_inicio}..{data_fim}: {len(consultas)} consultas encontradas.")
+
+    if simular or not consultas:
+        return {
+            "status": "SUCCESS",
+            "simulacao": simular,
+            "consultas": len(consultas),
+            "canceladas": 0,
+            "notificacoes": 0,
+            "falhas": {},
+            "detalhes": [
+                {"chat_id": c['chat_id'], "numero_consulta": c['numero_consulta'],
+                 "datetime": c['datetime'].isoformat(), "gcal_id": c['gcal_id']}
+                for c in consultas
+            ] if simular else [],
+        }
+
+    if not ServicesCalendar.service and not ServicesCalendar.inicializar_servico():
+        return {"status": "ERROR", "codigo": ERRO_CALENDAR_INDISPONIVEL,
+                "message": "Serviço do Google Calendar indisponível."}
+
+    resultado_gcal = ServicesCalendar.deletar_eventos_em_lote(
+        ServicesCalendar.service, [c['gcal_id'] for c in consultas]
+    )
+    removidos = set(resultado_gcal['removidos'])
+    canceladas = [c for c in consultas if c['gcal_id'] in removidos]
+
+    try:
+        with transaction.atomic():
+            usuarios_atualizados = limpar_slots_por_evento(list(removidos))
+            if notificar:
+                # Só avisa o paciente se o slot foi de fato liberado no banco
+                transaction.on_commit(lambda: enfileirar_notificacoes(canceladas, motivo))
+    except DatabaseError as e:
+        logger.error(
+            f"❌ Fechamento {data_inicio}..{data_fim}: eventos removidos do Calendar mas o banco falhou ({e}). "
+            f"Repita o fechamento para concluir. gcal_ids removidos: {sorted(removidos)}",
+            exc_info=True,
+        )
+        return {
+            "status": "ERROR",
+            "codigo": ERRO_FALHA_BANCO,
+            "message": "Eventos removidos do Calendar, mas os slots não foram liberados. Repita o fechamento.",
+            "gcal_ids_removidos": sorted(removidos),
+            "falhas": resultado_gcal['falhas'],
+        }
+    notificacoes = len(canceladas) if notificar else 0
+
+    logger.info(
+        f"✅ Fechamento {data_inicio}..{data_fim}: {len(canceladas)}/{len(consultas)} canceladas, "
+        f"{usuarios_atualizados} usuários atualizados, {notificacoes} avisos enfileirados."
+    )
+    return {
+        "status": "SUCCESS" if not resultado_gcal['falhas'] else "PARTIAL",
+        "simulacao": False,
+        "consultas": len(consultas),
+        "canceladas": len(canceladas),
+        "notificacoes": notificacoes,
+        "falhas": resultado_gcal['falhas'],
+        "detalhes": [],
+    }
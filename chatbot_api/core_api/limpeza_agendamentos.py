@@ -0,0 +1,78 @@
+import logging
+import os
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from chatbot_api.models import UserRegister
+from chatbot_api.signals import agendar_invalidacao_perfis
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# LIMPEZA DE AGENDAMENTOS EXPIRADOS EM LOTES POR PK
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# Cada lote: 1 SELECT (índices em appointmentN_datetime, keyset por pk) -> transação curta
+# com 1 UPDATE por slot restrito aos pks do lote. A condição de expiração é reavaliada no
+# UPDATE, então um slot reocupado entre o SELECT e o UPDATE não é apagado.
+# Locks ficam limitados a LIMPEZA_LOTE linhas por vez, em vez da tabela inteira.
+
+LIMPEZA_LOTE = int(os.environ.get('LIMPEZA_LOTE', 500))
+LIMPEZA_MARGEM_HORAS = 2
+
+def _filtro_expirado(numero: int, data_limite: datetime) -> Q:
+    return Q(**{f'appointment{numero}_datetime__lt': data_limite})
+
+def limpar_agendamentos_expirados(data_limite: datetime | None = None, lote: int = LIMPEZA_LOTE,
+                                  progresso=None) -> dict:
+    """
+    Libera os slots cujo horário é anterior a `data_limite` (padrão: agora - 2h).
+
+    :param progresso: callback opcional chamado após cada lote com o resumo parcial
+    :return: {"status", "data_limite", "lotes", "usuarios", "slots_limpos"}
+    """
+    data_limite = data_limite or timezone.now() - timedelta(hours=LIMPEZA_MARGEM_HORAS)
+    logger.info(f"🧹 Iniciando limpeza em lotes de {lote}. Cortar agendamentos anteriores a: {data_limite}")
+
+    expirados = Q()
+    for numero in UserRegister.NUMEROS_SLOT:
+        expirados |= _filtro_expirado(numero, data_limite)
+
+    resumo = {"status": "SUCCESS", "data_limite": data_limite.isoformat(), "lotes": 0, "usuarios": 0, "slots_limpos": 0}
+    ultimo_pk = 0
+    while True:
+        linhas = list(
+            UserRegister.objects.filter(expirados, pk__gt=ultimo_pk)
+            .order_by('pk')
+            .values_list('pk', 'chat_id')[:lote]
+        )
+        if not linhas:
+            break
+
+        pks = [pk for pk, _ in linhas]
+        ultimo_pk = pks[-1]
+        with transaction.atomic():
+            for numero in UserRegister.NUMEROS_SLOT:
+                resumo["slots_limpos"] += UserRegister.objects.filter(
+                    _filtro_expirado(numero, data_limite), pk__in=pks
+                ).update(**{f'appointment{numero}_datetime': None, f'appointment{numero}_gcal_id': None})
+            # .update() não dispara post_save: invalida o cache de perfil após o commit do lote
+            agendar_invalidacao_perfis(chat_id for _, chat_id in linhas)
+
+        resumo["lotes"] += 1
+        resumo["usuarios"] += len(linhas)
+        logger.info(f"🧹 Lote {resumo['lotes']}: {len(linhas)} usuários, {resumo['slots_limpos']} slots liberados até agora.")
+        if progresso:
+            progresso(dict(resumo))
+
+        if len(linhas) < lote:
+            break
+
+    if resumo["slots_limpos"]:
+        logger.info(f"✅ Limpeza concluída. {resumo['slots_limpos']} slots antigos liberados em {resumo['lotes']} lote(s).")
+    else:
+        logger.info(f"ℹ️ Limpeza executada, mas nenhum agendamento expirado (anterior a {data_limite}) foi encontrado.")
+    return resumo
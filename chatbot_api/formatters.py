@@ -0,0 +1,67 @@
+from datetime import datetime
+from typing import List, Dict, Any
+
+from django.utils import timezone
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FORMATAÇÃO: Slots de Agendamento do UserRegister (funções puras, sem I/O)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+CAMPOS_AGENDAMENTO = (
+    'chat_id',
+    'username',
+    'appointment1_datetime',
+    'appointment1_gcal_id',
+    'appointment2_datetime',
+    'appointment2_gcal_id',
+)
+
+def _slots(user) -> List[tuple]:
+    return [
+        (1, user.appointment1_datetime, user.appointment1_gcal_id),
+        (2, user.appointment2_datetime, user.appointment2_gcal_id),
+    ]
+
+def formatar_consultas_futuras(user, agora: datetime = None) -> List[Dict[str, Any]]:
+    """
+    Consultas com gcal_id e data >= agora, em horário local, ordenadas por data.
+    Formato usado por `get_user_data` (e cacheado pelo worker).
+    """
+    agora = agora or timezone.now()
+    consultas = []
+
+    for numero, dt, gcal_id in _slots(user):
+        if not (gcal_id and dt and dt >= agora):
+            continue
+        local_dt = timezone.localtime(dt)
+        consultas.append({
+            "appointment_number": numero,
+            "data": local_dt.strftime("%d/%m/%Y"),
+            "hora": local_dt.strftime("%H:%M"),
+            "slot": numero,
+            "gcal_id": gcal_id,
+            "datetime_iso": dt.isoformat()
+        })
+
+    consultas.sort(key=lambda x: datetime.strptime(f"{x['data']} {x['hora']}", "%d/%m/%Y %H:%M"))
+    return consultas
+
+def formatar_consultas_ativas(user, agora: datetime = None) -> List[Dict[str, Any]]:
+    """
+    Consultas com data > agora (formato de `list_active_appointments`).
+    """
+    agora = agora or timezone.now()
+    lista_consultas = []
+
+    for numero, dt, gcal_id in _slots(user):
+        if not (dt and dt > agora):
+            continue
+        lista_consultas.append({
+            "appointment_number": numero,
+            "data": dt.strftime('%d/%m/%Y'),
+            "hora": dt.strftime('%H:%M'),
+            "gcal_id": gcal_id,
+            "datetime_iso": dt.isoformat()
+        })
+
+    return lista_consultas
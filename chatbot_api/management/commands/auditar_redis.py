@@ -0,0 +1,193 @@
+import re
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from services.envelope import RAW_EVENT_KEY_PREFIX
+from services.idempotency import IDEMPOTENCY_KEY_PREFIX, IDEMPOTENCY_TTL
+from services.redis_client import USER_PROFILE_CACHE_TTL, USER_PROFILE_GERACAO_TTL, TTL_TWO_HOURS
+
+# Bancos usados pelo sistema: 0 (fila/sessões/cache), 1 (lembretes), 2 (Celery), 3 (idempotência do gateway)
+DBS_PADRAO = "0,1,2,3"
+
+# TTL aplicado por --corrigir-ttl a chaves SEM expiração. Famílias fora desta tabela
+# (fila new_user_queue, chaves do Celery, etc.) nunca são alteradas.
+TTL_POR_FAMILIA = {
+    'session:*': 3600,
+    'history:*': TTL_TWO_HOURS,
+    'cache:user_profile:*': USER_PROFILE_CACHE_TTL,
+    'processed_msg:*': 60,  # legado (substituído por idempotency:event:*)
+    'lock:user_profile:*': 5,
+    'geracao:user_profile:*': USER_PROFILE_GERACAO_TTL,
+    'lembrete_enviado:*': 60 * 60 * 24,
+    f'{IDEMPOTENCY_KEY_PREFIX}*': IDEMPOTENCY_TTL,
+    f'{RAW_EVENT_KEY_PREFIX}*': 60 * 60 * 24,
+}
+
+FAIXAS_TTL = [
+    (60, '< 1min'),
+    (3600, '< 1h'),
+    (86400, '< 1d'),
+    (7 * 86400, '< 7d'),
+]
+
+_ID_SEM_PREFIXO = re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}|\d+')
+
+
+def familia_da_chave(chave: str) -> str:
+    """Ex: 'history:5511...@c.us' -> 'history:*'; 'celery-task-meta-<uuid>' -> 'celery-task-meta-*'."""
+    if ':' in chave:
+        return chave.rsplit(':', 1)[0] + ':*'
+    return _ID_SEM_PREFIXO.sub('*', chave)
+
+
+def faixa_ttl(ttl: int) -> str:
+    if ttl < 0:
+        return 'sem TTL'
+    for limite, nome in FAIXAS_TTL:
+        if ttl < limite:
+            return nome
+    return '>= 7d'
+
+
+class Command(BaseCommand):
+    help = (
+        "Audita o keyspace do Redis (SCAN): memória estimada por família de chave, "
+        "distribuição de TTL e chaves sem expiração. Opcionalmente corrige TTLs ausentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dbs', default=DBS_PADRAO, help=f"Bancos a auditar (padrão: {DBS_PADRAO}).")
+        parser.add_argument(
+            '--amostras',
+            type=int,
+            default=200,
+            help="Máximo de chaves por família medidas com MEMORY USAGE (padrão: 200).",
+        )
+        parser.add_argument('--lote', type=int, default=500, help="Chaves por pipeline/SCAN (padrão: 500).")
+        parser.add_argument(
+            '--corrigir-ttl',
+            action='store_true',
+            help="Aplica EXPIRE nas chaves sem TTL das famílias conhecidas (ver TTL_POR_FAMILIA).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            dbs = [int(db) for db in options['dbs'].split(',') if db.strip()]
+        except ValueError:
+            raise CommandError("--dbs deve ser uma lista de inteiros separada por vírgula (ex: 0,1,3).")
+
+        for db in dbs:
+            cliente = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=int(settings.REDIS_PORT),
+                db=db,
+                decode_responses=False,
+                socket_connect_timeout=5,
+            )
+            try:
+                cliente.ping()
+            except redis.RedisError as e:
+                raise CommandError(f"Falha ao conectar no Redis DB {db}: {e}")
+
+            familias = self._auditar_db(cliente, options)
+            self._imprimir_relatorio(db, familias)
+
+            if options['corrigir_ttl']:
+                self._corrigir_ttls(cliente, db, familias, options['lote'])
+
+    def _auditar_db(self, cliente, options) -> dict:
+        familias = defaultdict(lambda: {
+            'total': 0,
+            'amostradas': 0,
+            'bytes_amostrados': 0,
+            'faixas': defaultdict(int),
+            'sem_ttl': 0,
+            'corrigir': [],
+        })
+
+        lote = []
+        for chave in cliente.scan_iter(count=options['lote']):
+            lote.append(chave)
+            if len(lote) >= options['lote']:
+                self._processar_lote(cliente, lote, familias, options)
+                lote = []
+        if lote:
+            self._processar_lote(cliente, lote, familias, options)
+
+        return familias
+
+    def _processar_lote(self, cliente, chaves, familias, options):
+        max_amostras = options['amostras']
+        nomes = [familia_da_chave(chave.decode('utf-8', errors='replace')) for chave in chaves]
+
+        pipe = cliente.pipeline(transaction=False)
+        amostrar = []
+        agendadas = defaultdict(int)
+        for chave, nome in zip(chaves, nomes):
+            pipe.ttl(chave)
+            # Conta as medições já agendadas neste lote para não ultrapassar o limite por família
+            medir = familias[nome]['amostradas'] + agendadas[nome] < max_amostras
+            amostrar.append(medir)
+            if medir:
+                agendadas[nome] += 1
+                pipe.memory_usage(chave)
+        resultados = iter(pipe.execute())
+
+        for chave, nome, medir in zip(chaves, nomes, amostrar):
+            familia = familias[nome]
+            ttl = next(resultados)
+            familia['total'] += 1
+            familia['faixas'][faixa_ttl(ttl)] += 1
+            if ttl == -1:
+                familia['sem_ttl'] += 1
+                # Só guarda as chaves que --corrigir-ttl vai de fato alterar
+                if options['corrigir_ttl'] and nome in TTL_POR_FAMILIA:
+                    familia['corrigir'].append(chave)
+            if medir:
+                familia['amostradas'] += 1
+                familia['bytes_amostrados'] += next(resultados) or 0
+
+    def _imprimir_relatorio(self, db, familias):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n═══ Redis DB {db} ═══"))
+        if not familias:
+            self.stdout.write("ℹ️ Nenhuma chave encontrada.")
+            return
+
+        total_bytes = 0
+        linhas = []
+        for nome, familia in familias.items():
+            media = familia['bytes_amostrados'] / familia['amostradas'] if familia['amostradas'] else 0
+            estimado = int(media * familia['total'])
+            total_bytes += estimado
+            linhas.append((estimado, nome, familia, media))
+
+        for estimado, nome, familia, media in sorted(linhas, key=lambda linha: linha[0], reverse=True):
+            faixas = ', '.join(f"{faixa}: {qtd}" for faixa, qtd in sorted(familia['faixas'].items()))
+            sem_ttl = f" | ⚠️ {familia['sem_ttl']} sem TTL" if familia['sem_ttl'] else ""
+            estilo = self.style.WARNING if familia['sem_ttl'] else (lambda texto: texto)
+            self.stdout.write(estilo(
+                f"{nome:<32} chaves={familia['total']:<8} ~{estimado / 1024:,.1f} KiB "
+                f"(média {media:,.0f} B) | TTL -> {faixas}{sem_ttl}"
+            ))
+
+        self.stdout.write(f"Total estimado: ~{total_bytes / (1024 * 1024):,.2f} MiB")
+
+    def _corrigir_ttls(self, cliente, db, familias, tamanho_lote):
+        for nome, familia in familias.items():
+            ttl = TTL_POR_FAMILIA.get(nome)
+            chaves = familia['corrigir']
+            if not chaves or ttl is None:
+                continue
+
+            for inicio in range(0, len(chaves), tamanho_lote):
+                pipe = cliente.pipeline(transaction=False)
+                for chave in chaves[inicio:inicio + tamanho_lote]:
+                    pipe.expire(chave, ttl)
+                pipe.execute()
+
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ DB {db}: TTL de {ttl}s aplicado em {len(chaves)} chave(s) de {nome}"
+            ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot_api.tasks import configurar_sessao_waha, configurar_sessao_waha_task
+
+
+class Command(BaseCommand):
+    help = "Ativa a sessão do WAHA e configura o webhook com HMAC (enfileira ou executa direto)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--agora',
+            action='store_true',
+            help="Executa uma tentativa neste processo em vez de enfileirar no Celery.",
+        )
+
+    def handle(self, *args, **options):
+        if not options['agora']:
+            resultado = configurar_sessao_waha_task.delay()
+            self.stdout.write(self.style.SUCCESS(f"✅ Configuração do WAHA enfileirada (task {resultado.id})."))
+            return
+
+        if not configurar_sessao_waha():
+            raise CommandError("Não foi possível configurar a sessão do WAHA.")
+        self.stdout.write(self.style.SUCCESS("✅ Sessão do WAHA ativa e HMAC configurado."))
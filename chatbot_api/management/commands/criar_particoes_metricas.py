@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot_api.metrics.particoes import garantir_particoes_futuras
+
+
+class Command(BaseCommand):
+    help = "Cria as partições mensais futuras da tabela logs_metricas (PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses',
+            type=int,
+            default=3,
+            help="Quantidade de meses à frente a pré-criar (padrão: 3).",
+        )
+
+    def handle(self, *args, **options):
+        if options['meses'] < 0:
+            raise CommandError("--meses deve ser maior ou igual a zero.")
+
+        resultado = garantir_particoes_futuras(meses_a_frente=options['meses'])
+
+        if resultado['status'] == 'skipped':
+            self.stdout.write(self.style.WARNING(f"ℹ️ {resultado['message']}"))
+            return
+
+        if resultado['criadas']:
+            for nome in resultado['criadas']:
+                self.stdout.write(self.style.SUCCESS(f"✅ Partição criada: {nome}"))
+        else:
+            self.stdout.write("ℹ️ Todas as partições já existiam.")
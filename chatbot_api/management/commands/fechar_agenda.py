@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot_api.core_api.fechamento_agenda import fechar_agenda
+
+
+def _data(valor: str):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Data inválida '{valor}'. Use YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Fecha a agenda num intervalo de datas: remove os eventos do Google Calendar em batch, "
+        "limpa os slots no banco em um UPDATE e enfileira avisos aos pacientes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inicio', required=True, help="Primeiro dia fechado (YYYY-MM-DD).")
+        parser.add_argument('--fim', help="Último dia fechado (YYYY-MM-DD). Padrão: igual a --inicio.")
+        parser.add_argument('--motivo', default='', help="Motivo incluído no aviso aos pacientes.")
+        parser.add_argument('--sem-notificacao', action='store_true', help="Não avisa os pacientes.")
+        parser.add_argument('--simular', action='store_true', help="Apenas lista as consultas afetadas.")
+
+    def handle(self, *args, **options):
+        data_inicio = _data(options['inicio'])
+        data_fim = _data(options['fim']) if options['fim'] else data_inicio
+
+        resultado = fechar_agenda(
+            data_inicio,
+            data_fim,
+            motivo=options['motivo'],
+            notificar=not options['sem_notificacao'],
+            simular=options['simular'],
+        )
+
+        if resultado['status'] == 'ERROR':
+            for gcal_id in resultado.get('gcal_ids_removidos', []):
+                self.stdout.write(self.style.WARNING(f"⚠️ Evento {gcal_id} já removido do Calendar (slot não liberado)"))
+            raise CommandError(resultado['message'])
+
+        if resultado['simulacao']:
+            self.stdout.write(f"ℹ️ Simulação: {resultado['consultas']} consultas seriam canceladas.")
+            for consulta in resultado['detalhes']:
+                self.stdout.write(
+                    f"  {consulta['datetime']}  {consulta['chat_id']}  slot {consulta['numero_consulta']}"
+                )
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {resultado['canceladas']}/{resultado['consultas']} consultas canceladas, "
+            f"{resultado['notificacoes']} avisos enfileirados."
+        ))
+        for gcal_id, erro in resultado['falhas'].items():
+            self.stdout.write(self.style.WARNING(f"⚠️ Evento {gcal_id} não removido (slot mantido): {erro}"))
@@ -5,9 +5,13 @@ from .metrics_service import (
     get_resumo_dia,
     get_resumo_cliente_dia,
     get_historico_cliente,
+    get_historico_cliente_pagina,
+    iterar_historico_cliente,
+    aiterar_historico_cliente,
     get_log_evento,
     get_estatisticas_diarias,
     get_resumo_cliente_periodo,
+    compactar_metricas_diarias,
     limpar_dados_antigos,
 )
 
@@ -18,8 +22,12 @@ __all__ = [
     "get_resumo_dia",
     "get_resumo_cliente_dia",
     "get_historico_cliente",
+    "get_historico_cliente_pagina",
+    "iterar_historico_cliente",
+    "aiterar_historico_cliente",
     "get_log_evento",
     "get_estatisticas_diarias",
     "get_resumo_cliente_periodo",
+    "compactar_metricas_diarias",
     "limpar_dados_antigos",
 ]
\ No newline at end of file
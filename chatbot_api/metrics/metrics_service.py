@@ -1,14 +1,21 @@
+import base64
 import logging
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator, AsyncIterator, Tuple
+from uuid import UUID
 from django.db import transaction
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
 from django.utils import timezone as django_timezone
 
-from chatbot_api.models import LogMetrica
+from chatbot_api.models import LogMetrica, MetricaDiaria
+from chatbot_api.metrics.particoes import limpar_particao_default, particionamento_ativo, remover_particoes_antigas
 
 logger = logging.getLogger("metrics-service")
 
+TIPO_METRICA_LABELS = dict(LogMetrica.TIPO_CHOICES)
+CAMPOS_HISTORICO = ('id', 'cliente_id', 'event_id', 'tipo_metrica', 'status', 'detalhes', 'criado_em')
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # FUNÇÃO PRINCIPAL: Registrar Evento
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -93,11 +100,12 @@ def get_total_dia(tipo_metrica: str, date: Optional[str] = None) -> int:
     try:
         data_obj = datetime.strptime(date, "%Y-%m-%d"). date()
 
-        total = LogMetrica.objects.filter(
+        total = MetricaDiaria.objects.filter(
+            data=data_obj,
             tipo_metrica=tipo_metrica,
             status='success',
-            criado_em__date=data_obj,
-        ).count()
+            cliente_id=MetricaDiaria.CLIENTE_GLOBAL,
+        ).aggregate(total=Sum('total'))['total'] or 0
         
         logger.debug(f"🔍 Query: {tipo_metrica} ({date}) = {total}")
         return total
@@ -124,12 +132,12 @@ def get_total_cliente_dia(cliente_id: str, tipo_metrica: str, date: Optional[str
     try:
         data_obj = datetime.strptime(date, "%Y-%m-%d").date()
         
-        total = LogMetrica.objects.filter(
+        total = MetricaDiaria.objects.filter(
+            data=data_obj,
             cliente_id=cliente_id,
             tipo_metrica=tipo_metrica,
             status='success',
-            criado_em__date=data_obj,
-        ).count()
+        ).aggregate(total=Sum('total'))['total'] or 0
         
         logger.debug(f"🔍 Query: Cliente {cliente_id} | {tipo_metrica} ({date}) = {total}")
         return total
@@ -184,6 +192,162 @@ def get_resumo_cliente_dia(cliente_id: str, date: Optional[str] = None) -> Dict[
 # CONSULTAS: Histórico e Auditoria
 # ═══════════════════════════════════════════════════════════════════════════════
 
+def _serializar_log(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte uma linha de .values() no formato público do histórico."""
+    return {
+        'id': str(row['id']),
+        'cliente_id': row['cliente_id'],
+        'event_id': row['event_id'],
+        'tipo_metrica': TIPO_METRICA_LABELS.get(row['tipo_metrica'], row['tipo_metrica']),
+        'status': row['status'],
+        'detalhes': row['detalhes'],
+        'criado_em': row['criado_em'].isoformat(),
+    }
+
+def codificar_cursor(criado_em: datetime, log_id) -> str:
+    """Gera um cursor opaco (base64 url-safe) a partir da chave (criado_em, id)."""
+    bruto = f"{criado_em.isoformat()}|{log_id}"
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii')
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """
+    Decodifica o cursor opaco de volta para (criado_em, id).
+    
+    :raises ValueError: Se o cursor for inválido
+    """
+    try:
+        bruto = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        criado_em_iso, log_id = bruto.split('|', 1)
+        return datetime.fromisoformat(criado_em_iso), UUID(log_id)
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+def _queryset_historico(
+    cliente_id: str,
+    limite_dias: int,
+    tipo_filtro: Optional[str],
+    status_filtro: Optional[str],
+):
+    data_limite = datetime.now(timezone.utc) - timedelta(days=limite_dias)
+    
+    queryset = LogMetrica.objects.filter(
+        cliente_id=cliente_id,
+        criado_em__gte=data_limite,
+    )
+    
+    if tipo_filtro:
+        queryset = queryset.filter(tipo_metrica=tipo_filtro)
+    
+    if status_filtro:
+        queryset = queryset.filter(status=status_filtro)
+    
+    return queryset.order_by('-criado_em', '-id')
+
+def _lote_apos_cursor(queryset, cursor: Optional[Tuple[datetime, UUID]], tamanho: int):
+    """
+    Lote seguinte via keyset pagination em (criado_em, id) DESC, coberto pelo índice
+    (cliente_id, criado_em, id). Cada lote é uma query limitada, sem OFFSET.
+    """
+    if cursor:
+        criado_em, log_id = cursor
+        queryset = queryset.filter(
+            Q(criado_em__lt=criado_em) | Q(criado_em=criado_em, id__lt=log_id)
+        )
+    return queryset.values(*CAMPOS_HISTORICO)[:tamanho]
+
+def _buscar_lote(queryset, cursor: Optional[Tuple[datetime, UUID]], tamanho: int) -> List[Dict[str, Any]]:
+    return list(_lote_apos_cursor(queryset, cursor, tamanho).iterator(chunk_size=tamanho))
+
+def iterar_historico_cliente(
+    cliente_id: str,
+    limite_dias: int = 30,
+    tipo_filtro: Optional[str] = None,
+    status_filtro: Optional[str] = None,
+    tamanho_lote: int = 500,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Gerador do histórico de um cliente (mais recente primeiro), em lotes via keyset.
+    Memória constante independentemente do intervalo consultado.
+    
+    :param cliente_id: ID do cliente
+    :param limite_dias: Número de dias a retroceder (padrão: 30)
+    :param tipo_filtro: Filtrar por tipo ('agendamento', 'cancelamento', 'lembrete')
+    :param status_filtro: Filtrar por status ('success', 'failed')
+    :param tamanho_lote: Linhas por query (padrão: 500)
+    :return: Iterador de dicts com logs detalhados
+    """
+    
+    queryset = _queryset_historico(cliente_id, limite_dias, tipo_filtro, status_filtro)
+    cursor = None
+    
+    while True:
+        lote = _buscar_lote(queryset, cursor, tamanho_lote)
+        for row in lote:
+            yield _serializar_log(row)
+        
+        if len(lote) < tamanho_lote:
+            return
+        cursor = (lote[-1]['criado_em'], lote[-1]['id'])
+
+async def aiterar_historico_cliente(
+    cliente_id: str,
+    limite_dias: int = 30,
+    tipo_filtro: Optional[str] = None,
+    status_filtro: Optional[str] = None,
+    tamanho_lote: int = 500,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Versão async de `iterar_historico_cliente` (ORM async), para streaming em views ASGI.
+    Só um lote fica em memória por vez; um gerador sync seria consumido inteiro pelo
+    StreamingHttpResponse sob ASGI antes do primeiro byte.
+    """
+    
+    queryset = _queryset_historico(cliente_id, limite_dias, tipo_filtro, status_filtro)
+    cursor = None
+    
+    while True:
+        lote = [row async for row in _lote_apos_cursor(queryset, cursor, tamanho_lote)]
+        for row in lote:
+            yield _serializar_log(row)
+        
+        if len(lote) < tamanho_lote:
+            return
+        cursor = (lote[-1]['criado_em'], lote[-1]['id'])
+
+def get_historico_cliente_pagina(
+    cliente_id: str,
+    cursor: Optional[str] = None,
+    limite: int = 100,
+    limite_dias: int = 30,
+    tipo_filtro: Optional[str] = None,
+    status_filtro: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Retorna UMA página do histórico de um cliente, paginada por cursor (keyset).
+    
+    :param cliente_id: ID do cliente
+    :param cursor: Cursor opaco retornado na página anterior (None = primeira página)
+    :param limite: Tamanho da página
+    :param limite_dias: Número de dias a retroceder (padrão: 30)
+    :param tipo_filtro: Filtrar por tipo ('agendamento', 'cancelamento', 'lembrete')
+    :param status_filtro: Filtrar por status ('success', 'failed')
+    :return: Dict com {resultados, proximo_cursor}
+    :raises ValueError: Se o cursor for inválido
+    """
+    
+    chave = decodificar_cursor(cursor) if cursor else None
+    queryset = _queryset_historico(cliente_id, limite_dias, tipo_filtro, status_filtro)
+    
+    # Busca 1 linha extra apenas para saber se existe próxima página
+    lote = _buscar_lote(queryset, chave, limite + 1)
+    tem_proxima = len(lote) > limite
+    lote = lote[:limite]
+    
+    return {
+        'resultados': [_serializar_log(row) for row in lote],
+        'proximo_cursor': codificar_cursor(lote[-1]['criado_em'], lote[-1]['id']) if tem_proxima else None,
+    }
+
 def get_historico_cliente(
     cliente_id: str,
     limite_dias: int = 30,
@@ -193,6 +357,8 @@ def get_historico_cliente(
     """
     Retorna o histórico completo de um cliente (últimos N dias).
     
+    Para intervalos grandes prefira `iterar_historico_cliente` ou `get_historico_cliente_pagina`.
+    
     :param cliente_id: ID do cliente
     :param limite_dias: Número de dias a retroceder (padrão: 30)
     :param tipo_filtro: Filtrar por tipo ('agendamento', 'cancelamento', 'lembrete')
@@ -201,31 +367,7 @@ def get_historico_cliente(
     """
     
     try:
-        data_limite = datetime.now(timezone.utc) - timedelta(days=limite_dias)
-        
-        queryset = LogMetrica.objects. filter(
-            cliente_id=cliente_id,
-            criado_em__gte=data_limite,
-        ). order_by('-criado_em')
-        
-        if tipo_filtro:
-            queryset = queryset.filter(tipo_metrica=tipo_filtro)
-        
-        if status_filtro:
-            queryset = queryset.filter(status=status_filtro)
-        
-        return [
-            {
-                'id': str(log.id),
-                'cliente_id': log.cliente_id,
-                'event_id': log.event_id,
-                'tipo_metrica': log.get_tipo_metrica_display(),
-                'status': log.status,
-                'detalhes': log.detalhes,
-                'criado_em': log.criado_em.isoformat(),
-            }
-            for log in queryset
-        ]
+        return list(iterar_historico_cliente(cliente_id, limite_dias, tipo_filtro, status_filtro))
     
     except Exception as e:
         logger.error(f"❌ Erro ao consultar histórico: {e}")
@@ -267,7 +409,7 @@ def get_estatisticas_diarias(data_inicio: str, data_fim: str) -> Dict[str, Any]:
     """
     Retorna estatísticas agregadas entre duas datas.
     
-    Ideal para relatórios mensal/semanal.
+    Ideal para relatórios mensal/semanal. Lê apenas o rollup diário (custo O(dias)).
     
     :param data_inicio: Data no formato YYYY-MM-DD
     :param data_fim: Data no formato YYYY-MM-DD
@@ -278,29 +420,31 @@ def get_estatisticas_diarias(data_inicio: str, data_fim: str) -> Dict[str, Any]:
         data_inicio_obj = datetime.strptime(data_inicio, "%Y-%m-%d"). date()
         data_fim_obj = datetime.strptime(data_fim, "%Y-%m-%d").date()
         
-        queryset = LogMetrica.objects. filter(
-            criado_em__date__gte=data_inicio_obj,
-            criado_em__date__lte=data_fim_obj,
+        queryset = MetricaDiaria.objects.filter(
+            data__gte=data_inicio_obj,
+            data__lte=data_fim_obj,
+            cliente_id=MetricaDiaria.CLIENTE_GLOBAL,
         )
         
-        stats = queryset.values('tipo_metrica', 'status').annotate(
-            count=Count('id')
-        ).order_by('tipo_metrica', 'status')
+        stats = list(queryset.values('tipo_metrica', 'status').annotate(
+            count=Sum('total')
+        ).order_by('tipo_metrica', 'status'))
         
-        por_tipo = queryset.filter(status='success').values('tipo_metrica').annotate(
-            count=Count('id')
-        ).order_by('tipo_metrica')
+        por_tipo = [
+            {'tipo_metrica': item['tipo_metrica'], 'count': item['count']}
+            for item in stats if item['status'] == 'success'
+        ]
         
         return {
             'periodo': {
                 'inicio': data_inicio,
                 'fim': data_fim,
             },
-            'total_eventos': queryset.count(),
-            'total_sucesso': queryset.filter(status='success').count(),
-            'total_falhas': queryset.filter(status='failed').count(),
-            'por_tipo_status': list(stats),
-            'por_tipo_sucesso': list(por_tipo),
+            'total_eventos': sum(item['count'] for item in stats),
+            'total_sucesso': sum(item['count'] for item in stats if item['status'] == 'success'),
+            'total_falhas': sum(item['count'] for item in stats if item['status'] == 'failed'),
+            'por_tipo_status': stats,
+            'por_tipo_sucesso': por_tipo,
         }
     
     except Exception as e:
@@ -310,6 +454,7 @@ def get_estatisticas_diarias(data_inicio: str, data_fim: str) -> Dict[str, Any]:
 def get_resumo_cliente_periodo(cliente_id: str, data_inicio: str, data_fim: str) -> Dict[str, Any]:
     """
     Retorna resumo de um cliente em um período específico.
+    Lê apenas o rollup diário do cliente (custo O(dias), não O(eventos)).
     
     :param cliente_id: ID do cliente
     :param data_inicio: Data no formato YYYY-MM-DD
@@ -321,16 +466,19 @@ def get_resumo_cliente_periodo(cliente_id: str, data_inicio: str, data_fim: str)
         data_inicio_obj = datetime.strptime(data_inicio, "%Y-%m-%d").date()
         data_fim_obj = datetime.strptime(data_fim, "%Y-%m-%d").date()
         
-        queryset = LogMetrica.objects.filter(
+        queryset = MetricaDiaria.objects.filter(
             cliente_id=cliente_id,
-            criado_em__date__gte=data_inicio_obj,
-            criado_em__date__lte=data_fim_obj,
+            data__gte=data_inicio_obj,
+            data__lte=data_fim_obj,
             status='success',
         )
         
-        por_tipo = queryset.values('tipo_metrica').annotate(
-            count=Count('id')
-        ).order_by('tipo_metrica')
+        por_tipo = {
+            item['tipo_metrica']: item['count']
+            for item in queryset.values('tipo_metrica').annotate(
+                count=Sum('total')
+            ).order_by('tipo_metrica')
+        }
         
         return {
             'cliente_id': cliente_id,
@@ -338,14 +486,93 @@ def get_resumo_cliente_periodo(cliente_id: str, data_inicio: str, data_fim: str)
                 'inicio': data_inicio,
                 'fim': data_fim,
             },
-            'total_eventos': queryset.count(),
-            'por_tipo': {item['tipo_metrica']: item['count'] for item in por_tipo},
+            'total_eventos': sum(por_tipo.values()),
+            'por_tipo': por_tipo,
         }
     
     except Exception as e:
         logger.error(f"❌ Erro ao consultar resumo do cliente: {e}")
         return {}
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# ROLLUP: Compactação Periódica do Agregado Diário
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def compactar_metricas_diarias(data_inicio: Optional[str] = None, data_fim: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Recalcula o rollup diário (MetricaDiaria) a partir dos logs brutos no intervalo.
+    
+    O rollup já é mantido incrementalmente no registro; esta rotina corrige
+    eventuais divergências (ex: falhas parciais). Só deve cobrir dias já fechados
+    e que ainda possuem logs brutos, pois as linhas do intervalo são substituídas.
+    
+    :param data_inicio: Data no formato YYYY-MM-DD (padrão: ontem)
+    :param data_fim: Data no formato YYYY-MM-DD (padrão: data_inicio)
+    :return: Dict com o número de linhas de rollup reescritas
+    """
+    
+    try:
+        ontem = django_timezone.localdate() - timedelta(days=1)
+        data_inicio_obj = datetime.strptime(data_inicio, "%Y-%m-%d").date() if data_inicio else ontem
+        data_fim_obj = datetime.strptime(data_fim, "%Y-%m-%d").date() if data_fim else data_inicio_obj
+        
+        agregados = LogMetrica.objects.annotate(
+            dia=TruncDate('criado_em')
+        ).filter(
+            dia__gte=data_inicio_obj,
+            dia__lte=data_fim_obj,
+        ).values('dia', 'tipo_metrica', 'status', 'cliente_id').annotate(
+            total=Count('id')
+        ).order_by()
+        
+        globais: Dict[tuple, int] = {}
+        linhas = []
+        for item in agregados:
+            chave_global = (item['dia'], item['tipo_metrica'], item['status'])
+            globais[chave_global] = globais.get(chave_global, 0) + item['total']
+            if item['cliente_id'] == MetricaDiaria.CLIENTE_GLOBAL:
+                # Log legado sem cliente: entra só no total global (evita colidir com a linha GLOBAL)
+                continue
+            linhas.append(MetricaDiaria(
+                data=item['dia'],
+                tipo_metrica=item['tipo_metrica'],
+                status=item['status'],
+                cliente_id=item['cliente_id'],
+                total=item['total'],
+            ))
+        
+        for (dia, tipo_metrica, status), total in globais.items():
+            linhas.append(MetricaDiaria(
+                data=dia,
+                tipo_metrica=tipo_metrica,
+                status=status,
+                cliente_id=MetricaDiaria.CLIENTE_GLOBAL,
+                total=total,
+            ))
+        
+        with transaction.atomic():
+            MetricaDiaria.objects.filter(
+                data__gte=data_inicio_obj,
+                data__lte=data_fim_obj,
+            ).delete()
+            MetricaDiaria.objects.bulk_create(linhas, batch_size=1000)
+        
+        logger.info(
+            f"📊 Rollup diário compactado | "
+            f"Período: {data_inicio_obj} a {data_fim_obj} | Linhas: {len(linhas)}"
+        )
+        
+        return {
+            'status': 'success',
+            'inicio': data_inicio_obj.isoformat(),
+            'fim': data_fim_obj.isoformat(),
+            'linhas': len(linhas),
+        }
+    
+    except Exception as e:
+        logger.error(f"❌ Erro ao compactar rollup diário: {e}", exc_info=True)
+        return {'status': 'error', 'error': str(e)}
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # LIMPEZA: Função para Remover Dados Antigos (Opcional)
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -354,15 +581,32 @@ def limpar_dados_antigos(dias_retencao: int = 90) -> Dict[str, int]:
     """
     Remove registros de métricas com mais de N dias.
     
+    Com a tabela particionada (PostgreSQL), remove partições mensais inteiras
+    que terminam antes do limite (DETACH + DROP em transação curta, sem DELETE linha a
+    linha) e apaga em lotes as linhas antigas da partição DEFAULT. O rollup
+    diário (MetricaDiaria) é preservado.
+    
     ⚠️ Use com cuidado!  Dados deletados NÃO podem ser recuperados. 
     
     :param dias_retencao: Número de dias a manter (padrão: 90)
-    :return: Dict com número de registros deletados
+    :return: Dict com número de registros/partições deletados
     """
     
     try:
         data_limite = datetime.now(timezone.utc) - timedelta(days=dias_retencao)
         
+        if particionamento_ativo():
+            removidas = remover_particoes_antigas(data_limite)
+            deletados_default = limpar_particao_default(data_limite)
+            logger.warning(f"🗑️ {len(removidas)} partições antigas foram removidas")
+            
+            return {
+                'status': 'success',
+                'particoes_removidas': removidas,
+                'deletados_default': deletados_default,
+                'data_limite': data_limite.isoformat(),
+            }
+        
         deleted_count, _ = LogMetrica.objects. filter(
             criado_em__lt=data_limite
         ).delete()
@@ -0,0 +1,211 @@
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any
+
+from django.db import OperationalError, connection, transaction
+
+from chatbot_api.models import LogMetrica
+
+logger = logging.getLogger("metrics-particoes")
+
+TABELA_LOGS = LogMetrica._meta.db_table
+PREFIXO_PARTICAO = f"{TABELA_LOGS}_p"
+
+# DETACH sem CONCURRENTLY (o PostgreSQL recusa CONCURRENTLY com partição DEFAULT) pede
+# ACCESS EXCLUSIVE na tabela pai: espera no máximo DETACH_LOCK_TIMEOUT_MS pelo lock para
+# não enfileirar os INSERTs de métricas atrás dele, e tenta de novo depois.
+DETACH_LOCK_TIMEOUT_MS = int(os.environ.get('METRICAS_DETACH_LOCK_TIMEOUT_MS', 2000))
+DETACH_TENTATIVAS = int(os.environ.get('METRICAS_DETACH_TENTATIVAS', 5))
+DETACH_ESPERA_S = float(os.environ.get('METRICAS_DETACH_ESPERA_S', 2.0))
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# HELPERS: Nomes e Limites das Partições Mensais (UTC)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _inicio_mes(ano: int, mes: int) -> datetime:
+    return datetime(ano, mes, 1, tzinfo=timezone.utc)
+
+def _proximo_mes(ano: int, mes: int) -> tuple:
+    return (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+def nome_particao(ano: int, mes: int) -> str:
+    """Ex: logs_metricas_p202610"""
+    return f"{PREFIXO_PARTICAO}{ano:04d}{mes:02d}"
+
+def particionamento_ativo() -> bool:
+    """
+    Retorna True se o banco é PostgreSQL e a tabela de logs já é particionada.
+    Em SQLite (dev) ou antes da migração, a retenção cai no DELETE tradicional.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s
+            """,
+            [TABELA_LOGS],
+        )
+        return cursor.fetchone() is not None
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CRIAÇÃO: Partições Futuras
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def criar_particao_mensal(ano: int, mes: int) -> bool:
+    """
+    Cria (se não existir) a partição do mês informado.
+
+    :return: True se a partição foi criada agora, False se já existia
+    """
+    nome = nome_particao(ano, mes)
+    inicio = _inicio_mes(ano, mes)
+    fim = _inicio_mes(*_proximo_mes(ano, mes))
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [nome])
+        if cursor.fetchone()[0] is not None:
+            return False
+
+        cursor.execute(
+            f"CREATE TABLE {connection.ops.quote_name(nome)} "
+            f"PARTITION OF {connection.ops.quote_name(TABELA_LOGS)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [inicio, fim],
+        )
+
+    logger.info(f"🧱 Partição {nome} criada ({inicio.date()} → {fim.date()})")
+    return True
+
+def garantir_particoes_futuras(meses_a_frente: int = 3) -> Dict[str, Any]:
+    """
+    Garante que existam partições do mês atual até N meses à frente.
+    Idempotente: pode ser executada diariamente.
+
+    :param meses_a_frente: Quantidade de meses futuros a pré-criar (padrão: 3)
+    :return: Dict com as partições criadas
+    """
+    if not particionamento_ativo():
+        return {'status': 'skipped', 'message': 'Tabela de logs não é particionada.', 'criadas': []}
+
+    hoje = datetime.now(timezone.utc)
+    ano, mes = hoje.year, hoje.month
+    criadas = []
+
+    with transaction.atomic():
+        for _ in range(meses_a_frente + 1):
+            if criar_particao_mensal(ano, mes):
+                criadas.append(nome_particao(ano, mes))
+            ano, mes = _proximo_mes(ano, mes)
+
+    return {'status': 'success', 'criadas': criadas}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# RETENÇÃO: Remoção de Partições Inteiras
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def listar_particoes() -> List[Dict[str, Any]]:
+    """
+    Lista as partições mensais existentes, ordenadas da mais antiga para a mais nova.
+
+    :return: Lista de dicts {nome, inicio, fim}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = %s
+            ORDER BY c.relname
+            """,
+            [TABELA_LOGS],
+        )
+        nomes = [row[0] for row in cursor.fetchall()]
+
+    particoes = []
+    for nome in nomes:
+        sufixo = nome[len(PREFIXO_PARTICAO):]
+        if not nome.startswith(PREFIXO_PARTICAO) or len(sufixo) != 6 or not sufixo.isdigit():
+            continue  # Ex: partição DEFAULT
+        ano, mes = int(sufixo[:4]), int(sufixo[4:])
+        particoes.append({
+            'nome': nome,
+            'inicio': _inicio_mes(ano, mes),
+            'fim': _inicio_mes(*_proximo_mes(ano, mes)),
+        })
+    return particoes
+
+def remover_particoes_antigas(data_limite: datetime) -> List[str]:
+    """
+    Remove as partições cujo intervalo termina antes de `data_limite`.
+
+    A partição que contém `data_limite` é mantida inteira: a retenção passa a ter
+    granularidade mensal, sem DELETE linha a linha (sem bloat e sem locks longos).
+    Cada partição sai numa transação curta (DETACH + DROP) com lock_timeout; se o lock
+    da tabela pai não vier a tempo, tenta de novo até DETACH_TENTATIVAS vezes.
+
+    :param data_limite: Datetime (aware) de corte
+    :return: Lista com os nomes das partições removidas
+    :raises OperationalError: lock não obtido após todas as tentativas
+    """
+    removidas = []
+    for particao in listar_particoes():
+        if particao['fim'] > data_limite:
+            continue
+        _soltar_e_remover(particao['nome'])
+        removidas.append(particao['nome'])
+        logger.warning(f"🗑️ Partição {particao['nome']} removida (retenção)")
+    return removidas
+
+def _soltar_e_remover(nome_particao: str) -> None:
+    pai = connection.ops.quote_name(TABELA_LOGS)
+    nome = connection.ops.quote_name(nome_particao)
+    for tentativa in range(1, DETACH_TENTATIVAS + 1):
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT_MS}ms'")
+                cursor.execute(f"ALTER TABLE {pai} DETACH PARTITION {nome}")
+                cursor.execute(f"DROP TABLE {nome}")
+            return
+        except OperationalError as e:
+            if tentativa == DETACH_TENTATIVAS:
+                raise
+            logger.warning(
+                f"⚠️ Lock para remover {nome_particao} não obtido (tentativa {tentativa}): {e}. "
+                f"Nova tentativa em {DETACH_ESPERA_S}s."
+            )
+            time.sleep(DETACH_ESPERA_S)
+
+def limpar_particao_default(data_limite: datetime, lote: int = 5000) -> int:
+    """
+    Apaga da partição DEFAULT as linhas anteriores a `data_limite`, em lotes curtos
+    (a DEFAULT não tem intervalo próprio, então não sai por DETACH/DROP).
+
+    :return: Total de linhas removidas
+    """
+    default = connection.ops.quote_name(f"{TABELA_LOGS}_default")
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [f"{TABELA_LOGS}_default"])
+        if cursor.fetchone()[0] is None:
+            return 0
+
+    total = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {default} WHERE ctid IN "
+                f"(SELECT ctid FROM {default} WHERE criado_em < %s LIMIT %s)",
+                [data_limite, lote],
+            )
+            total += cursor.rowcount
+            if cursor.rowcount < lote:
+                break
+    if total:
+        logger.warning(f"🗑️ {total} linhas antigas removidas da partição DEFAULT (retenção)")
+    return total
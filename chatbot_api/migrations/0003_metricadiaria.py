@@ -0,0 +1,74 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:00
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def popular_rollup_diario(apps, schema_editor):
+    """Backfill: agrega os logs já existentes na tabela de rollup."""
+    LogMetrica = apps.get_model('chatbot_api', 'LogMetrica')
+    MetricaDiaria = apps.get_model('chatbot_api', 'MetricaDiaria')
+
+    agregados = (
+        LogMetrica.objects
+        .annotate(dia=TruncDate('criado_em'))
+        .values('dia', 'tipo_metrica', 'status', 'cliente_id')
+        .annotate(total=Count('id'))
+    )
+
+    globais = defaultdict(int)
+    linhas = []
+    for item in agregados.iterator():
+        globais[(item['dia'], item['tipo_metrica'], item['status'])] += item['total']
+        linhas.append(MetricaDiaria(
+            data=item['dia'],
+            tipo_metrica=item['tipo_metrica'],
+            status=item['status'],
+            cliente_id=item['cliente_id'],
+            total=item['total'],
+        ))
+
+    for (dia, tipo_metrica, status), total in globais.items():
+        linhas.append(MetricaDiaria(
+            data=dia,
+            tipo_metrica=tipo_metrica,
+            status=status,
+            cliente_id='',
+            total=total,
+        ))
+
+    MetricaDiaria.objects.bulk_create(linhas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot_api', '0002_logmetrica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('tipo_metrica', models.CharField(choices=[('agendamento', 'Agendamento'), ('cancelamento', 'Cancelamento'), ('lembrete', 'Lembrete Enviado')], max_length=20)),
+                ('status', models.CharField(choices=[('success', 'Sucesso'), ('failed', 'Falha'), ('pending', 'Pendente')], max_length=10)),
+                ('cliente_id', models.CharField(blank=True, default='', help_text='ID do cliente ou vazio para o total global do dia', max_length=50)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Métrica Diária',
+                'verbose_name_plural': 'Métricas Diárias',
+                'db_table': 'metricas_diarias',
+                'ordering': ['-data'],
+                'indexes': [models.Index(fields=['tipo_metrica', 'data'], name='metricas_di_tipo_data_idx'), models.Index(fields=['cliente_id', 'data'], name='metricas_di_cliente_data_idx')],
+                'constraints': [models.UniqueConstraint(fields=('data', 'tipo_metrica', 'status', 'cliente_id'), name='metricas_diarias_chave_unica')],
+            },
+        ),
+        migrations.RunPython(popular_rollup_diario, migrations.RunPython.noop),
+    ]
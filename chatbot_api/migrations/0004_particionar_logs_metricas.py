@@ -0,0 +1,138 @@
+# Converte logs_metricas em tabela particionada por mês (RANGE em criado_em).
+# Executa apenas em PostgreSQL; em outros bancos (ex: SQLite de dev) é um no-op.
+#
+# Roda com atomic = False para não segurar lock na tabela durante a cópia:
+#   1. Transação curta: renomeia a tabela atual para legado, cria a particionada (com PK,
+#      partições e os MESMOS índices que o estado do Django declara, com os nomes reais)
+#      -> a partir daqui as escritas novas já caem na tabela particionada.
+#   2. Move as linhas do legado em lotes de LOTE_COPIA, cada lote na sua transação.
+#   3. Remove a tabela legado (vazia).
+
+from datetime import datetime, timezone
+
+from django.db import migrations, transaction
+
+TABELA = 'logs_metricas'
+TABELA_LEGADO = 'logs_metricas_legado'
+MESES_A_FRENTE = 3
+LOTE_COPIA = 5000
+
+
+def _proximo_mes(ano, mes):
+    return (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def _indices_atuais(cursor):
+    """
+    Índices não-PK da tabela como o Django os criou: Index de Meta.indexes, db_index
+    (nomes com hash) e os `_like` (varchar_pattern_ops) das colunas CharField.
+    :return: [(nome, definição)] com a definição apontando para TABELA
+    """
+    cursor.execute(
+        """
+        SELECT ci.relname, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class ci ON ci.oid = i.indexrelid
+        JOIN pg_class ct ON ct.oid = i.indrelid
+        WHERE ct.relname = %s AND ct.relnamespace = current_schema()::regnamespace AND NOT i.indisprimary
+        ORDER BY ci.relname
+        """,
+        [TABELA],
+    )
+    return cursor.fetchall()
+
+
+def _criar_estrutura_particionada(cursor):
+    cursor.execute(f"SELECT min(criado_em) FROM {TABELA}")
+    mais_antigo = cursor.fetchone()[0]
+    agora = datetime.now(timezone.utc)
+    inicio = mais_antigo.astimezone(timezone.utc) if mais_antigo else agora
+
+    indices = _indices_atuais(cursor)
+    cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [TABELA]
+    )
+    pk = cursor.fetchone()[0]
+
+    # Libera os nomes (índices e PK) para a tabela nova; a legado some no fim da migração
+    cursor.execute(f"ALTER TABLE {TABELA} RENAME TO {TABELA_LEGADO}")
+    cursor.execute(f"ALTER TABLE {TABELA_LEGADO} RENAME CONSTRAINT {pk} TO {TABELA_LEGADO}_pkey")
+    for numero, (nome, _) in enumerate(indices):
+        cursor.execute(f"ALTER INDEX {nome} RENAME TO {TABELA_LEGADO}_idx{numero}")
+
+    cursor.execute(
+        f"CREATE TABLE {TABELA} (LIKE {TABELA_LEGADO} INCLUDING DEFAULTS INCLUDING STORAGE) "
+        f"PARTITION BY RANGE (criado_em)"
+    )
+
+    ano, mes = inicio.year, inicio.month
+    ultimo = (agora.year, agora.month)
+    for _ in range(MESES_A_FRENTE):
+        ultimo = _proximo_mes(*ultimo)
+
+    while (ano, mes) <= ultimo:
+        prox_ano, prox_mes = _proximo_mes(ano, mes)
+        cursor.execute(
+            f"CREATE TABLE {TABELA}_p{ano:04d}{mes:02d} PARTITION OF {TABELA} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [datetime(ano, mes, 1, tzinfo=timezone.utc), datetime(prox_ano, prox_mes, 1, tzinfo=timezone.utc)],
+        )
+        ano, mes = prox_ano, prox_mes
+
+    # Rede de segurança para linhas fora das partições mensais pré-criadas
+    cursor.execute(f"CREATE TABLE {TABELA}_default PARTITION OF {TABELA} DEFAULT")
+
+    # A chave de partição precisa fazer parte da PK em tabelas particionadas.
+    # Índices criados com a tabela vazia: instantâneo, sem rebuild depois da cópia.
+    cursor.execute(f"ALTER TABLE {TABELA} ADD CONSTRAINT {pk} PRIMARY KEY (id, criado_em)")
+    for _, definicao in indices:
+        cursor.execute(definicao)
+
+
+def particionar_logs_metricas(apps, schema_editor):
+    conexao = schema_editor.connection
+    if conexao.vendor != 'postgresql':
+        return
+
+    with transaction.atomic(using=conexao.alias), conexao.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABELA])
+        if not cursor.fetchone():
+            _criar_estrutura_particionada(cursor)
+        # Reexecução após interrupção no meio da cópia: a estrutura já existe, retoma os lotes
+        cursor.execute("SELECT to_regclass(%s)", [TABELA_LEGADO])
+        if cursor.fetchone()[0] is None:
+            return
+
+    # Move em lotes curtos: cada transação trava só LOTE_COPIA linhas do legado.
+    # Até o fim da cópia, consultas à tabela nova não enxergam as linhas ainda no legado.
+    while True:
+        with transaction.atomic(using=conexao.alias), conexao.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH lote AS (
+                    DELETE FROM {TABELA_LEGADO}
+                    WHERE ctid IN (SELECT ctid FROM {TABELA_LEGADO} LIMIT %s)
+                    RETURNING *
+                )
+                INSERT INTO {TABELA} SELECT * FROM lote
+                """,
+                [LOTE_COPIA],
+            )
+            if cursor.rowcount == 0:
+                break
+
+    with transaction.atomic(using=conexao.alias), conexao.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {TABELA_LEGADO}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chatbot_api', '0003_metricadiaria'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar_logs_metricas, migrations.RunPython.noop),
+    ]
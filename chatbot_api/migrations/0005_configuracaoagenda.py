@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot_api', '0004_particionar_logs_metricas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfiguracaoAgenda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=50, unique=True)),
+                ('configuracao', models.JSONField(help_text='JSON do modelo: expediente, pausas, feriados, duracao_slot_min')),
+                ('ativo', models.BooleanField(default=False)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Configuração de Agenda',
+                'verbose_name_plural': 'Configurações de Agenda',
+                'db_table': 'configuracoes_agenda',
+                'ordering': ['-atualizado_em'],
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:00
+#
+# db_index=True em appointment1/2_datetime. Um AlterField comum faria CREATE INDEX e
+# bloquearia escritas em chatbot_api_userregister durante a criação; no PostgreSQL os
+# índices são criados com CONCURRENTLY (fora de transação), com o mesmo nome que o Django
+# geraria para db_index, para que o estado das migrações continue batendo com o banco.
+
+from django.db import migrations, models
+
+TABELA = 'chatbot_api_userregister'
+CAMPOS = ('appointment1_datetime', 'appointment2_datetime')
+
+
+def _nome_indice(schema_editor, coluna):
+    return schema_editor._create_index_name(TABELA, [coluna], suffix='')
+
+
+def criar_indices(apps, schema_editor):
+    conexao = schema_editor.connection
+    UserRegister = apps.get_model('chatbot_api', 'UserRegister')
+    for campo in CAMPOS:
+        coluna = UserRegister._meta.get_field(campo).column
+        nome = _nome_indice(schema_editor, coluna)
+        if conexao.vendor != 'postgresql':
+            schema_editor.execute(
+                schema_editor._create_index_sql(UserRegister, fields=[UserRegister._meta.get_field(campo)])
+            )
+            continue
+
+        with conexao.cursor() as cursor:
+            # Um CONCURRENTLY interrompido deixa o índice inválido: recria do zero
+            cursor.execute(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s",
+                [nome],
+            )
+            existente = cursor.fetchone()
+            if existente and not existente[0]:
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(nome)}")
+            cursor.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {schema_editor.quote_name(nome)} "
+                f"ON {schema_editor.quote_name(TABELA)} ({schema_editor.quote_name(coluna)})"
+            )
+
+
+def remover_indices(apps, schema_editor):
+    conexao = schema_editor.connection
+    UserRegister = apps.get_model('chatbot_api', 'UserRegister')
+    for campo in CAMPOS:
+        nome = _nome_indice(schema_editor, UserRegister._meta.get_field(campo).column)
+        if conexao.vendor == 'postgresql':
+            schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {schema_editor.quote_name(nome)}")
+        else:
+            schema_editor.execute(schema_editor._delete_index_sql(UserRegister, nome))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chatbot_api', '0005_configuracaoagenda'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='userregister',
+                    name='appointment1_datetime',
+                    field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Data/Hora 1ª Consulta'),
+                ),
+                migrations.AlterField(
+                    model_name='userregister',
+                    name='appointment2_datetime',
+                    field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Data/Hora 2ª Consulta'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(criar_indices, remover_indices),
+            ],
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Troca o índice (cliente_id, criado_em) de logs_metricas por (cliente_id, criado_em, id),
+# que cobre a ordenação keyset do histórico (criado_em DESC, id DESC).
+#
+# logs_metricas é particionada (0004) e o PostgreSQL não aceita CREATE INDEX CONCURRENTLY
+# na tabela pai. Padrão sem bloquear escritas: índice ON ONLY no pai (inválido), índice
+# CONCURRENTLY em cada partição e ATTACH de cada um (o do pai fica válido no último).
+
+from django.db import migrations, models
+
+TABELA = 'logs_metricas'
+INDICE_NOVO = models.Index(fields=['cliente_id', 'criado_em', 'id'], name='logs_metric_cli_keyset_idx')
+INDICE_ANTIGO = models.Index(fields=['cliente_id', 'criado_em'], name='logs_metric_cliente_f044de_idx')
+COLUNAS_NOVO = '(cliente_id, criado_em, id)'
+
+
+def criar_indice_keyset(apps, schema_editor):
+    conexao = schema_editor.connection
+    if conexao.vendor != 'postgresql':
+        LogMetrica = apps.get_model('chatbot_api', 'LogMetrica')
+        schema_editor.add_index(LogMetrica, INDICE_NOVO)
+        schema_editor.remove_index(LogMetrica, INDICE_ANTIGO)
+        return
+
+    with conexao.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABELA])
+        particionada = cursor.fetchone() is not None
+        if not particionada:
+            cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDICE_NOVO.name} ON {TABELA} {COLUNAS_NOVO}")
+        else:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {INDICE_NOVO.name} ON ONLY {TABELA} {COLUNAS_NOVO}")
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+                [TABELA],
+            )
+            for (particao,) in cursor.fetchall():
+                indice_particao = f"{particao}_cli_keyset_idx"
+                cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {indice_particao} ON {particao} {COLUNAS_NOVO}")
+                cursor.execute(
+                    "SELECT 1 FROM pg_inherits WHERE inhrelid = %s::regclass AND inhparent = %s::regclass",
+                    [indice_particao, INDICE_NOVO.name],
+                )
+                if cursor.fetchone() is None:
+                    cursor.execute(f"ALTER INDEX {INDICE_NOVO.name} ATTACH PARTITION {indice_particao}")
+
+        # O novo índice cobre todas as consultas do antigo (mesmo prefixo)
+        cursor.execute(f"DROP INDEX IF EXISTS {INDICE_ANTIGO.name}")
+
+
+def remover_indice_keyset(apps, schema_editor):
+    LogMetrica = apps.get_model('chatbot_api', 'LogMetrica')
+    schema_editor.add_index(LogMetrica, INDICE_ANTIGO)
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDICE_NOVO.name}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('chatbot_api', '0006_indices_datetime_consultas'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(model_name='logmetrica', name=INDICE_ANTIGO.name),
+                migrations.AddIndex(model_name='logmetrica', index=INDICE_NOVO),
+            ],
+            database_operations=[
+                migrations.RunPython(criar_indice_keyset, remover_indice_keyset),
+            ],
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Q
+from django.utils import timezone
 
 class UserRegister(models.Model):
     """
@@ -11,17 +14,76 @@ class UserRegister(models.Model):
     # ----------------------------------------------------
     # --- SLOT 1: PRIMEIRA CONSULTA ---
     # ----------------------------------------------------
-    appointment1_datetime = models.DateTimeField(null=True, blank=True, verbose_name="Data/Hora 1ª Consulta")
+    appointment1_datetime = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name="Data/Hora 1ª Consulta")
     appointment1_gcal_id = models.CharField(max_length=255, null=True, blank=True, unique=True, verbose_name="ID Google Calendar 1")
 
     # ----------------------------------------------------
     # --- SLOT 2: SEGUNDA CONSULTA ---
     # ----------------------------------------------------
-    appointment2_datetime = models.DateTimeField(null=True, blank=True, verbose_name="Data/Hora 2ª Consulta")
+    appointment2_datetime = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name="Data/Hora 2ª Consulta")
     appointment2_gcal_id = models.CharField(max_length=255, null=True, blank=True, unique=True, verbose_name="ID Google Calendar 2")
 
+    NUMEROS_SLOT = (1, 2)
+
     def __str__(self):
         return self.chat_id
+
+    @classmethod
+    def ocupar_slot_livre(cls, chat_id: str, new_datetime, google_event_id: str) -> int | None:
+        """
+        Ocupa o primeiro slot livre (vazio ou já expirado) com UM UPDATE condicional por tentativa.
+        O resultado é decidido pelo número de linhas afetadas, sem SELECT FOR UPDATE
+        e sem lógica em Python segurando o lock da linha.
+
+        :return: Número do slot ocupado (1 ou 2) ou None se ambos estão ocupados/usuário inexistente
+        """
+        agora = timezone.now()
+
+        for numero in cls.NUMEROS_SLOT:
+            campo_datetime = f'appointment{numero}_datetime'
+            campo_gcal = f'appointment{numero}_gcal_id'
+
+            slot_livre = (
+                Q(**{f'{campo_gcal}__isnull': True})
+                | Q(**{campo_gcal: ''})
+                | Q(**{f'{campo_datetime}__lt': agora})
+            )
+            atualizados = cls.objects.filter(Q(chat_id=chat_id) & slot_livre).update(**{
+                campo_datetime: new_datetime,
+                campo_gcal: google_event_id,
+            })
+            if atualizados:
+                # .update() não dispara post_save: invalida o cache de perfil explicitamente
+                from chatbot_api.signals import agendar_invalidacao_perfis
+                agendar_invalidacao_perfis([chat_id])
+                return numero
+
+        return None
+
+    @classmethod
+    def liberar_slot(cls, chat_id: str, numero_consulta: int) -> bool:
+        """
+        Limpa o slot informado com UM UPDATE condicional (apenas se houver agendamento nele).
+
+        :return: True se o slot foi limpo, False se não havia agendamento (ou usuário inexistente)
+        """
+        if numero_consulta not in cls.NUMEROS_SLOT:
+            return False
+
+        campo_datetime = f'appointment{numero_consulta}_datetime'
+        campo_gcal = f'appointment{numero_consulta}_gcal_id'
+
+        atualizados = cls.objects.filter(
+            chat_id=chat_id,
+            **{f'{campo_gcal}__isnull': False},
+        ).exclude(**{campo_gcal: ''}).update(**{
+            campo_datetime: None,
+            campo_gcal: None,
+        })
+        if atualizados:
+            from chatbot_api.signals import agendar_invalidacao_perfis
+            agendar_invalidacao_perfis([chat_id])
+        return atualizados > 0
     
 from uuid import uuid4
 
@@ -82,7 +144,8 @@ class LogMetrica(models.Model):
         verbose_name = 'Log de Métrica'
         verbose_name_plural = 'Logs de Métricas'
         indexes = [
-            models.Index(fields=['cliente_id', 'criado_em']),
+            # Cobre o keyset do histórico: cliente_id = X ORDER BY criado_em DESC, id DESC
+            models.Index(fields=['cliente_id', 'criado_em', 'id'], name='logs_metric_cli_keyset_idx'),
             models.Index(fields=['tipo_metrica', 'criado_em']),
             models.Index(fields=['event_id']),
             models.Index(fields=['criado_em']),
@@ -103,11 +166,145 @@ class LogMetrica(models.Model):
         :param status: 'success', 'failed', 'pending'
         :param detalhes: Informações adicionais
         :return: Instância criada
+        :raises ValueError: cliente_id vazio (reservado para o total GLOBAL do rollup)
         """
-        return cls.objects.create(
+        if not cliente_id:
+            raise ValueError("cliente_id é obrigatório: vazio é reservado ao total GLOBAL do rollup.")
+        with transaction.atomic():
+            log = cls.objects.create(
+                cliente_id=cliente_id,
+                event_id=event_id,
+                tipo_metrica=tipo_metrica,
+                status=status,
+                detalhes=detalhes,
+            )
+            # Mantém o rollup diário na mesma transação do log bruto
+            MetricaDiaria.incrementar(
+                data=timezone.localdate(log.criado_em),
+                tipo_metrica=tipo_metrica,
+                status=status,
+                cliente_id=cliente_id,
+            )
+        return log
+
+    @classmethod
+    async def aregistrar_evento(cls, cliente_id: str, event_id: str, tipo_metrica: str, status: str = 'success', detalhes: str = ''):
+        """
+        Versão async de `registrar_evento` para as views ASGI.
+        O ORM async ainda não suporta `transaction.atomic`, então o bloco (log + rollup)
+        roda inteiro numa única chamada `sync_to_async`, preservando a atomicidade.
+        """
+        return await sync_to_async(cls.registrar_evento)(
             cliente_id=cliente_id,
             event_id=event_id,
             tipo_metrica=tipo_metrica,
             status=status,
             detalhes=detalhes,
-        )
\ No newline at end of file
+        )
+
+
+class MetricaDiaria(models.Model):
+    """
+    Rollup diário pré-agregado de LogMetrica, chaveado por (data, tipo_metrica, status, cliente_id).
+    Linhas com cliente_id vazio ('') guardam o total GLOBAL do dia.
+    Mantida incrementalmente no registro do evento e recompactada periodicamente pelo Celery.
+    """
+    CLIENTE_GLOBAL = ''
+
+    data = models.DateField()
+    tipo_metrica = models.CharField(max_length=20, choices=LogMetrica.TIPO_CHOICES)
+    status = models.CharField(max_length=10, choices=LogMetrica.STATUS_CHOICES)
+    cliente_id = models.CharField(
+        max_length=50,
+        blank=True,
+        default=CLIENTE_GLOBAL,
+        help_text="ID do cliente ou vazio para o total global do dia"
+    )
+    total = models.PositiveIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'metricas_diarias'
+        verbose_name = 'Métrica Diária'
+        verbose_name_plural = 'Métricas Diárias'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['data', 'tipo_metrica', 'status', 'cliente_id'],
+                name='metricas_diarias_chave_unica',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['tipo_metrica', 'data'], name='metricas_di_tipo_data_idx'),
+            models.Index(fields=['cliente_id', 'data'], name='metricas_di_cliente_data_idx'),
+        ]
+        ordering = ['-data']
+
+    def __str__(self):
+        return f"{self.data} - {self.tipo_metrica} - {self.status} - {self.cliente_id or 'GLOBAL'}: {self.total}"
+
+    @classmethod
+    def incrementar(cls, data, tipo_metrica: str, status: str, cliente_id: str, quantidade: int = 1):
+        """
+        Upsert incremental do rollup: soma `quantidade` na linha global e na linha do cliente.
+        Usa UPDATE com F() e só cria a linha se ela ainda não existir (com retry em caso de corrida).
+        Um cliente_id igual ao sentinela GLOBAL só conta uma vez (na linha global).
+        """
+        clientes = (cls.CLIENTE_GLOBAL,) if cliente_id == cls.CLIENTE_GLOBAL else (cls.CLIENTE_GLOBAL, cliente_id)
+        for cliente in clientes:
+            chave = {
+                'data': data,
+                'tipo_metrica': tipo_metrica,
+                'status': status,
+                'cliente_id': cliente,
+            }
+            atualizados = cls.objects.filter(**chave).update(
+                total=F('total') + quantidade,
+                atualizado_em=timezone.now(),
+            )
+            if atualizados:
+                continue
+
+            try:
+                with transaction.atomic():
+                    cls.objects.create(total=quantidade, **chave)
+            except IntegrityError:
+                # Outra transação criou a linha entre o UPDATE e o INSERT
+                cls.objects.filter(**chave).update(
+                    total=F('total') + quantidade,
+                    atualizado_em=timezone.now(),
+                )
+
+class ConfiguracaoAgenda(models.Model):
+    """
+    Modelo de agenda (expediente por dia da semana, pausas, feriados e duração dos slots)
+    no formato de services/modelos_agenda.py. A configuração ativa mais recente é publicada
+    no Redis a cada alteração (chatbot_api/signals.py) e lida pelo worker e pelo Celery.
+    """
+    nome = models.CharField(max_length=50, unique=True)
+    configuracao = models.JSONField(help_text="JSON do modelo: expediente, pausas, feriados, duracao_slot_min")
+    ativo = models.BooleanField(default=False)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'configuracoes_agenda'
+        verbose_name = 'Configuração de Agenda'
+        verbose_name_plural = 'Configurações de Agenda'
+        ordering = ['-atualizado_em']
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from services.modelos_agenda import ModeloAgenda
+
+        try:
+            ModeloAgenda.de_dict({**self.configuracao, "nome": self.nome})
+        except ValueError as e:
+            raise ValidationError({'configuracao': str(e)})
+
+    @classmethod
+    def modelo_publicavel(cls) -> dict | None:
+        """Configuração ativa mais recente (com o nome embutido) ou None."""
+        ativa = cls.objects.filter(ativo=True).first()
+        return {**ativa.configuracao, "nome": ativa.nome} if ativa else None
+
+    def __str__(self):
+        return f"{self.nome}{' (ativo)' if self.ativo else ''}"
@@ -0,0 +1,33 @@
+import hmac
+import logging
+import os
+
+from rest_framework.permissions import BasePermission
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TOKEN INTERNO: Endpoints administrativos/auditoria (não usados pelo worker)
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# O nginx repassa `/` inteiro ao Django e o DRF não tem autenticação padrão, então os
+# endpoints sensíveis exigem o header X-Internal-Token igual a BAAS_TOKEN_INTERNO.
+# Sem a variável configurada, os endpoints ficam fechados (nunca abertos por omissão).
+
+HEADER_TOKEN_INTERNO = 'HTTP_X_INTERNAL_TOKEN'
+
+def token_interno_valido(request) -> bool:
+    """Compara o header X-Internal-Token com BAAS_TOKEN_INTERNO em tempo constante."""
+    esperado = os.environ.get('BAAS_TOKEN_INTERNO', '')
+    if not esperado:
+        logger.error("❌ BAAS_TOKEN_INTERNO não configurado: endpoint interno recusado.")
+        return False
+    recebido = request.META.get(HEADER_TOKEN_INTERNO, '')
+    return hmac.compare_digest(recebido.encode('utf-8'), esperado.encode('utf-8'))
+
+class TokenInterno(BasePermission):
+    """Permissão DRF para os endpoints internos (ver `token_interno_valido`)."""
+    message = "Token interno ausente ou inválido."
+
+    def has_permission(self, request, view):
+        return token_interno_valido(request)
@@ -0,0 +1,51 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from chatbot_api.models import ConfiguracaoAgenda, UserRegister
+from services.modelos_agenda import publicar_modelo
+from services.redis_client import invalidar_perfis_usuario
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# INVALIDAÇÃO DO CACHE DE PERFIL (cache:user_profile:{chat_id}) PUSHED PELO BaaS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def agendar_invalidacao_perfis(chat_ids) -> None:
+    """
+    Agenda a invalidação do cache de perfil para depois do COMMIT da transação atual
+    (imediata se não houver transação). Evita que o worker recarregue o dado antigo
+    entre a invalidação e o commit.
+
+    Use explicitamente após `.update()`/`bulk_update`, que não disparam post_save.
+    """
+    chat_ids = list(chat_ids)
+    if chat_ids:
+        transaction.on_commit(lambda: invalidar_perfis_usuario(chat_ids))
+
+@receiver(post_save, sender=UserRegister)
+def invalidar_perfil_ao_salvar(sender, instance, **kwargs):
+    agendar_invalidacao_perfis([instance.chat_id])
+
+@receiver(post_delete, sender=UserRegister)
+def invalidar_perfil_ao_remover(sender, instance, **kwargs):
+    agendar_invalidacao_perfis([instance.chat_id])
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MODELO DE AGENDA ATIVO PUBLICADO NO REDIS (lido por services/modelos_agenda.py)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _publicar_modelo_agenda():
+    try:
+        publicar_modelo(ConfiguracaoAgenda.modelo_publicavel())
+        logger.info("📆 Modelo de agenda ativo publicado no Redis.")
+    except Exception as e:
+        logger.error(f"❌ Falha ao publicar o modelo de agenda: {e}")
+
+@receiver(post_save, sender=ConfiguracaoAgenda)
+@receiver(post_delete, sender=ConfiguracaoAgenda)
+def publicar_modelo_agenda(sender, instance, **kwargs):
+    transaction.on_commit(_publicar_modelo_agenda)
@@ -1,7 +1,14 @@
+import os
 from celery import shared_task
+from celery.exceptions import MaxRetriesExceededError
 # Importe a nova função refatorada
 from workers.lembretes.lembrets import process_reminders
-from workers.cleanup.cleanup_service import run_daily_cleanup
+from chatbot_api.core_api.fechamento_agenda import NOTIFICACOES_POR_MINUTO
+from chatbot_api.core_api.limpeza_agendamentos import limpar_agendamentos_expirados
+from chatbot_api.metrics import compactar_metricas_diarias
+from chatbot_api.metrics import registrar_evento
+from chatbot_api.metrics.particoes import garantir_particoes_futuras
+from services.waha_api import Waha
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,10 +21,81 @@ def send_scheduled_reminders_task():
     process_reminders()
     logger.info("Task de lembretes finalizada pelo Celery.")
 
-@shared_task(name="cleanup_expired_appointments_task")
-def cleanup_expired_appointments_task():
+@shared_task(bind=True, name="cleanup_expired_appointments_task")
+def cleanup_expired_appointments_task(self):
     """
-    [Celery Task] Aciona a lógica de negócio de limpeza de DB.
+    [Celery Task] Limpa os agendamentos expirados direto no banco (sem HTTP para o BaaS),
+    em lotes por pk. O progresso de cada lote fica visível no estado PROGRESS da task.
     """
-    run_daily_cleanup()
-    logger.info("Task de limpeza finalizada pelo Celery.")
\ No newline at end of file
+    def reportar(parcial):
+        if self.request.id:
+            self.update_state(state='PROGRESS', meta=parcial)
+
+    resultado = limpar_agendamentos_expirados(progresso=reportar)
+    logger.info(f"Task de limpeza finalizada pelo Celery: {resultado}")
+    return resultado
+
+@shared_task(name="compactar_metricas_diarias_task")
+def compactar_metricas_diarias_task():
+    """
+    [Celery Task] Recompacta o rollup diário de métricas do dia anterior.
+    """
+    resultado = compactar_metricas_diarias()
+    logger.info(f"Task de compactação de métricas finalizada pelo Celery: {resultado}")
+
+@shared_task(name="garantir_particoes_metricas_task")
+def garantir_particoes_metricas_task():
+    """
+    [Celery Task] Pré-cria as partições mensais futuras de logs_metricas.
+    """
+    resultado = garantir_particoes_futuras()
+    logger.info(f"Task de partições de métricas finalizada pelo Celery: {resultado}")
+
+# Mesmo limite do espaçamento (countdown) de enfileirar_notificacoes; aqui vale por worker,
+# como rede de segurança se as tasks forem reenfileiradas sem o countdown
+@shared_task(name="notificar_fechamento_agenda_task", rate_limit=f"{NOTIFICACOES_POR_MINUTO}/m")
+def notificar_fechamento_agenda_task(chat_id: str, gcal_id: str, mensagem: str):
+    """
+    [Celery Task] Avisa um paciente que sua consulta foi cancelada pelo fechamento da agenda.
+    Enfileirada (com countdown) por chatbot_api.core_api.fechamento_agenda.
+    """
+    resposta = Waha().send_whatsapp_message(chat_id, mensagem)
+    registrar_evento(
+        cliente_id=chat_id,
+        event_id=gcal_id,
+        tipo_metrica='cancelamento',
+        status='success' if resposta is not None else 'failed',
+        detalhes="Consulta cancelada pelo fechamento da agenda; paciente avisado via WhatsApp."
+                 if resposta is not None else "Consulta cancelada pelo fechamento da agenda; falha ao avisar via WhatsApp.",
+    )
+
+def configurar_sessao_waha() -> bool:
+    """Uma tentativa de ativar a sessão do WAHA e configurar o webhook com HMAC."""
+    hmac_key = os.environ.get("WEBHOOK_HMAC_SECRET")
+    if not hmac_key:
+        logger.error("❌ WEBHOOK_HMAC_SECRET não encontrado. Não é possível configurar o cliente WAHA para enviar mensagens.")
+        return False
+    if Waha().start_session_with_hmac(hmac_key):
+        logger.info("✅ Ativação da sessão e configuração HMAC do WAHA concluídas com sucesso.")
+        return True
+    return False
+
+@shared_task(bind=True, name="configurar_sessao_waha_task", max_retries=10, default_retry_delay=10)
+def configurar_sessao_waha_task(self):
+    """
+    [Celery Task] Ativa a sessão do WAHA e configura o webhook com HMAC.
+    Disparada quando o worker do Celery sobe (chatbot/celery.py); antes rodava numa thread
+    bloqueante criada no AppConfig.ready() de todo processo Django (uvicorn, manage.py, Celery).
+    Cada falha vira um retry agendado, sem thread dormindo entre tentativas.
+    """
+    if not os.environ.get("WEBHOOK_HMAC_SECRET"):
+        return configurar_sessao_waha()  # Loga o erro; sem a chave não adianta tentar de novo
+    if configurar_sessao_waha():
+        return True
+
+    logger.warning(f" Tentativa {self.request.retries + 1}/{self.max_retries + 1} falhou. Aguardando {self.default_retry_delay}s...")
+    try:
+        self.retry()
+    except MaxRetriesExceededError:
+        logger.error("❌ Falha crítica: Não foi possível configurar a sessão do WAHA após todas as tentativas.")
+        return False
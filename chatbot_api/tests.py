@@ -1,3 +1,712 @@
-from django.test import TestCase
+import json
+import os
+import random
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import DatabaseError, OperationalError, connection
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from chatbot_api.core_api import fechamento_agenda
+from chatbot_api.metrics import limpar_dados_antigos, particoes
+from chatbot_api.models import LogMetrica, UserRegister
+from services import disponibilidade, modelos_agenda, redis_client, slot_holds
+from services.disponibilidade import AgendaDisponibilidade
+from services.local_cache import LocalTTLCache
+from services.modelos_agenda import ModeloAgenda
+from services.service_api_calendar import ServicesCalendar
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SLOTS DE AGENDAMENTO: UPDATE condicional (ocupar_slot_livre / liberar_slot)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class SlotsAgendamentoTests(TestCase):
+
+    def setUp(self):
+        self.agora = timezone.now()
+        self.user = UserRegister.objects.create(username="Ana", chat_id="5511999990000@c.us")
+
+    def _recarregar(self):
+        self.user.refresh_from_db()
+        return self.user
+
+    def test_ocupa_slots_em_ordem_e_recusa_quando_cheio(self):
+        amanha = self.agora + timedelta(days=1)
+
+        self.assertEqual(UserRegister.ocupar_slot_livre(self.user.chat_id, amanha, "evt-1"), 1)
+        self.assertEqual(UserRegister.ocupar_slot_livre(self.user.chat_id, amanha + timedelta(hours=1), "evt-2"), 2)
+        self.assertIsNone(UserRegister.ocupar_slot_livre(self.user.chat_id, amanha + timedelta(hours=2), "evt-3"))
+
+        user = self._recarregar()
+        self.assertEqual((user.appointment1_gcal_id, user.appointment2_gcal_id), ("evt-1", "evt-2"))
+        self.assertEqual(user.appointment1_datetime, amanha)
+
+    def test_reaproveita_slot_expirado(self):
+        UserRegister.objects.filter(pk=self.user.pk).update(
+            appointment1_datetime=self.agora - timedelta(days=1), appointment1_gcal_id="evt-velho",
+            appointment2_datetime=self.agora + timedelta(days=2), appointment2_gcal_id="evt-futuro",
+        )
+
+        self.assertEqual(UserRegister.ocupar_slot_livre(self.user.chat_id, self.agora + timedelta(days=3), "evt-novo"), 1)
+        user = self._recarregar()
+        self.assertEqual(user.appointment1_gcal_id, "evt-novo")
+        self.assertEqual(user.appointment2_gcal_id, "evt-futuro")
+
+    def test_gcal_vazio_conta_como_livre(self):
+        UserRegister.objects.filter(pk=self.user.pk).update(
+            appointment1_datetime=self.agora + timedelta(days=1), appointment1_gcal_id="",
+        )
+        self.assertEqual(UserRegister.ocupar_slot_livre(self.user.chat_id, self.agora + timedelta(days=2), "evt-1"), 1)
+
+    def test_usuario_inexistente(self):
+        self.assertIsNone(UserRegister.ocupar_slot_livre("nao-existe@c.us", self.agora, "evt-1"))
+        self.assertFalse(UserRegister.liberar_slot("nao-existe@c.us", 1))
+
+    def test_liberar_slot_so_afeta_slot_ocupado(self):
+        UserRegister.ocupar_slot_livre(self.user.chat_id, self.agora + timedelta(days=1), "evt-1")
+
+        self.assertFalse(UserRegister.liberar_slot(self.user.chat_id, 2))
+        self.assertTrue(UserRegister.liberar_slot(self.user.chat_id, 1))
+        self.assertFalse(UserRegister.liberar_slot(self.user.chat_id, 1))
+        self.assertFalse(UserRegister.liberar_slot(self.user.chat_id, 3))
+
+        user = self._recarregar()
+        self.assertIsNone(user.appointment1_datetime)
+        self.assertIsNone(user.appointment1_gcal_id)
+
+    def test_agenda_invalidacao_do_perfil_apos_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            UserRegister.ocupar_slot_livre(self.user.chat_id, self.agora + timedelta(days=1), "evt-1")
+        self.assertEqual(len(callbacks), 1)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            UserRegister.ocupar_slot_livre(self.user.chat_id, self.agora + timedelta(days=1), "evt-2")
+            UserRegister.ocupar_slot_livre(self.user.chat_id, self.agora + timedelta(days=1), "evt-3")
+        # Segunda chamada não ocupou nada (ambos cheios): só uma invalidação
+        self.assertEqual(len(callbacks), 1)
+
+    @mock.patch.dict(os.environ, {"BAAS_TOKEN_INTERNO": "segredo"})
+    def test_endpoint_de_limpeza_exige_token(self):
+        url = reverse('cleanup_expired_appointments')
+        self.assertEqual(self.client.post(url).status_code, 403)
+
+        resposta = self.client.post(url, HTTP_X_INTERNAL_TOKEN="segredo")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['status'], 'SUCCESS')
+
+        with mock.patch('chatbot_api.views.limpar_agendamentos_expirados', side_effect=DatabaseError("boom")):
+            resposta = self.client.post(url, HTTP_X_INTERNAL_TOKEN="segredo")
+        self.assertEqual(resposta.status_code, 500)
+        self.assertEqual(resposta.json()['status'], 'ERROR')
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# FECHAMENTO DA AGENDA: transação do UPDATE, avisos após o commit e endpoint interno
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class FechamentoAgendaTests(TestCase):
+
+    def setUp(self):
+        self.dia = (timezone.localtime() + timedelta(days=5)).date()
+        self.horario = timezone.make_aware(datetime.combine(self.dia, time(10, 0)))
+        self.user = UserRegister.objects.create(
+            username="Bia", chat_id="5511988880000@c.us",
+            appointment1_datetime=self.horario, appointment1_gcal_id="evt-fechado",
+        )
+        calendar = mock.patch.object(fechamento_agenda, 'ServicesCalendar')
+        self.calendar = calendar.start()
+        self.addCleanup(calendar.stop)
+        self.calendar.deletar_eventos_em_lote.return_value = {"removidos": ["evt-fechado"], "falhas": {}}
+        enfileirar = mock.patch.object(fechamento_agenda, 'enfileirar_notificacoes')
+        self.enfileirar = enfileirar.start()
+        self.addCleanup(enfileirar.stop)
+
+    def test_libera_slot_e_avisa_apos_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = fechamento_agenda.fechar_agenda(self.dia, self.dia, motivo="feriado")
+
+        self.assertEqual(resultado['status'], 'SUCCESS')
+        self.assertEqual((resultado['canceladas'], resultado['notificacoes']), (1, 1))
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.appointment1_gcal_id)
+        self.enfileirar.assert_called_once()
+
+    def test_falha_no_banco_devolve_ids_removidos_sem_avisar(self):
+        with mock.patch.object(fechamento_agenda, 'limpar_slots_por_evento', side_effect=DatabaseError("boom")), \
+                self.captureOnCommitCallbacks(execute=True):
+            resultado = fechamento_agenda.fechar_agenda(self.dia, self.dia)
+
+        self.assertEqual(resultado['codigo'], fechamento_agenda.ERRO_FALHA_BANCO)
+        self.assertEqual(resultado['gcal_ids_removidos'], ["evt-fechado"])
+        self.enfileirar.assert_not_called()
+
+    def test_periodo_invalido_tem_codigo(self):
+        resultado = fechamento_agenda.fechar_agenda(self.dia, self.dia - timedelta(days=1))
+        self.assertEqual(resultado['codigo'], fechamento_agenda.ERRO_PERIODO_INVALIDO)
+
+    @mock.patch.dict(os.environ, {"BAAS_TOKEN_INTERNO": "segredo"})
+    def test_endpoint_exige_token_e_flags_estritas(self):
+        url = reverse('fechar_agenda')
+        corpo = {"data_inicio": self.dia.isoformat(), "simular": "false", "notificar": "false"}
+
+        self.assertEqual(self.client.post(url, corpo).status_code, 403)
+
+        resposta = self.client.post(url, corpo, HTTP_X_INTERNAL_TOKEN="segredo")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertFalse(resposta.json()['simulacao'])
+        self.assertEqual(resposta.json()['notificacoes'], 0)
+
+        resposta = self.client.post(url, {**corpo, "simular": "talvez"}, HTTP_X_INTERNAL_TOKEN="segredo")
+        self.assertEqual(resposta.status_code, 400)
+
+        resposta = self.client.post(url, {"data_inicio": self.dia.isoformat(), "data_fim": "2000-01-01"},
+                                    HTTP_X_INTERNAL_TOKEN="segredo")
+        self.assertEqual(resposta.status_code, 400)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DISPONIBILIDADE: bitmaps por minuto (services/disponibilidade.py)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _inicios_forca_bruta(livre: int, duracao_min: int) -> int:
+    esperado = 0
+    for inicio in range(disponibilidade.MINUTOS_DIA - duracao_min + 1):
+        if all(livre >> m & 1 for m in range(inicio, inicio + duracao_min)):
+            esperado |= 1 << inicio
+    return esperado
+
+class _FreebusyFalso:
+    """service.freebusy().query(body=...).execute() com respostas fixas por agenda."""
+
+    def __init__(self, calendarios: dict):
+        self.calendarios = calendarios
+        self.consultas = []
+
+    def freebusy(self):
+        return self
+
+    def query(self, body):
+        self.consultas.append(body)
+        return self
+
+    def execute(self):
+        return {"calendars": self.calendarios}
+
+class DisponibilidadeTests(SimpleTestCase):
+
+    def setUp(self):
+        self.dia = date(2026, 11, 3)  # terça-feira
+        self.modelo = ModeloAgenda.de_dict({
+            "nome": "teste",
+            "duracao_slot_min": 60,
+            "expediente": {"*": [["08:00", "12:00"]]},
+        })
+
+    def test_inicios_livres_igual_a_forca_bruta(self):
+        aleatorio = random.Random(45)
+        for _ in range(40):
+            livre = disponibilidade.DIA_LIVRE
+            for _ in range(aleatorio.randint(0, 12)):
+                inicio = aleatorio.randrange(disponibilidade.MINUTOS_DIA)
+                livre &= ~disponibilidade.mascara(inicio, inicio + aleatorio.randint(1, 180))
+            for duracao in (1, 2, 3, 15, 30, 45, 50, 60, 90, 127, 240):
+                self.assertEqual(
+                    disponibilidade.inicios_livres(livre, duracao), _inicios_forca_bruta(livre, duracao),
+                    f"duracao={duracao}",
+                )
+
+    def test_inicio_nao_ultrapassa_o_fim_do_dia(self):
+        bits = disponibilidade.inicios_livres(disponibilidade.DIA_LIVRE, 60)
+        self.assertEqual(bits.bit_length() - 1, disponibilidade.MINUTOS_DIA - 60)
+
+    def test_bloco_ocupado_atravessando_meia_noite(self):
+        seguinte = self.dia + timedelta(days=1)
+        livres = disponibilidade.livre_a_partir_dos_blocos(
+            [{"start": "2026-11-03T23:30:00-03:00", "end": "2026-11-04T00:30:00-03:00"}],
+            [self.dia, seguinte],
+        )
+        self.assertEqual(livres[self.dia], disponibilidade.DIA_LIVRE & ~disponibilidade.mascara(23 * 60 + 30, 1440))
+        self.assertEqual(livres[seguinte], disponibilidade.DIA_LIVRE & ~disponibilidade.mascara(0, 30))
+
+    def test_bloco_em_utc_e_segundos_arredondam_para_cima(self):
+        livres = disponibilidade.livre_a_partir_dos_blocos(
+            [{"start": "2026-11-03T13:00:00Z", "end": "2026-11-03T13:30:10Z"}],  # 10:00-10:30:10 BR
+            [self.dia],
+        )
+        self.assertEqual(livres[self.dia], disponibilidade.DIA_LIVRE & ~disponibilidade.mascara(600, 631))
+
+    def test_primeiro_minuto_permitido_perto_da_meia_noite(self):
+        agora = datetime(2026, 11, 3, 23, 50, tzinfo=disponibilidade.BR_TIMEZONE)
+        primeiro = disponibilidade.primeiro_minuto_permitido
+
+        self.assertEqual(primeiro(self.dia - timedelta(days=1), agora), disponibilidade.MINUTOS_DIA)
+        self.assertEqual(primeiro(self.dia, agora), disponibilidade.MINUTOS_DIA)  # margem passa da meia-noite
+        self.assertEqual(primeiro(self.dia + timedelta(days=1), agora), 20)
+        self.assertEqual(primeiro(self.dia + timedelta(days=1), agora.replace(second=1)), 21)
+        self.assertEqual(primeiro(self.dia + timedelta(days=2), agora), 0)
+        # Mesmo instante informado em UTC
+        self.assertEqual(primeiro(self.dia + timedelta(days=1), agora.astimezone(dt_timezone.utc)), 20)
+
+    def test_qualquer_profissional_e_profissional_especifico(self):
+        service = _FreebusyFalso({
+            "a@agenda": {"busy": [{"start": "2026-11-03T08:00:00-03:00", "end": "2026-11-03T10:00:00-03:00"}]},
+            "b@agenda": {"busy": [{"start": "2026-11-03T10:00:00-03:00", "end": "2026-11-03T12:00:00-03:00"}]},
+        })
+        agenda = AgendaDisponibilidade(["a@agenda", "b@agenda"], modelo=self.modelo)
+        agenda.carregar(service, self.dia, self.dia)
+
+        self.assertEqual(len(service.consultas), 1)
+        self.assertEqual(agenda.horarios_livres(self.dia), ["08:00", "09:00", "10:00", "11:00"])
+        self.assertEqual(agenda.horarios_livres(self.dia, calendar_id="a@agenda"), ["10:00", "11:00"])
+        self.assertEqual(agenda.horarios_livres(self.dia, a_partir_de_min=9 * 60 + 1), ["10:00", "11:00"])
+        self.assertEqual(agenda.profissionais_livres(self.dia, 8 * 60), ["b@agenda"])
+        self.assertEqual(agenda.profissionais_livres(self.dia, 9 * 60 + 30), [])
+
+    def test_agenda_com_erro_no_freebusy_fica_ocupada(self):
+        service = _FreebusyFalso({
+            "a@agenda": {"errors": [{"reason": "notFound"}]},
+            "b@agenda": {"busy": []},
+        })
+        agenda = AgendaDisponibilidade(["a@agenda", "b@agenda", "c@agenda"], modelo=self.modelo)
+        agenda.carregar(service, self.dia, self.dia)
+
+        self.assertEqual(agenda.horarios_livres(self.dia, calendar_id="a@agenda"), [])
+        self.assertEqual(agenda.horarios_livres(self.dia, calendar_id="c@agenda"), [])  # ausente na resposta
+        self.assertEqual(agenda.profissionais_livres(self.dia, 8 * 60), ["b@agenda"])
+
+    def test_referencia_evento_ida_e_volta(self):
+        principal = disponibilidade.GOOGLE_CALENDAR_ID
+        self.assertEqual(disponibilidade.referencia_evento(principal, "abc"), "abc")
+        self.assertEqual(disponibilidade.separar_referencia_evento("abc"), (principal, "abc"))
+        referencia = disponibilidade.referencia_evento("outra@agenda", "xyz")
+        self.assertEqual(disponibilidade.separar_referencia_evento(referencia), ("outra@agenda", "xyz"))
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MODELOS DE AGENDA: grade, pausas e feriados (services/modelos_agenda.py)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class ModelosAgendaTests(SimpleTestCase):
+
+    def _modelo(self, **extras):
+        dados = {
+            "nome": "teste",
+            "duracao_slot_min": 60,
+            "expediente": {"*": [["08:00", "18:00"]], "dom": []},
+        }
+        dados.update(extras)
+        return ModeloAgenda.de_dict(dados)
+
+    def test_pausa_realinha_os_inicios(self):
+        modelo = self._modelo(pausas={"*": [["12:15", "13:00"]]})
+        self.assertEqual(modelos_agenda._segmentos_abertos(modelo, 0), [(480, 735), (780, 1080)])
+        self.assertEqual(
+            modelos_agenda.horarios_semanais(modelo, 0, 60),
+            ("08:00", "09:00", "10:00", "11:00", "13:00", "14:00", "15:00", "16:00", "17:00"),
+        )
+
+    def test_pausa_com_passo_menor_que_a_duracao(self):
+        modelo = self._modelo(passo_min=30, pausas={"*": [["12:00", "13:30"]]})
+        horarios = modelos_agenda.horarios_semanais(modelo, 0, 60)
+        self.assertIn("11:00", horarios)
+        self.assertNotIn("11:30", horarios)  # terminaria dentro da pausa
+        self.assertEqual(horarios[horarios.index("11:00") + 1], "13:30")
+        self.assertEqual(horarios[-1], "17:00")
+
+    def test_pausas_sobrepostas_e_fora_do_expediente(self):
+        modelo = self._modelo(pausas={"*": [["07:00", "09:00"], ["10:00", "11:00"], ["10:30", "12:00"]]})
+        self.assertEqual(modelos_agenda._segmentos_abertos(modelo, 0), [(540, 600), (720, 1080)])
+
+    def test_grade_do_dia_e_igual_aos_horarios(self):
+        modelo = self._modelo(duracoes={"sab": 30}, pausas={"sab": [["12:00", "14:00"]]})
+        sabado = date(2026, 11, 7)
+        bits = modelos_agenda.grade_do_dia(sabado, modelo=modelo)
+        self.assertEqual(
+            tuple(disponibilidade.formatar_minuto(m) for m in disponibilidade.minutos_ligados(bits)),
+            modelos_agenda.horarios_do_dia(sabado, modelo=modelo),
+        )
+        self.assertEqual(bin(bits).count("1"), 16)  # 08-12 e 14-18 em slots de 30 min
+
+    def test_feriado_recorrente_e_com_ano(self):
+        modelo = self._modelo(feriados=["12-25", "2026-11-02"])
+        natal = date(2026, 12, 25)
+        finados = date(2026, 11, 2)
+
+        for dia in (natal, date(2027, 12, 24) + timedelta(days=1), finados):
+            self.assertTrue(modelo.feriado(dia), dia)
+            self.assertTrue(modelo.fechado(dia), dia)
+            self.assertIsNone(modelo.janela(dia), dia)
+            self.assertEqual(modelos_agenda.grade_do_dia(dia, modelo=modelo), 0, dia)
+            self.assertEqual(modelos_agenda.horarios_do_dia(dia, modelo=modelo), (), dia)
+
+        # Feriado com ano vale só naquele ano
+        finados_2027 = date(2027, 11, 2)
+        self.assertFalse(modelo.feriado(finados_2027))
+        self.assertNotEqual(modelos_agenda.grade_do_dia(finados_2027, modelo=modelo), 0)
+
+    def test_dia_sem_expediente(self):
+        modelo = self._modelo()
+        domingo = date(2026, 11, 8)
+        self.assertTrue(modelo.fechado(domingo))
+        self.assertEqual(modelos_agenda.grade_do_dia(domingo, modelo=modelo), 0)
+
+    def test_modelos_iguais_compartilham_cache(self):
+        self.assertEqual(self._modelo(), self._modelo())
+        self.assertEqual(hash(self._modelo()), hash(self._modelo()))
+        self.assertNotEqual(self._modelo(), self._modelo(passo_min=30))
+
+    def test_modelos_invalidos_sao_rejeitados(self):
+        invalidos = {
+            "dia desconhecido": {"expediente": {"segunda": [["08:00", "12:00"]]}},
+            "fim antes do início": {"expediente": {"*": [["12:00", "08:00"]]}},
+            "intervalo vazio": {"expediente": {"*": [["08:00", "08:00"]]}},
+            "hora fora do dia": {"expediente": {"*": [["08:00", "25:00"]]}},
+            "minuto inválido": {"expediente": {"*": [["08:75", "12:00"]]}},
+            "hora sem formato": {"expediente": {"*": [["8h", "12h"]]}},
+            "intervalo sem fim": {"expediente": {"*": [["08:00"]]}},
+            "expediente não é dict": {"expediente": ["08:00", "12:00"]},
+            "pausa inválida": {"pausas": {"*": [["13:00", "12:00"]]}},
+            "duração zero": {"duracao_slot_min": 0},
+            "duração por dia negativa": {"duracoes": {"sab": -30}},
+            "duração não numérica": {"duracao_slot_min": "uma hora"},
+            "passo negativo": {"passo_min": -15},
+            "feriado inexistente": {"feriados": ["02-30"]},
+            "feriado mal formado": {"feriados": ["25/12"]},
+            "feriados como texto": {"feriados": "12-25"},
+        }
+        for descricao, extras in invalidos.items():
+            with self.subTest(descricao), self.assertRaises(ValueError):
+                self._modelo(**extras)
+
+    def test_modelo_padrao_e_valido(self):
+        modelo = ModeloAgenda.de_dict(modelos_agenda.MODELO_PADRAO)
+        self.assertEqual(modelos_agenda.horarios_semanais(modelo, 0, 60)[0], "07:00")
+        self.assertEqual(modelos_agenda.horarios_semanais(modelo, 0, 60)[-1], "19:00")
+        self.assertEqual(modelos_agenda.grade_semanal(modelo, 6, 60), 0)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# RESERVA DE SLOT NO REDIS (services/slot_holds.py)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class _RedisReservasFalso:
+    """Só o que slot_holds usa: os dois scripts Lua, executados em Python."""
+
+    def __init__(self):
+        self.dados = {}
+
+    def eval(self, script, numkeys, *args):
+        chaves, argv = list(args[:numkeys]), args[numkeys:]
+        if script == slot_holds._LUA_SEGURAR_RESERVA:
+            if any(chave in self.dados for chave in chaves):
+                return 0
+            for chave in chaves:
+                self.dados[chave] = argv[0]
+            return 1
+        if script == slot_holds._LUA_LIBERAR_RESERVA:
+            liberadas = [chave for chave in chaves if self.dados.get(chave) == argv[0]]
+            for chave in liberadas:
+                del self.dados[chave]
+            return len(liberadas)
+        raise AssertionError("script inesperado")
+
+class _CalendarFalso:
+    """freebusy().query() e events().insert() com respostas fixas, registrando a ordem das chamadas."""
+
+    def __init__(self, ocupadas: set, redis: _RedisReservasFalso):
+        self.ocupadas = ocupadas
+        self.redis = redis
+        self.chamadas = []
+
+    def freebusy(self):
+        return self
+
+    def events(self):
+        return self
+
+    def query(self, body):
+        cid = body["items"][0]["id"]
+        # A checagem acontece com a reserva já tomada
+        self.chamadas.append(("freebusy", cid, any(f":{cid}:" in chave for chave in self.redis.dados)))
+        busy = [{"start": body["timeMin"], "end": body["timeMax"]}] if cid in self.ocupadas else []
+        return mock.Mock(execute=mock.Mock(return_value={"calendars": {cid: {"busy": busy}}}))
+
+    def insert(self, calendarId, body):
+        self.chamadas.append(("insert", calendarId))
+        return mock.Mock(execute=mock.Mock(return_value={"id": "evt1", "htmlLink": "https://calendar/evt1"}))
+
+class SlotHoldsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = _RedisReservasFalso()
+        patcher = mock.patch('services.redis_client.get_redis_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _slot(self, hora, minuto=0, duracao=60):
+        inicio = datetime(2030, 3, 5, hora, minuto, tzinfo=disponibilidade.BR_TIMEZONE)
+        return inicio, inicio + timedelta(minutes=duracao)
+
+    def test_segurar_e_liberar(self):
+        reserva = slot_holds.segurar_slot("a@agenda", *self._slot(9), "5511@c.us")
+        self.assertIsNotNone(reserva)
+        self.assertEqual(len(reserva["chaves"]), 4)
+        self.assertIsNone(slot_holds.segurar_slot("a@agenda", *self._slot(9), "5522@c.us"))
+
+        self.assertTrue(slot_holds.liberar_slot(reserva))
+        self.assertEqual(self.redis.dados, {})
+        self.assertIsNotNone(slot_holds.segurar_slot("a@agenda", *self._slot(9), "5522@c.us"))
+
+    def test_slots_sobrepostos_com_inicios_diferentes_conflitam(self):
+        self.assertIsNotNone(slot_holds.segurar_slot("a@agenda", *self._slot(9), "5511@c.us"))
+        self.assertIsNone(slot_holds.segurar_slot("a@agenda", *self._slot(9, 30), "5522@c.us"))
+        self.assertIsNone(slot_holds.segurar_slot("a@agenda", *self._slot(9, 50), "5522@c.us"))
+        self.assertIsNone(slot_holds.segurar_slot("a@agenda", *self._slot(8, 10), "5522@c.us"))
+        # Adjacentes e outras agendas não conflitam
+        self.assertIsNotNone(slot_holds.segurar_slot("a@agenda", *self._slot(10), "5522@c.us"))
+        self.assertIsNotNone(slot_holds.segurar_slot("a@agenda", *self._slot(8, 0), "5533@c.us"))
+        self.assertIsNotNone(slot_holds.segurar_slot("b@agenda", *self._slot(9, 30), "5544@c.us"))
+
+    def test_reserva_falha_inteira_sem_chaves_parciais(self):
+        slot_holds.segurar_slot("a@agenda", *self._slot(10), "5511@c.us")
+        antes = dict(self.redis.dados)
+        self.assertIsNone(slot_holds.segurar_slot("a@agenda", *self._slot(9, 30), "5522@c.us"))
+        self.assertEqual(self.redis.dados, antes)
+
+    def test_chaves_de_slot_atravessando_meia_noite(self):
+        inicio = datetime(2030, 3, 5, 23, 40, tzinfo=disponibilidade.BR_TIMEZONE)
+        chaves = slot_holds.chaves_slot("a@agenda", inicio, inicio + timedelta(minutes=50))
+        self.assertEqual([c.rsplit(":a@agenda:", 1)[-1] for c in chaves],
+                         ["2030-03-05T23:30", "2030-03-05T23:45", "2030-03-06T00:00", "2030-03-06T00:15"])
+
+    def test_liberar_nao_apaga_reserva_de_outro_dono(self):
+        reserva = slot_holds.segurar_slot("a@agenda", *self._slot(9), "5511@c.us")
+        self.redis.dados.clear()  # expirou
+        nova = slot_holds.segurar_slot("a@agenda", *self._slot(9), "5522@c.us")
+
+        self.assertFalse(slot_holds.liberar_slot(reserva))
+        self.assertEqual(set(self.redis.dados.values()), {nova["token"]})
+        self.assertFalse(slot_holds.liberar_slot(None))
+
+    def test_redis_fora_do_ar_degrada_para_o_freebusy(self):
+        with mock.patch('services.redis_client.get_redis_client', side_effect=ConnectionError("down")):
+            reserva = slot_holds.segurar_slot("a@agenda", *self._slot(9), "5511@c.us")
+            self.assertIsNotNone(reserva)
+            self.assertFalse(slot_holds.liberar_slot(reserva))
+
+    def _criar_evento(self, service, agendas):
+        modelo = ModeloAgenda.de_dict({"nome": "integral", "duracao_slot_min": 60,
+                                       "expediente": {"*": [["00:00", "24:00"]]}})
+        with mock.patch('services.service_api_calendar.modelo_ativo', return_value=modelo), \
+             mock.patch('services.service_api_calendar.GOOGLE_CALENDAR_IDS', agendas):
+            return ServicesCalendar.criar_evento(service, "2030-03-05T09:00:00-03:00", "5511@c.us", "Ana")
+
+    def test_criar_evento_reserva_antes_do_freebusy_e_mantem_apos_o_insert(self):
+        service = _CalendarFalso(ocupadas={"a@agenda"}, redis=self.redis)
+        resultado = self._criar_evento(service, ["a@agenda", "b@agenda"])
+
+        self.assertEqual(resultado["status"], "SUCCESS")
+        self.assertEqual(resultado["event_id"], "b@agenda|evt1")
+        self.assertEqual(service.chamadas, [
+            ("freebusy", "a@agenda", True),
+            ("freebusy", "b@agenda", True),
+            ("insert", "b@agenda"),
+        ])
+        # Reserva da agenda ocupada liberada; a da escolhida segue até expirar
+        self.assertTrue(self.redis.dados)
+        self.assertTrue(all(":b@agenda:" in chave for chave in self.redis.dados))
+
+    def test_criar_evento_pula_agenda_reservada_por_outro(self):
+        slot_holds.segurar_slot("a@agenda", *self._slot(9, 30), "5599@c.us")
+        service = _CalendarFalso(ocupadas=set(), redis=self.redis)
+        resultado = self._criar_evento(service, ["a@agenda", "b@agenda"])
+
+        self.assertEqual(resultado["event_id"], "b@agenda|evt1")
+        self.assertEqual(service.chamadas[0], ("freebusy", "b@agenda", True))
+
+    def test_criar_evento_sem_agenda_livre(self):
+        service = _CalendarFalso(ocupadas={"a@agenda"}, redis=self.redis)
+        resultado = self._criar_evento(service, ["a@agenda"])
+
+        self.assertEqual(resultado["status"], "ERROR")
+        self.assertEqual(self.redis.dados, {})
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# RETENÇÃO DE MÉTRICAS: partições mensais + DEFAULT (chatbot_api/metrics/particoes.py)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class RetencaoParticoesTests(TestCase):
+
+    def test_lock_nao_obtido_tenta_de_novo(self):
+        cursor = mock.MagicMock()
+        cursor.execute.side_effect = [None, OperationalError("lock timeout"), None, None, None]
+        conexao = mock.MagicMock(cursor=mock.MagicMock(return_value=mock.MagicMock(__enter__=mock.Mock(return_value=cursor))))
+        conexao.ops.quote_name = lambda nome: f'"{nome}"'
+
+        with mock.patch.object(particoes, 'connection', conexao), \
+             mock.patch.object(particoes.transaction, 'atomic'), \
+             mock.patch.object(particoes.time, 'sleep') as dormir:
+            particoes._soltar_e_remover('logs_metricas_p202001')
+
+        comandos = [c.args[0] for c in cursor.execute.call_args_list]
+        self.assertEqual(dormir.call_count, 1)
+        self.assertEqual(comandos[2:], [
+            f"SET LOCAL lock_timeout = '{particoes.DETACH_LOCK_TIMEOUT_MS}ms'",
+            'ALTER TABLE "logs_metricas" DETACH PARTITION "logs_metricas_p202001"',
+            'DROP TABLE "logs_metricas_p202001"',
+        ])
+        self.assertFalse(any("CONCURRENTLY" in comando for comando in comandos))
+
+    @skipUnless(connection.vendor == 'postgresql', "Particionamento só existe no PostgreSQL (migração 0004).")
+    def test_retencao_no_esquema_criado_pela_migracao(self):
+        # Esquema real da 0004: partições mensais + logs_metricas_default
+        self.assertTrue(particoes.particionamento_ativo())
+        particoes.criar_particao_mensal(2020, 1)
+
+        def log(criado_em):
+            registro = LogMetrica.objects.create(cliente_id="5511@c.us", event_id="evt", tipo_metrica="agendamento")
+            LogMetrica.objects.filter(pk=registro.pk).update(criado_em=criado_em)
+            return registro.pk
+
+        na_particao_antiga = log(datetime(2020, 1, 15, tzinfo=dt_timezone.utc))
+        na_default = log(datetime(2019, 6, 1, tzinfo=dt_timezone.utc))
+        recente = log(timezone.now())
+
+        resultado = limpar_dados_antigos(dias_retencao=90)
+
+        self.assertEqual(resultado['status'], 'success', resultado)
+        self.assertIn('logs_metricas_p202001', resultado['particoes_removidas'])
+        self.assertEqual(resultado['deletados_default'], 1)
+        self.assertEqual(list(LogMetrica.objects.values_list('pk', flat=True)), [recente])
+        self.assertNotIn(na_particao_antiga, LogMetrica.objects.values_list('pk', flat=True))
+        self.assertNotIn(na_default, LogMetrica.objects.values_list('pk', flat=True))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('logs_metricas_p202001'), to_regclass('logs_metricas_default')")
+            self.assertEqual(cursor.fetchone(), (None, 'logs_metricas_default'))
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CACHE DE PERFIL: geração por chat_id e invalidações adiadas (services/redis_client.py)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class _RedisPerfisFalso:
+    """GET/eval(SET condicional) e o pipeline da invalidação, em memória."""
+
+    def __init__(self):
+        self.dados = {}
+        self.publicados = []
+        self.fora_do_ar = False
+        self.durante_get = None
+
+    def get(self, chave):
+        valor = self.dados.get(chave)
+        if self.durante_get:
+            self.durante_get()
+        return valor
+
+    def eval(self, script, numkeys, *args):
+        self.assertar_no_ar()
+        chave_perfil, chave_geracao, valor, _ttl, geracao = args
+        if script != redis_client._LUA_SET_MESMA_GERACAO:
+            raise AssertionError("script inesperado")
+        if geracao != '' and (self.dados.get(chave_geracao) or b'0').decode() != geracao:
+            return 0
+        self.dados[chave_perfil] = valor
+        return 1
+
+    def pipeline(self, transaction=False):
+        self.comandos = []
+        return self
+
+    def delete(self, *chaves):
+        self.comandos.append(lambda: sum(self.dados.pop(c, None) is not None for c in chaves))
+
+    def incr(self, chave):
+        def _incr():
+            self.dados[chave] = str(int(self.dados.get(chave, b'0')) + 1).encode()
+        self.comandos.append(_incr)
+
+    def expire(self, chave, segundos):
+        self.comandos.append(lambda: True)
+
+    def publish(self, canal, mensagem):
+        self.comandos.append(lambda: self.publicados.append(json.loads(mensagem)))
+
+    def execute(self):
+        self.assertar_no_ar()
+        return [comando() for comando in self.comandos]
+
+    def assertar_no_ar(self):
+        if self.fora_do_ar:
+            raise ConnectionError("redis fora do ar")
+
+class CachePerfilTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = _RedisPerfisFalso()
+        for alvo in ('get_redis_client', '_get_redis_invalidacao'):
+            patcher = mock.patch.object(redis_client, alvo, return_value=self.redis)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for nome, valor in (('_invalidacao_suspensa_ate', 0.0), ('_invalidacoes_pendentes', {})):
+            patcher = mock.patch.object(redis_client, nome, valor)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(redis_client.perfis_locais.clear)
+
+    def test_fetch_iniciado_antes_da_invalidacao_nao_regrava(self):
+        geracao = redis_client.geracao_perfil_cache("5511@c.us")
+        redis_client.invalidar_perfis_usuario(["5511@c.us"])
+
+        self.assertFalse(redis_client.set_user_profile_cache("5511@c.us", {"status": "SUCCESS"}, geracao=geracao))
+        self.assertNotIn(redis_client.USER_PROFILE_CACHE_PREFIX + "5511@c.us", self.redis.dados)
+
+    def test_fetch_iniciado_depois_da_invalidacao_grava_na_hora(self):
+        redis_client.invalidar_perfis_usuario(["5511@c.us"])
+        geracao = redis_client.geracao_perfil_cache("5511@c.us")
+
+        self.assertEqual(geracao, 1)
+        self.assertTrue(redis_client.set_user_profile_cache("5511@c.us", {"status": "SUCCESS"}, geracao=geracao))
+        self.assertEqual(redis_client.perfis_locais.get("5511@c.us"), {"status": "SUCCESS"})
+
+    def test_invalidacao_com_redis_fora_do_ar_e_reenviada(self):
+        self.redis.fora_do_ar = True
+        redis_client.invalidar_perfis_usuario(["5511@c.us"])
+        redis_client.invalidar_perfis_usuario(["5522@c.us"])  # disjuntor aberto: nem tenta
+
+        self.redis.fora_do_ar = False
+        redis_client._invalidacao_suspensa_ate = 0.0
+        redis_client.invalidar_perfis_usuario(["5533@c.us"])
+
+        self.assertEqual(self.redis.publicados, [["5533@c.us", "5511@c.us", "5522@c.us"]])
+        self.assertEqual(redis_client._invalidacoes_pendentes, {})
+
+    def test_pendentes_limitadas(self):
+        with mock.patch.object(redis_client, 'INVALIDACAO_PENDENTES_MAX', 2):
+            redis_client._guardar_pendentes(["a", "b", "c"])
+        self.assertEqual(list(redis_client._invalidacoes_pendentes), ["b", "c"])
+
+    def test_invalidacao_durante_o_get_nao_popula_o_nivel_local(self):
+        redis_client.set_user_profile_cache("5511@c.us", {"status": "SUCCESS", "v": 1})
+        redis_client.perfis_locais.clear()
+        # Mensagem do pub/sub processada pelo listener enquanto o GET estava em voo
+        self.redis.durante_get = lambda: redis_client.perfis_locais.invalidate("5511@c.us")
+
+        with mock.patch.object(redis_client, 'iniciar_listener_invalidacao_perfis'):
+            self.assertEqual(redis_client.get_user_profile_cache("5511@c.us"), {"status": "SUCCESS", "v": 1})
+        self.assertIsNone(redis_client.perfis_locais.get("5511@c.us"))
+
+        self.redis.durante_get = None
+        with mock.patch.object(redis_client, 'iniciar_listener_invalidacao_perfis'):
+            redis_client.get_user_profile_cache("5511@c.us")
+        self.assertIsNotNone(redis_client.perfis_locais.get("5511@c.us"))
+
+    def test_cache_local_set_condicional(self):
+        cache = LocalTTLCache(max_itens=10, ttl=30)
+        geracao = cache.geracao("a")
+        cache.invalidate("a")
+        self.assertFalse(cache.set("a", 1, geracao=geracao))
+
+        geracao = cache.geracao("a")
+        cache.clear()
+        self.assertFalse(cache.set("a", 1, geracao=geracao))
+
+        self.assertTrue(cache.set("a", 1, geracao=cache.geracao("a")))
+        self.assertEqual(cache.get("a"), 1)
@@ -6,6 +6,10 @@ urlpatterns = [
     path('cleanup/', views.cleanup_expired_appointments_view, name='cleanup_expired_appointments'),
     path('agendamentos/salvar/', views.salvar_agendamento_transacional, name='salvar_agendamento'),
     path('agendamentos/cancelar/', views.cancel_appointment_transacional, name='cancelar_agendamento'),
+    path('agendamentos/fechar/', views.fechar_agenda_view, name='fechar_agenda'),
     path('user/<str:chat_id>/', views.get_user_data, name='get_user_data'), # ✅ Corrigido
+    path('user/<str:chat_id>/agendamentos/', views.list_active_appointments, name='list_active_appointments'),
     path('metrics/log/', views.log_metric, name='log_metric'),
+    path('metrics/historico/<str:cliente_id>/', views.historico_cliente_view, name='historico_cliente'),
+    path('metrics/historico/<str:cliente_id>/export/', views.exportar_historico_cliente_view, name='exportar_historico_cliente'),
 ]
\ No newline at end of file
@@ -1,113 +1,124 @@
 # Arquivo: chatbot_api/views.py (NO PROJETO DJANGO BAAS)
 
+import csv
+import json
 import logging
-from django.db import transaction
-from django.utils import timezone
-from datetime import datetime, timedelta
-from rest_framework.decorators import api_view # Requer Django Rest Framework (DRF)
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from datetime import datetime
+from rest_framework.decorators import api_view, permission_classes # Requer Django Rest Framework (DRF)
 from rest_framework.response import Response # Requer DRF
 from rest_framework import status
 from chatbot_api.models import UserRegister # Seus modelos do Django
-from django.db import transaction, IntegrityError
+from django.db import DatabaseError, IntegrityError, transaction
 from chatbot_api.models import LogMetrica
+from chatbot_api.metrics import get_historico_cliente_pagina, aiterar_historico_cliente
+from chatbot_api.permissions import TokenInterno, token_interno_valido
+from chatbot_api.core_api.limpeza_agendamentos import limpar_agendamentos_expirados
+from chatbot_api.formatters import CAMPOS_AGENDAMENTO, formatar_consultas_futuras, formatar_consultas_ativas
+from chatbot_api.core_api.fechamento_agenda import ERRO_CALENDAR_INDISPONIVEL, ERRO_PERIODO_INVALIDO, fechar_agenda
 
 
 logger = logging.getLogger(__name__)
 
-@api_view(['POST'])
-@transaction.atomic
-def log_metric(request):
+# ═══════════════════════════════════════════════════════════════════════════════
+# VIEWS ASYNC (ASGI/uvicorn): Leituras e Ingestão de Métricas
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@csrf_exempt
+@require_POST
+async def log_metric(request):
     """
-    Endpoint HTTP para registrar logs de métrica de forma atômica no PostgreSQL.
+    Endpoint HTTP (async) para registrar logs de métrica de forma atômica no PostgreSQL.
     Usado pelo Worker de IA.
     """
-    data = request.data
+    try:
+        data = json.loads(request.body or b'{}')
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({"status": "FAILURE", "message": "JSON inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
     required_fields = ['cliente_id', 'event_id', 'tipo_metrica']
-    if not all(field in data for field in required_fields):
+    # cliente_id vazio é o sentinela do total GLOBAL do rollup (MetricaDiaria)
+    if not isinstance(data, dict) or not all(field in data for field in required_fields) or not data.get('cliente_id'):
         logger.error(f"❌ Tentativa de log de métrica inválida: {data}")
-        return Response(
+        return JsonResponse(
             {"status": "FAILURE", "message": "Campos obrigatórios ausentes."},
             status=status.HTTP_400_BAD_REQUEST
         )
 
     try:
-        LogMetrica.registrar_evento(
+        await LogMetrica.aregistrar_evento(
             cliente_id=data.get('cliente_id'),
             event_id=data.get('event_id'),
             tipo_metrica=data.get('tipo_metrica'),
-            status=data.get('status', 'success'), 
+            status=data.get('status', 'success'),
             detalhes=data.get('detalhes', ''),
         )
-        return Response({"status": "SUCCESS", "message": "Métrica registrada."}, status=status.HTTP_201_CREATED)
-        
+        return JsonResponse({"status": "SUCCESS", "message": "Métrica registrada."}, status=status.HTTP_201_CREATED)
+
     except IntegrityError as e:
         logger.warning(f"⚠️ Erro de Integridade ao registrar métrica (Rollback): {e}")
-        return Response({"status": "FAILURE", "message": "Erro de integridade do DB."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return JsonResponse({"status": "FAILURE", "message": "Erro de integridade do DB."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     except Exception as e:
         logger.error(f"❌ Erro CRÍTICO ao registrar métrica: {e}")
-        return Response({"status": "ERROR", "message": "Erro interno no BaaS."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return JsonResponse({"status": "ERROR", "message": "Erro interno no BaaS."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-@api_view(['GET'])
-def get_user_data(request, chat_id):
+@require_GET
+async def get_user_data(request, chat_id):
     """
-    Endpoint de API para retornar dados de registro de um usuário.
-    ✅ AGORA: Implementa o filtro de datas futuras e a formatação (replicando a lógica antiga).
+    Endpoint de API (async) para retornar dados de registro de um usuário.
+    Filtra datas futuras e formata em horário local (ver chatbot_api.formatters).
     """
     try:
-        user = UserRegister.objects.get(chat_id=chat_id)
-        consultas = []
-        agora = timezone.now()
+        user = await UserRegister.objects.only(*CAMPOS_AGENDAMENTO).aget(chat_id=chat_id)
 
-        if user.appointment1_gcal_id and user.appointment1_datetime and user.appointment1_datetime >= agora:
-            local_dt1 = timezone.localtime(user.appointment1_datetime)
-            
-            consultas.append({
-                "appointment_number": 1,
-                "data": local_dt1.strftime("%d/%m/%Y"),
-                "hora": local_dt1.strftime("%H:%M"),
-                "slot": 1,
-                "gcal_id": user.appointment1_gcal_id,
-                "datetime_iso": user.appointment1_datetime.isoformat()
-            })
-
-        if user.appointment2_gcal_id and user.appointment2_datetime and user.appointment2_datetime >= agora:
-            local_dt2 = timezone.localtime(user.appointment2_datetime)
-
-            consultas.append({
-                "appointment_number": 2,
-                "data": local_dt2.strftime("%d/%m/%Y"),
-                "hora": local_dt2.strftime("%H:%M"),
-                "slot": 2,
-                "gcal_id": user.appointment2_gcal_id,
-                "datetime_iso": user.appointment2_datetime.isoformat()
-            })
-
-        consultas.sort(key=lambda x: datetime.strptime(f"{x['data']} {x['hora']}", "%d/%m/%Y %H:%M"))
-        
         response_data = {
             "status": "SUCCESS",
             "chat_id": user.chat_id,
             "username": user.username,
-            "appointments": consultas
+            "appointments": formatar_consultas_futuras(user)
         }
-        
-        return Response(response_data, status=status.HTTP_200_OK)
-        
+
+        return JsonResponse(response_data, status=status.HTTP_200_OK)
+
     except UserRegister.DoesNotExist:
-        return Response({"status": "NOT_FOUND", "message": "Usuário não registrado."}, 
-                        status=status.HTTP_404_NOT_FOUND)
-                        
+        return JsonResponse({"status": "NOT_FOUND", "message": "Usuário não registrado."},
+                            status=status.HTTP_404_NOT_FOUND)
+
     except Exception as e:
         logger.error(f"❌ Erro ao buscar dados de usuário no BaaS: {e}")
-        return Response({"status": "ERROR", "message": "Erro interno no BaaS."}, 
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return JsonResponse({"status": "ERROR", "message": "Erro interno no BaaS."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@require_GET
+async def list_active_appointments(request, chat_id):
+    """
+    Endpoint de API (async) para retornar uma lista formatada de agendamentos ATIVOS.
+    A lógica de 'ativo' e a formatação são executadas AQUI no BaaS.
+    """
+    try:
+        user = await UserRegister.objects.only(*CAMPOS_AGENDAMENTO).aget(chat_id=chat_id)
+        return JsonResponse({"status": "SUCCESS", "appointments": formatar_consultas_ativas(user)},
+                            status=status.HTTP_200_OK)
+
+    except UserRegister.DoesNotExist:
+        return JsonResponse({"status": "NOT_FOUND", "appointments": []}, status=status.HTTP_404_NOT_FOUND)
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao listar agendamentos ativos no BaaS: {e}")
+        return JsonResponse({"status": "ERROR", "message": "Erro interno no BaaS."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# VIEWS SÍNCRONAS (DRF): Escritas Transacionais
+# ═══════════════════════════════════════════════════════════════════════════════
 
 @api_view(['POST'])
-@transaction.atomic
 def salvar_agendamento_transacional(request):
     """
     Endpoint de API que recebe a requisição do Worker de IA e executa a 
-    sua lógica de slots e transação atômica.
+    sua lógica de slots com UPDATE condicional (uma instrução por tentativa de slot).
     """
     
     chat_id = request.data.get('chat_id')
@@ -116,38 +127,29 @@ def salvar_agendamento_transacional(request):
     
     if not all([chat_id, google_event_id, start_time_iso]):
         return Response({"status": "ERROR", "message": "Parâmetros incompletos."}, status=status.HTTP_400_BAD_REQUEST)
-    
+
+    # Parsing fora de qualquer acesso ao banco
     try:
-        user = UserRegister.objects.select_for_update().get(chat_id=chat_id) 
         new_datetime = datetime.fromisoformat(start_time_iso)
-        agora = timezone.now()
-        
-        is_slot1_free = not user.appointment1_gcal_id or (user.appointment1_datetime and user.appointment1_datetime < agora)
-        
-        if is_slot1_free:
-            user.appointment1_datetime = new_datetime
-            user.appointment1_gcal_id = google_event_id
-            user.save(update_fields=['appointment1_datetime', 'appointment1_gcal_id'])
-            logger.info(f"✅ Agendamento salvo no slot 1 (BaaS) - Cliente: {chat_id}")
-            response_data = {"status": "SUCCESS", "slot": 1, "data": new_datetime.strftime('%d/%m/%Y às %H:%M')}
-            return Response(response_data, status=status.HTTP_200_OK)
+    except ValueError:
+        return Response({"status": "ERROR", "message": "start_time_iso inválido (use ISO 8601)."}, 
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        slot = UserRegister.ocupar_slot_livre(chat_id, new_datetime, google_event_id)
 
-        is_slot2_free = not user.appointment2_gcal_id or (user.appointment2_datetime and user.appointment2_datetime < agora)
-        
-        if is_slot2_free:
-            user.appointment2_datetime = new_datetime
-            user.appointment2_gcal_id = google_event_id
-            user.save(update_fields=['appointment2_datetime', 'appointment2_gcal_id']) 
-            logger.info(f"✅ Agendamento salvo no slot 2 (BaaS) - Cliente: {chat_id}")
-            response_data = {"status": "SUCCESS", "slot": 2, "data": new_datetime.strftime('%d/%m/%Y às %H:%M')}
+        if slot is not None:
+            logger.info(f"✅ Agendamento salvo no slot {slot} (BaaS) - Cliente: {chat_id}")
+            response_data = {"status": "SUCCESS", "slot": slot, "data": new_datetime.strftime('%d/%m/%Y às %H:%M')}
             return Response(response_data, status=status.HTTP_200_OK)
-        else:
-            return Response({"status": "FAILURE", "message": "Limite de agendamentos atingido. Você pode ter no máximo 2 consultas ativas."}, 
-                            status=status.HTTP_409_CONFLICT) # 409 Conflict é adequado
-                            
-    except UserRegister.DoesNotExist:
-        return Response({"status": "FAILURE", "message": "Usuário não registrado."}, 
-                        status=status.HTTP_404_NOT_FOUND)
+
+        # Caminho de falha (raro): só aqui distinguimos usuário inexistente de slots cheios
+        if not UserRegister.objects.filter(chat_id=chat_id).exists():
+            return Response({"status": "FAILURE", "message": "Usuário não registrado."}, 
+                            status=status.HTTP_404_NOT_FOUND)
+
+        return Response({"status": "FAILURE", "message": "Limite de agendamentos atingido. Você pode ter no máximo 2 consultas ativas."}, 
+                        status=status.HTTP_409_CONFLICT) # 409 Conflict é adequado
         
     except Exception as e:
         logger.error(f"❌ Erro grave ao salvar agendamento no BaaS: {e}")
@@ -193,7 +195,7 @@ def register_user(request):
 def cancel_appointment_transacional(request):
     """
     Endpoint de API para limpar o slot de agendamento no DB (limpa o slot).
-    Garante a atomicidade e o lock de linha.
+    Um único UPDATE condicional: atômico sem SELECT FOR UPDATE.
     """
     chat_id = request.data.get('chat_id')
     numero_consulta = request.data.get('numero_consulta')
@@ -209,111 +211,183 @@ def cancel_appointment_transacional(request):
                         status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        with transaction.atomic():
-            user = UserRegister.objects.select_for_update().get(chat_id=chat_id)
-            
-            db_slot_cleared = False
-            
-            if numero_consulta == 1 and user.appointment1_gcal_id:
-                user.appointment1_datetime = None
-                user.appointment1_gcal_id = None
-                user.save(update_fields=['appointment1_datetime', 'appointment1_gcal_id'])
-                db_slot_cleared = True
-                
-            elif numero_consulta == 2 and user.appointment2_gcal_id:
-                user.appointment2_datetime = None
-                user.appointment2_gcal_id = None
-                user.save(update_fields=['appointment2_datetime', 'appointment2_gcal_id'])
-                db_slot_cleared = True
-                
-            if not db_slot_cleared:
-                return Response({"status": "FAILURE", "message": f"Não encontrei agendamento ativo no slot {numero_consulta} para limpar."}, 
+        if not UserRegister.liberar_slot(chat_id, numero_consulta):
+            if not UserRegister.objects.filter(chat_id=chat_id).exists():
+                return Response({"status": "FAILURE", "message": "Usuário não encontrado."}, 
                                 status=status.HTTP_404_NOT_FOUND)
+            return Response({"status": "FAILURE", "message": f"Não encontrei agendamento ativo no slot {numero_consulta} para limpar."}, 
+                            status=status.HTTP_404_NOT_FOUND)
 
-            logger.info(f"✅ Slot {numero_consulta} LIMPO no DB (BaaS) - Cliente: {chat_id}")
-            
-            return Response({"status": "SUCCESS", "message": "Slot limpo no banco de dados."}, 
-                            status=status.HTTP_200_OK)
+        logger.info(f"✅ Slot {numero_consulta} LIMPO no DB (BaaS) - Cliente: {chat_id}")
+        
+        return Response({"status": "SUCCESS", "message": "Slot limpo no banco de dados."}, 
+                        status=status.HTTP_200_OK)
 
-    except UserRegister.DoesNotExist:
-        return Response({"status": "FAILURE", "message": "Usuário não encontrado."}, 
-                        status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         logger.error(f"❌ Erro grave ao limpar slot {numero_consulta} no BaaS: {e}")
         return Response({"status": "ERROR", "message": "Ocorreu um erro interno no BaaS."}, 
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([TokenInterno])
+def cleanup_expired_appointments_view(request):
+    """
+    Limpa agendamentos que já ocorreram há mais de 2 horas.
+    Ex: Se agora é 14:00, limpa tudo agendado para antes das 12:00.
+    Mantido para chamadas manuais; a rotina diária roda direto na task do Celery.
+    Percorre a tabela inteira em lotes: exige X-Internal-Token.
+    """
+    try:
+        resultado = limpar_agendamentos_expirados()
+    except DatabaseError as e:
+        logger.error(f"❌ Falha no banco durante a limpeza de agendamentos expirados: {e}", exc_info=True)
+        return Response({"status": "ERROR", "message": "Falha no banco durante a limpeza."},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response({"status": "SUCCESS", "slots_limpos": resultado["slots_limpos"], "lotes": resultado["lotes"]},
+                    status=status.HTTP_200_OK)
+
+VALORES_VERDADEIROS = (True, 1, 'true', 'True', '1')
+VALORES_FALSOS = (False, 0, 'false', 'False', '0')
+
+def _flag(valor, padrao: bool) -> bool:
+    """Booleano estrito de JSON/form/querystring: "false" é False (bool("false") seria True)."""
+    if valor is None:
+        return padrao
+    if valor in VALORES_VERDADEIROS:
+        return True
+    if valor in VALORES_FALSOS:
+        return False
+    raise ValueError(f"Valor booleano inválido: {valor!r}")
+
+CODIGOS_HTTP_FECHAMENTO = {
+    ERRO_PERIODO_INVALIDO: status.HTTP_400_BAD_REQUEST,
+    ERRO_CALENDAR_INDISPONIVEL: status.HTTP_503_SERVICE_UNAVAILABLE,
+}
+
+@api_view(['POST'])
+@permission_classes([TokenInterno])
+def fechar_agenda_view(request):
+    """
+    Fecha a agenda num intervalo de datas (inclusive): cancela todas as consultas em lote.
+    Destrutivo: exige X-Internal-Token (ou use `manage.py fechar_agenda`).
+    Body: {"data_inicio": "YYYY-MM-DD", "data_fim": "YYYY-MM-DD" (opcional), "motivo": "",
+           "notificar": true, "simular": false}
+    """
+    try:
+        data_inicio = datetime.strptime(request.data.get('data_inicio', ''), '%Y-%m-%d').date()
+        data_fim_str = request.data.get('data_fim')
+        data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date() if data_fim_str else data_inicio
+    except (TypeError, ValueError):
+        return Response({"status": "ERROR", "message": "Datas devem estar no formato YYYY-MM-DD."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        notificar = _flag(request.data.get('notificar'), padrao=True)
+        simular = _flag(request.data.get('simular'), padrao=False)
+    except ValueError:
+        return Response({"status": "ERROR", "message": "'notificar' e 'simular' devem ser true/false."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        resultado = fechar_agenda(
+            data_inicio,
+            data_fim,
+            motivo=request.data.get('motivo', ''),
+            notificar=notificar,
+            simular=simular,
+        )
+    except Exception as e:
+        logger.error(f"❌ Erro no fechamento da agenda {data_inicio}..{data_fim}: {e}", exc_info=True)
+        return Response({"status": "ERROR", "message": "Erro interno no fechamento da agenda."},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    if resultado['status'] == 'ERROR':
+        codigo = CODIGOS_HTTP_FECHAMENTO.get(resultado.get('codigo'), status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(resultado, status=codigo)
+    return Response(resultado, status=status.HTTP_200_OK)
+
+HISTORICO_LIMITE_MAXIMO = 1000
+CAMPOS_EXPORTACAO = ['id', 'cliente_id', 'event_id', 'tipo_metrica', 'status', 'detalhes', 'criado_em']
+
 @api_view(['GET'])
-def list_active_appointments(request, chat_id):
+@permission_classes([TokenInterno])
+def historico_cliente_view(request, cliente_id):
     """
-    Endpoint de API para retornar uma lista formatada de agendamentos ATIVOS.
-    A lógica de 'ativo' e a formatação são executadas AQUI no BaaS.
+    Endpoint paginado por cursor (keyset) do histórico de métricas de um cliente.
+    Query params: cursor, limite (máx. 1000), dias, tipo, status.
     """
     try:
-        user = UserRegister.objects.get(chat_id=chat_id)
-        lista_consultas = []
-        agora = timezone.now() 
-
-        if user.appointment1_datetime and user.appointment1_datetime > agora:
-            lista_consultas.append({
-                "appointment_number": 1, 
-                "data": user.appointment1_datetime.strftime('%d/%m/%Y'),
-                "hora": user.appointment1_datetime.strftime('%H:%M'),
-                "gcal_id": user.appointment1_gcal_id,
-                "datetime_iso": user.appointment1_datetime.isoformat()
-            })
-
-        if user.appointment2_datetime and user.appointment2_datetime > agora:
-            lista_consultas.append({
-                "appointment_number": 2, 
-                "data": user.appointment2_datetime.strftime('%d/%m/%Y'),
-                "hora": user.appointment2_datetime.strftime('%H:%M'),
-                "gcal_id": user.appointment2_gcal_id,
-                "datetime_iso": user.appointment2_datetime.isoformat()
-            })
-
-        return Response({"status": "SUCCESS", "appointments": lista_consultas}, status=status.HTTP_200_OK)
-        
-    except UserRegister.DoesNotExist:
-        return Response({"status": "NOT_FOUND", "appointments": []}, status=status.HTTP_404_NOT_FOUND)
-                        
+        limite = min(int(request.query_params.get('limite', 100)), HISTORICO_LIMITE_MAXIMO)
+        dias = int(request.query_params.get('dias', 30))
+    except ValueError:
+        return Response({"status": "ERROR", "message": "'limite' e 'dias' devem ser inteiros."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        pagina = get_historico_cliente_pagina(
+            cliente_id=cliente_id,
+            cursor=request.query_params.get('cursor'),
+            limite=max(limite, 1),
+            limite_dias=dias,
+            tipo_filtro=request.query_params.get('tipo'),
+            status_filtro=request.query_params.get('status'),
+        )
+        return Response({"status": "SUCCESS", **pagina}, status=status.HTTP_200_OK)
+
+    except ValueError as e:
+        return Response({"status": "ERROR", "message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        logger.error(f"❌ Erro ao listar agendamentos ativos no BaaS: {e}")
-        return Response({"status": "ERROR", "message": "Erro interno no BaaS."}, 
+        logger.error(f"❌ Erro ao paginar histórico do cliente {cliente_id}: {e}")
+        return Response({"status": "ERROR", "message": "Erro interno no BaaS."},
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-@api_view(['POST'])
-@transaction.atomic
-def cleanup_expired_appointments_view(request):
+
+class _EchoBuffer:
+    """Buffer mínimo para o csv.writer escrever direto no stream (sem acumular em memória)."""
+    def write(self, value):
+        return value
+
+@require_GET
+async def exportar_historico_cliente_view(request, cliente_id):
     """
-    Limpa agendamentos que já ocorreram há mais de 2 horas.
-    Ex: Se agora é 14:00, limpa tudo agendado para antes das 12:00.
+    Exportação em streaming (NDJSON ou CSV) do histórico de métricas de um cliente.
+    View async com gerador async (ORM async em lotes keyset): sob ASGI os bytes saem lote a
+    lote, com memória constante mesmo para meses de dados. Exige X-Internal-Token.
+    Query params: formato (ndjson|csv), dias, tipo, status.
     """
-    agora_utc = timezone.now()
-    data_limite = agora_utc - timedelta(hours=2)
+    if not token_interno_valido(request):
+        return JsonResponse({"status": "ERROR", "message": "Token interno ausente ou inválido."}, status=403)
 
-    logger.info(f"🧹 Iniciando limpeza. Agora(UTC): {agora_utc} | Cortar agendamentos anteriores a: {data_limite}")
+    formato = request.GET.get('formato', 'ndjson')
+    if formato not in ('ndjson', 'csv'):
+        return JsonResponse({"status": "ERROR", "message": "formato deve ser 'ndjson' ou 'csv'."}, status=400)
 
-    result_slot1 = UserRegister.objects.filter(
-        appointment1_datetime__lt=data_limite,
-        appointment1_datetime__isnull=False 
-    ).update(
-        appointment1_datetime=None,
-        appointment1_gcal_id=None
-    )
+    try:
+        dias = int(request.GET.get('dias', 30))
+    except ValueError:
+        return JsonResponse({"status": "ERROR", "message": "'dias' deve ser inteiro."}, status=400)
 
-    result_slot2 = UserRegister.objects.filter(
-        appointment2_datetime__lt=data_limite,
-        appointment2_datetime__isnull=False
-    ).update(
-        appointment2_datetime=None,
-        appointment2_gcal_id=None
+    logs = aiterar_historico_cliente(
+        cliente_id=cliente_id,
+        limite_dias=dias,
+        tipo_filtro=request.GET.get('tipo'),
+        status_filtro=request.GET.get('status'),
     )
 
-    total_limpos = result_slot1 + result_slot2
-    
-    if total_limpos > 0:
-        logger.info(f"✅ Limpeza concluída. {total_limpos} slots antigos foram liberados.")
+    if formato == 'csv':
+        writer = csv.DictWriter(_EchoBuffer(), fieldnames=CAMPOS_EXPORTACAO)
+
+        async def linhas_csv():
+            yield writer.writeheader()
+            async for log in logs:
+                yield writer.writerow(log)
+
+        response = StreamingHttpResponse(linhas_csv(), content_type='text/csv; charset=utf-8')
     else:
-        logger.info(f"ℹ️ Limpeza executada, mas nenhum agendamento expirado (anterior a {data_limite}) foi encontrado.")
-    
-    return Response({"status": "SUCCESS", "slots_limpos": total_limpos}, status=status.HTTP_200_OK)    
+        async def linhas_ndjson():
+            async for log in logs:
+                yield json.dumps(log, ensure_ascii=False) + "\n"
+
+        response = StreamingHttpResponse(linhas_ndjson(), content_type='application/x-ndjson')
+
+    response['Content-Disposition'] = f'attachment; filename="historico_{cliente_id}_{dias}d.{formato}"'
+    return response
@@ -2,12 +2,14 @@ package main
 
 import (
 	"context"
+	"encoding/json"
 	"io"
 	"log"
 	"net/http"
 	"os"
 	"time" 
 
+	"go_waha_gateway/services/envelope"
 	"go_waha_gateway/services/hmac"
 	"go_waha_gateway/services/redis"
 )
@@ -18,6 +20,9 @@ var ctx = context.Background()
 // Limite de 1 Megabyte (1024 * 1024 bytes) - Segurança contra Payloads Grandes
 const MAX_BODY_SIZE int64 = 1048576 
 
+// GATEWAY_STORE_RAW=true guarda também o webhook bruto em raw_event:{id} (TTL 24h)
+var storeRawBody = os.Getenv("GATEWAY_STORE_RAW") == "true"
+
 func main() {
 	// 1. Inicializa o Serviço HMAC
 	if err := hmac.InitSecret(); err != nil {
@@ -80,13 +85,24 @@ func webhookHandler(w http.ResponseWriter, r *http.Request) {
 	// =========================================================================
 	// === PASSO 4: PUBLICAR no Redis - AGORA COM CHECK DE IDEMPOTÊNCIA ===
 	// =========================================================================
-	go func(payload []byte) {
+	go func(payload []byte, receivedAt time.Time, traceID string) {
 		// Contexto de curta duração para o Redis (5s)
 		ctxRedis, cancel := context.WithTimeout(context.Background(), 5*time.Second) 
 		defer cancel() 
 
-        // 4.1. Tentar extrair o ID (NOVO)
-		eventID, err := redis.ExtractEventID(payload)
+        // 4.1. Desserializa o webhook UMA vez (só os campos usados pelo worker)
+		event, err := envelope.Parse(payload)
+		if err != nil {
+            // Payload que não conseguimos interpretar: publica o bruto (o worker trata o formato legado)
+			log.Printf("⚠️ Payload não interpretável. Publicando bruto sem checagem de duplicata: %v", err)
+			if err := redis.PublishMessage(ctxRedis, payload); err != nil {
+				log.Printf("❌ ERRO ASSÍNCRONO CRÍTICO: Falha ao publicar no Redis: %v", err)
+			}
+			return
+		}
+
+		env := event.Build(receivedAt, traceID)
+		eventID, err := event.DedupeID()
 
 		if err != nil {
             // Se falhar a extração do ID (ex: notificação de status/leitura), 
@@ -94,7 +110,7 @@ func webhookHandler(w http.ResponseWriter, r *http.Request) {
 			log.Printf("⚠️ ID de evento não encontrado/inválido. Publicando sem checagem de duplicata: %v", err)
             // Continua para o passo 4.3 (Publicação)
 		} else {
-            // 4.2. Checar e Registrar Idempotência no Redis (NOVO)
+            // 4.2. Checar e Registrar Idempotência no Redis
 			isDuplicate, err := redis.CheckAndSetIdempotency(ctxRedis, eventID)
 
 			if err != nil {
@@ -104,14 +120,30 @@ func webhookHandler(w http.ResponseWriter, r *http.Request) {
                 // 4.2.1: DUPLICATA ENCONTRADA E DESCARTADA (O CORAÇÃO DA OTIMIZAÇÃO)
 				log.Printf("❌ DUPLICATA DESCARTADA pelo Gateway Go. ID: %s", eventID)
 				return // **SAI DA GOROUTINE.** O payload NÃO é publicado.
+			} else {
+                // 4.2.2: Carimba o envelope: o worker não repete a checagem de duplicata
+				env.Idempotency = eventID
 			}
             log.Printf("✅ Evento ÚNICO aceito pelo Gateway. ID: %s", eventID)
-            // Continua para o passo 4.3 (Publicação)
+
+            // 4.2.3: Corpo bruto à parte, só quando habilitado (diagnóstico)
+			if storeRawBody {
+				if err := redis.StoreRawEvent(ctxRedis, eventID, payload); err != nil {
+					log.Printf("⚠️ %v", err)
+				} else {
+					env.HasRaw = true
+				}
+			}
 		}
 
-		// 4.3: Publicação na Fila (Somente se não for descartado)
-		if err := redis.PublishMessage(ctxRedis, payload); err != nil {
+		// 4.3: Publicação do ENVELOPE COMPACTO na Fila (Somente se não for descartado)
+		compact, err := json.Marshal(env)
+		if err != nil {
+			log.Printf("❌ Falha ao serializar envelope. Publicando bruto: %v", err)
+			compact = payload
+		}
+		if err := redis.PublishMessage(ctxRedis, compact); err != nil {
 			log.Printf("❌ ERRO ASSÍNCRONO CRÍTICO: Falha ao publicar no Redis: %v", err)
 		}
-	}(rawBody)
-}
\ No newline at end of file
+	}(rawBody, time.Now(), envelope.TraceID(r.Header.Get("traceparent")))
+}
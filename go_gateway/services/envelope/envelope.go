@@ -0,0 +1,100 @@
+package envelope
+
+import (
+	"crypto/rand"
+	"encoding/hex"
+	"encoding/json"
+	"errors"
+	"fmt"
+	"strings"
+	"time"
+)
+
+// Version: versão do formato do envelope (o worker Python aceita o legado sem "v")
+const Version = 1
+
+// WahaEvent: apenas os campos do webhook WAHA que o worker usa.
+// O json.Unmarshal ignora o restante (metadata, _data completo, mídia...).
+type WahaEvent struct {
+	ID      string `json:"id"`
+	Payload struct {
+		ID        string `json:"id"`
+		From      string `json:"from"`
+		Body      string `json:"body"`
+		Timestamp int64  `json:"timestamp"`
+		Data      struct {
+			Type string `json:"type"`
+		} `json:"_data"`
+	} `json:"payload"`
+}
+
+// Envelope: payload compacto e normalizado publicado na fila new_user_queue.
+type Envelope struct {
+	V          int    `json:"v"`
+	EventID    string `json:"event_id,omitempty"`
+	MessageID  string `json:"message_id,omitempty"`
+	From       string `json:"from,omitempty"`
+	Body       string `json:"body"`
+	Type       string `json:"type,omitempty"`
+	Timestamp  int64  `json:"timestamp,omitempty"`
+	ReceivedAt int64  `json:"received_at"`
+	// TraceID: trace W3C (32 hex) propagado até o worker para o tracing ponta a ponta
+	TraceID string `json:"trace_id,omitempty"`
+	// Idempotency: preenchido com o ID quando o SETNX do gateway foi bem-sucedido
+	Idempotency string `json:"_idempotency,omitempty"`
+	// HasRaw: o corpo bruto foi guardado à parte (raw_event:{id})
+	HasRaw bool `json:"has_raw,omitempty"`
+}
+
+// Parse: desserializa o webhook bruto uma única vez.
+func Parse(rawBody []byte) (*WahaEvent, error) {
+	var event WahaEvent
+	if err := json.Unmarshal(rawBody, &event); err != nil {
+		return nil, fmt.Errorf("falha ao desserializar payload WAHA: %w", err)
+	}
+	return &event, nil
+}
+
+// DedupeID: ID usado na idempotência. Preferimos o ID da MENSAGEM (payload.id);
+// o ID do evento do webhook (id) é apenas fallback.
+func (e *WahaEvent) DedupeID() (string, error) {
+	if e.Payload.ID != "" {
+		return e.Payload.ID, nil
+	}
+	if e.ID != "" {
+		return e.ID, nil
+	}
+	return "", errors.New("campo 'id' único não encontrado ou vazio no payload")
+}
+
+// TraceID: reaproveita o trace-id do header W3C `traceparent` (00-<trace>-<span>-<flags>)
+// ou gera um novo (16 bytes aleatórios em hex).
+func TraceID(traceparent string) string {
+	parts := strings.Split(traceparent, "-")
+	if len(parts) == 4 && len(parts[1]) == 32 {
+		if _, err := hex.DecodeString(parts[1]); err == nil && parts[1] != strings.Repeat("0", 32) {
+			return parts[1]
+		}
+	}
+
+	buf := make([]byte, 16)
+	if _, err := rand.Read(buf); err != nil {
+		return ""
+	}
+	return hex.EncodeToString(buf)
+}
+
+// Build: monta o envelope compacto com o horário de recebimento no gateway.
+func (e *WahaEvent) Build(receivedAt time.Time, traceID string) Envelope {
+	return Envelope{
+		V:          Version,
+		EventID:    e.ID,
+		MessageID:  e.Payload.ID,
+		From:       e.Payload.From,
+		Body:       e.Payload.Body,
+		Type:       e.Payload.Data.Type,
+		Timestamp:  e.Payload.Timestamp,
+		ReceivedAt: receivedAt.UnixMilli(),
+		TraceID:    traceID,
+	}
+}
@@ -2,8 +2,6 @@ package redis
 
 import (
 	"context"
-	"encoding/json" // NOVO: Para analisar o JSON
-	"errors"        // NOVO: Para retornar erros
 	"fmt"
 	"os"
 	"time"
@@ -20,15 +18,13 @@ var Client *redis.Client
 // IdempotencyClient (DB 3 - Chaves de Idempotência)
 var IdempotencyClient *redis.Client
 
-// --- NOVAS CONSTANTES PARA IDEMPOTÊNCIA ---
+// --- CONSTANTES DE IDEMPOTÊNCIA (compartilhadas com services/idempotency.py) ---
 const idempotencyKeyPrefix = "idempotency:event:" // O prefixo para as chaves no Redis (boa prática)
-const idempotencyTTL = time.Hour * 3             // TTL (Tempo de Vida) da chave: 24 horas (otimizado)
+const idempotencyTTL = time.Hour * 3             // TTL (Tempo de Vida) da chave: 3 horas
 
-// Estrutura Mínima para extrair o ID do Payload WAHA.
-// O campo `json:"id"` diz ao Go para procurar o campo "id" no JSON bruto.
-type EventPayload struct {
-	ID string `json:"id"` 
-}
+// --- CORPO BRUTO À PARTE (opcional, GATEWAY_STORE_RAW=true) ---
+const rawEventKeyPrefix = "raw_event:"
+const rawEventTTL = time.Hour * 24
 
 // InitClient configura e testa a conexão com o Redis
 func InitClient(ctx context.Context) error {
@@ -109,20 +105,11 @@ func CheckAndSetIdempotency(ctx context.Context, eventID string) (bool, error) {
 	return !result, nil
 }
 
-// ExtractEventID: Analisa o JSON bruto para obter o ID único.
-// É crucial para extrair o ID antes de fazer o SETNX.
-func ExtractEventID(rawBody []byte) (string, error) {
-	var payload EventPayload
-    
-    // json.Unmarshal tenta mapear o JSON no array de bytes (rawBody) para a struct 'payload'.
-	if err := json.Unmarshal(rawBody, &payload); err != nil {
-		return "", fmt.Errorf("falha ao desserializar ID do payload: %w", err)
-	}
-    
-    // Se o ID estiver vazio, é provavelmente uma notificação de status (não duplicata de mensagem).
-	if payload.ID == "" {
-		return "", errors.New("campo 'id' único não encontrado ou vazio no payload")
+// StoreRawEvent guarda o webhook bruto (DB 0) para diagnóstico/reprocessamento.
+// A fila recebe apenas o envelope compacto; o worker só lê esta chave quando precisa.
+func StoreRawEvent(ctx context.Context, eventID string, rawBody []byte) error {
+	if err := Client.Set(ctx, rawEventKeyPrefix+eventID, rawBody, rawEventTTL).Err(); err != nil {
+		return fmt.Errorf("falha ao guardar payload bruto no Redis: %w", err)
 	}
-
-	return payload.ID, nil
-}
\ No newline at end of file
+	return nil
+}
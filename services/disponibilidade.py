@@ -0,0 +1,235 @@
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from services.modelos_agenda import ModeloAgenda, grade_do_dia, modelo_ativo
+from services.tracing import rastrear
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DISPONIBILIDADE MULTI-AGENDA COM BITMAPS POR MINUTO
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# Cada par (agenda, dia) vira um int de 1440 bits: bit m = minuto m (horário de Brasília)
+# LIVRE. "Início livre por D minutos" é calculado com ANDs deslocados (O(log D) operações
+# sobre o dia inteiro), e:
+#   - profissional específico livre -> bitmap daquela agenda
+#   - qualquer profissional livre   -> OR dos bitmaps das agendas
+# Tudo vem de UMA consulta freebusy com vários `items` (em lotes de 50 agendas).
+#
+# GOOGLE_CALENDAR_IDS: agendas dos profissionais (separadas por vírgula), na ordem de
+# preferência para novos agendamentos. Sem a variável, vale apenas GOOGLE_CALENDAR_ID.
+
+BR_TIMEZONE = timezone(timedelta(hours=-3))
+MINUTOS_DIA = 24 * 60
+DIA_LIVRE = (1 << MINUTOS_DIA) - 1
+
+# Limite de `items` por consulta freebusy da API do Google Calendar
+FREEBUSY_MAX_AGENDAS = 50
+
+GOOGLE_CALENDAR_ID = os.environ.get('GOOGLE_CALENDAR_ID', 'maiconwantuil@gmail.com')
+GOOGLE_CALENDAR_IDS = [
+    c.strip() for c in (os.environ.get('GOOGLE_CALENDAR_IDS') or GOOGLE_CALENDAR_ID).split(',') if c.strip()
+]
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ARITMÉTICA DE BITMAPS (funções puras)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def mascara(inicio_min: int, fim_min: int) -> int:
+    """Bits [inicio_min, fim_min) ligados, recortados ao dia."""
+    inicio = max(0, inicio_min)
+    fim = min(MINUTOS_DIA, fim_min)
+    if fim <= inicio:
+        return 0
+    return ((1 << (fim - inicio)) - 1) << inicio
+
+def inicios_livres(livre: int, duracao_min: int) -> int:
+    """Bit s ligado sse os minutos [s, s + duracao_min) estão todos livres."""
+    resultado = livre
+    coberto = 1
+    while coberto < duracao_min:
+        passo = min(coberto, duracao_min - coberto)
+        resultado &= resultado >> passo
+        coberto += passo
+    return resultado
+
+def minutos_ligados(bits: int):
+    """Itera os minutos (bits ligados) em ordem crescente."""
+    while bits:
+        menor = bits & -bits
+        yield menor.bit_length() - 1
+        bits ^= menor
+
+def formatar_minuto(minuto: int) -> str:
+    return f"{minuto // 60:02d}:{minuto % 60:02d}"
+
+def primeiro_minuto_permitido(dia: date, agora: datetime, margem_min: int = 30) -> int:
+    """Primeiro minuto do dia aceito como início (hoje: agora + margem; passado: nenhum)."""
+    limite = agora.astimezone(BR_TIMEZONE) + timedelta(minutes=margem_min)
+    if dia > limite.date():
+        return 0
+    if dia < limite.date():
+        return MINUTOS_DIA
+    return limite.hour * 60 + limite.minute + (1 if limite.second or limite.microsecond else 0)
+
+def livre_a_partir_dos_blocos(blocos: list, dias: list[date]) -> dict:
+    """
+    Converte os blocos `busy` do freebusy (ISO 8601) em bitmaps de minutos LIVRES por dia.
+
+    :return: {date: int}
+    """
+    livres = {dia: DIA_LIVRE for dia in dias}
+    for bloco in blocos:
+        try:
+            inicio = datetime.fromisoformat(bloco['start']).astimezone(BR_TIMEZONE)
+            fim = datetime.fromisoformat(bloco['end']).astimezone(BR_TIMEZONE)
+        except (KeyError, ValueError):
+            continue
+
+        dia = inicio.date()
+        while dia <= fim.date():
+            if dia in livres:
+                inicio_min = inicio.hour * 60 + inicio.minute if dia == inicio.date() else 0
+                fim_min = fim.hour * 60 + fim.minute + (1 if fim.second else 0) if dia == fim.date() else MINUTOS_DIA
+                livres[dia] &= ~mascara(inicio_min, fim_min)
+            dia += timedelta(days=1)
+    return livres
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CONSULTA FREEBUSY
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@rastrear("calendar.freebusy_multi")
+def consultar_freebusy_intervalo(service, calendar_ids: list[str], inicio: datetime, fim: datetime) -> dict:
+    """
+    Blocos ocupados de várias agendas em [inicio, fim) (uma chamada por lote de 50).
+
+    :return: {calendar_id: [{"start", "end"}, ...]}
+    :raises Exception: erros da API são propagados (o chamador decide o fallback)
+    """
+    ocupados = {}
+    for i in range(0, len(calendar_ids), FREEBUSY_MAX_AGENDAS):
+        lote = calendar_ids[i:i + FREEBUSY_MAX_AGENDAS]
+        resposta = service.freebusy().query(body={
+            "timeMin": inicio.isoformat(),
+            "timeMax": fim.isoformat(),
+            "items": [{"id": cid} for cid in lote],
+        }).execute()
+        calendarios = resposta.get('calendars', {})
+        for cid in lote:
+            info = calendarios.get(cid, {})
+            if info.get('errors') or cid not in calendarios:
+                # Sem resposta confiável: a agenda inteira conta como ocupada no intervalo
+                logger.warning(f"⚠️ Freebusy da agenda {cid} retornou erros: {info.get('errors')}")
+                ocupados[cid] = [{"start": inicio.isoformat(), "end": fim.isoformat()}]
+            else:
+                ocupados[cid] = info.get('busy', [])
+    return ocupados
+
+def consultar_freebusy(service, calendar_ids: list[str], data_inicio: date, data_fim: date) -> dict:
+    """Blocos ocupados das agendas nos dias [data_inicio, data_fim] inteiros (horário de Brasília)."""
+    return consultar_freebusy_intervalo(
+        service, calendar_ids,
+        datetime.combine(data_inicio, datetime.min.time(), BR_TIMEZONE),
+        datetime.combine(data_fim + timedelta(days=1), datetime.min.time(), BR_TIMEZONE),
+    )
+
+def agendas_livres_no_intervalo(service, calendar_ids: list[str], inicio: datetime, fim: datetime) -> list[str]:
+    """
+    Checagem estreita de um único slot: agendas sem nenhum bloco ocupado em [inicio, fim),
+    na ordem recebida.
+    """
+    ocupados = consultar_freebusy_intervalo(service, calendar_ids, inicio, fim)
+    livres = []
+    for cid in calendar_ids:
+        conflito = False
+        for bloco in ocupados.get(cid, []):
+            try:
+                conflito = (datetime.fromisoformat(bloco['start']) < fim
+                            and datetime.fromisoformat(bloco['end']) > inicio)
+            except (KeyError, ValueError):
+                conflito = True
+            if conflito:
+                break
+        if not conflito:
+            livres.append(cid)
+    return livres
+
+class AgendaDisponibilidade:
+    """
+    Bitmaps de minutos livres por (agenda, dia), carregados com uma consulta freebusy.
+    Agendas com erro no freebusy ficam totalmente ocupadas (nunca oferecemos slot incerto).
+    Os inícios possíveis vêm do modelo de agenda (services/modelos_agenda.py), fixado na
+    criação para que toda a consulta use o mesmo expediente.
+    """
+
+    def __init__(self, calendar_ids: list[str] | None = None, modelo: ModeloAgenda | None = None):
+        self.calendar_ids = list(calendar_ids or GOOGLE_CALENDAR_IDS)
+        self.modelo = modelo or modelo_ativo()
+        self.livres = {cid: {} for cid in self.calendar_ids}
+
+    def carregar(self, service, data_inicio: date, data_fim: date) -> "AgendaDisponibilidade":
+        dias = [data_inicio + timedelta(days=i) for i in range((data_fim - data_inicio).days + 1)]
+        ocupados = consultar_freebusy(service, self.calendar_ids, data_inicio, data_fim)
+        for cid in self.calendar_ids:
+            self.livres[cid].update(livre_a_partir_dos_blocos(ocupados.get(cid, []), dias))
+        return self
+
+    def carregado(self, dia: date) -> bool:
+        return all(dia in por_dia for por_dia in self.livres.values())
+
+    def duracao(self, dia: date, duracao_min: int | None = None) -> int:
+        return duracao_min or self.modelo.duracao(dia)
+
+    def inicios(self, dia: date, duracao_min: int | None = None, calendar_id: str | None = None,
+                a_partir_de_min: int = 0) -> int:
+        """
+        Bitmap dos inícios de slot livres no dia, já recortado pela grade do modelo.
+        calendar_id=None -> qualquer profissional livre (OR entre as agendas).
+        duracao_min=None -> duração do slot definida no modelo para o dia.
+        """
+        duracao_min = self.duracao(dia, duracao_min)
+        grade = grade_do_dia(dia, duracao_min, self.modelo) & ~mascara(0, a_partir_de_min)
+        if not grade:
+            return 0
+        agendas = [calendar_id] if calendar_id else self.calendar_ids
+        livres = 0
+        for cid in agendas:
+            livres |= inicios_livres(self.livres[cid].get(dia, 0), duracao_min)
+        return livres & grade
+
+    def horarios_livres(self, dia: date, duracao_min: int | None = None, calendar_id: str | None = None,
+                        a_partir_de_min: int = 0) -> list[str]:
+        bits = self.inicios(dia, duracao_min, calendar_id, a_partir_de_min)
+        return [formatar_minuto(m) for m in minutos_ligados(bits)]
+
+    def profissionais_livres(self, dia: date, inicio_min: int, duracao_min: int | None = None) -> list[str]:
+        """Agendas livres durante [inicio_min, inicio_min + duracao_min), na ordem configurada."""
+        janela = mascara(inicio_min, inicio_min + self.duracao(dia, duracao_min))
+        return [
+            cid for cid in self.calendar_ids
+            if self.livres[cid].get(dia, 0) & janela == janela
+        ]
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# REFERÊNCIA DE EVENTO (agenda + id) GUARDADA NO BANCO
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# Eventos da agenda principal (GOOGLE_CALENDAR_ID) mantêm o id puro, compatível com os
+# registros existentes; nas demais agendas o gcal_id salvo é "{calendar_id}|{event_id}".
+
+SEPARADOR_REFERENCIA = "|"
+
+def referencia_evento(calendar_id: str, event_id: str) -> str:
+    if calendar_id == GOOGLE_CALENDAR_ID:
+        return event_id
+    return f"{calendar_id}{SEPARADOR_REFERENCIA}{event_id}"
+
+def separar_referencia_evento(referencia: str) -> tuple[str, str]:
+    """:return: (calendar_id, event_id)"""
+    if SEPARADOR_REFERENCIA in referencia:
+        calendar_id, event_id = referencia.split(SEPARADOR_REFERENCIA, 1)
+        return calendar_id, event_id
+    return GOOGLE_CALENDAR_ID, referencia
@@ -0,0 +1,77 @@
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ENVELOPE DA FILA new_user_queue (produzido pelo Gateway Go)
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# v1: {"v": 1, "event_id", "message_id", "from", "body", "type", "timestamp",
+#      "received_at" (ms), "trace_id", "_idempotency"?, "has_raw"?}
+# Payloads sem "v" são o webhook WAHA bruto (legado / fallback do gateway).
+
+ENVELOPE_VERSAO = 1
+RAW_EVENT_KEY_PREFIX = "raw_event:"
+
+def normalizar_mensagem(main_data: dict) -> dict:
+    """
+    Converte o item da fila (envelope v1 ou webhook WAHA legado) num dict normalizado:
+    {message_id, chat_id, body, type, event_id, received_at, trace_id, has_raw}
+    """
+    if main_data.get("v") == ENVELOPE_VERSAO:
+        return {
+            "message_id": main_data.get("message_id"),
+            "chat_id": main_data.get("from"),
+            "body": (main_data.get("body") or "").strip(),
+            "type": main_data.get("type"),
+            "event_id": main_data.get("event_id"),
+            "received_at": main_data.get("received_at"),
+            "trace_id": main_data.get("trace_id"),
+            "has_raw": bool(main_data.get("has_raw")),
+        }
+
+    # Legado: webhook WAHA completo
+    message_data = main_data.get("payload") or {}
+    return {
+        "message_id": message_data.get("id"),
+        "chat_id": message_data.get("from"),
+        "body": (message_data.get("body") or "").strip(),
+        "type": (message_data.get("_data") or {}).get("type"),
+        "event_id": main_data.get("id"),
+        "received_at": None,
+        "trace_id": None,
+        "has_raw": False,
+    }
+
+def decodificar_item_fila(raw_payload: bytes) -> tuple[dict, dict]:
+    """
+    :return: (dados brutos do item, mensagem normalizada)
+    :raises ValueError: se o item não for JSON válido
+    """
+    main_data = json.loads(raw_payload)
+    if not isinstance(main_data, dict):
+        raise ValueError("Item da fila não é um objeto JSON.")
+    return main_data, normalizar_mensagem(main_data)
+
+def tempo_na_fila_ms(mensagem: dict) -> float | None:
+    """Tempo entre o recebimento no gateway e agora (ms), quando o envelope traz received_at."""
+    received_at = mensagem.get("received_at")
+    if not received_at:
+        return None
+    return max(0.0, time.time() * 1000 - received_at)
+
+def carregar_payload_bruto(redis_client, event_id: str) -> dict | None:
+    """
+    Lê o webhook bruto guardado à parte pelo gateway (GATEWAY_STORE_RAW=true).
+    Só deve ser usado quando o envelope não basta (diagnóstico/reprocessamento).
+    """
+    bruto = redis_client.get(f"{RAW_EVENT_KEY_PREFIX}{event_id}")
+    if bruto is None:
+        return None
+    try:
+        return json.loads(bruto)
+    except ValueError as e:
+        logger.warning(f"⚠️ Payload bruto de {event_id} inválido: {e}")
+        return None
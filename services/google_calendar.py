@@ -0,0 +1,74 @@
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CLIENTE GOOGLE CALENDAR: DISCOVERY OFFLINE + SERVIÇO/CREDENCIAIS POR PROCESSO
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# `build('calendar', 'v3')` pode baixar e parsear o documento de discovery a cada
+# chamada (depende da versão do google-api-python-client). Aqui o serviço é montado
+# UMA vez por processo a partir de um documento estático:
+#   - GOOGLE_CALENDAR_DISCOVERY_PATH (JSON do discovery v3 versionado junto ao deploy), ou
+#   - o documento embutido no próprio pacote (static_discovery=True, sem rede).
+# As credenciais da service account também são únicas por processo: o access token
+# renovado fica no objeto e é reaproveitado até expirar.
+#
+# O objeto de serviço (httplib2) não é thread-safe: use um por processo/thread de consumo
+# (worker da fila e Celery prefork já são single-thread por processo).
+
+CALENDAR_SCOPE = ['https://www.googleapis.com/auth/calendar']
+GOOGLE_CREDENTIALS_PATH = os.environ.get('GOOGLE_CREDENTIALS_PATH', 'caminho/para/o/seu-arquivo-de-credenciais.json')
+GOOGLE_CALENDAR_DISCOVERY_PATH = os.environ.get('GOOGLE_CALENDAR_DISCOVERY_PATH')
+
+_credenciais = None
+_servico = None
+_lock = threading.Lock()
+
+def obter_credenciais():
+    """Credenciais da service account (singleton por processo)."""
+    global _credenciais
+    if _credenciais is None:
+        from google.oauth2 import service_account
+
+        _credenciais = service_account.Credentials.from_service_account_file(
+            GOOGLE_CREDENTIALS_PATH,
+            scopes=CALENDAR_SCOPE
+        )
+    return _credenciais
+
+def _construir_servico(credenciais):
+    # Import tardio: googleapiclient é pesado e só é necessário no primeiro uso da agenda
+    from googleapiclient.discovery import build, build_from_document
+
+    if GOOGLE_CALENDAR_DISCOVERY_PATH:
+        with open(GOOGLE_CALENDAR_DISCOVERY_PATH, encoding='utf-8') as f:
+            documento = json.load(f)
+        logger.info(f"📅 Calendar montado a partir do discovery em {GOOGLE_CALENDAR_DISCOVERY_PATH}.")
+        return build_from_document(documento, credentials=credenciais)
+
+    return build('calendar', 'v3', credentials=credenciais, static_discovery=True, cache_discovery=False)
+
+def obter_servico_calendar():
+    """
+    Serviço do Google Calendar (singleton por processo).
+
+    :raises Exception: falhas de credencial/discovery são propagadas (o chamador decide o fallback)
+    """
+    global _servico
+    if _servico is None:
+        with _lock:
+            if _servico is None:
+                _servico = _construir_servico(obter_credenciais())
+                logger.info("📅 Serviço do Google Calendar construído (cache do processo).")
+    return _servico
+
+def resetar_servico_calendar():
+    """Descarta serviço e credenciais em cache (ex: troca do arquivo de credenciais)."""
+    global _credenciais, _servico
+    with _lock:
+        _credenciais = None
+        _servico = None
@@ -0,0 +1,87 @@
+import logging
+import os
+
+import redis
+
+from services.local_cache import LocalTTLCache
+from services.tracing import rastrear
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# IDEMPOTÊNCIA ÚNICA (Gateway Go + Worker Python)
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# Um único schema de chave, banco e TTL, compartilhado com go_gateway/services/redis:
+#   DB 3 | idempotency:event:{id} | TTL 3h
+# O {id} é o ID da mensagem (payload.id do WAHA); sem ele, o ID do evento do webhook.
+#
+# Quando o gateway registra a chave com sucesso, ele carimba o payload com
+# CAMPO_CARIMBO = {id}; o worker então pula a própria checagem (zero round trips).
+
+IDEMPOTENCY_REDIS_DB = int(os.environ.get('IDEMPOTENCY_REDIS_DB', 3))
+IDEMPOTENCY_KEY_PREFIX = "idempotency:event:"
+IDEMPOTENCY_TTL = 60 * 60 * 3
+CAMPO_CARIMBO = "_idempotency"
+
+# Pré-filtro local EXATO (não probabilístico): IDs que este processo já registrou.
+# Um acerto aqui é duplicata certa; um miss sempre consulta o Redis.
+_vistos_localmente = LocalTTLCache(
+    max_itens=int(os.environ.get('IDEMPOTENCY_LOCAL_MAX_ITENS', 10000)),
+    ttl=IDEMPOTENCY_TTL,
+)
+
+_idempotency_client = None
+
+def get_idempotency_client():
+    """Cliente Redis (singleton por processo) do banco de idempotência."""
+    global _idempotency_client
+    if _idempotency_client is None:
+        _idempotency_client = redis.Redis(
+            host=os.environ.get('REDIS_HOST', 'redis'),
+            port=int(os.environ.get('REDIS_PORT', 6379)),
+            db=IDEMPOTENCY_REDIS_DB,
+            decode_responses=False,
+            socket_connect_timeout=5,
+        )
+    return _idempotency_client
+
+def get_idempotency_key(event_id: str) -> str:
+    return f"{IDEMPOTENCY_KEY_PREFIX}{event_id}"
+
+def carimbado_pelo_gateway(main_data: dict, event_id: str) -> bool:
+    """True se o gateway já registrou este ID (payload carimbado com o mesmo ID)."""
+    return bool(event_id) and main_data.get(CAMPO_CARIMBO) == event_id
+
+@rastrear("redis.registrar_evento_unico")
+def registrar_evento_unico(event_id: str) -> bool:
+    """
+    Registra o ID (SET NX EX no DB de idempotência).
+
+    :return: True se o evento é NOVO, False se for DUPLICADO.
+             Em falha do Redis retorna True (prefere processar a perder mensagem).
+    """
+    if _vistos_localmente.get(event_id) is not None:
+        return False
+
+    try:
+        novo = get_idempotency_client().set(
+            get_idempotency_key(event_id), 1, ex=IDEMPOTENCY_TTL, nx=True
+        )
+    except redis.RedisError as e:
+        logger.error(f"❌ Redis de idempotência indisponível ({e}). Processando {event_id} sem checagem.")
+        return True
+
+    _vistos_localmente.set(event_id, True)
+    return novo is not None
+
+def liberar_evento(event_id: str):
+    """
+    Remove o registro do ID (local e Redis) para que um re-enfileiramento
+    após falha não seja descartado como duplicata.
+    """
+    _vistos_localmente.invalidate(event_id)
+    try:
+        get_idempotency_client().delete(get_idempotency_key(event_id))
+    except redis.RedisError as e:
+        logger.warning(f"⚠️ Falha ao liberar idempotência de {event_id}: {e}")
@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CACHE LOCAL (IN-PROCESS): LRU com TTL curto na frente do Redis
+# ═══════════════════════════════════════════════════════════════════════════════
+
+LOCAL_PROFILE_CACHE_MAX_ITENS = int(os.environ.get('LOCAL_PROFILE_CACHE_MAX_ITENS', 1024))
+LOCAL_PROFILE_CACHE_TTL = float(os.environ.get('LOCAL_PROFILE_CACHE_TTL', 30))
+
+# Contadores de invalidação por faixa de chaves (hash % N): limite fixo de memória e
+# colisões só tornam o `set` condicional mais conservador
+FAIXAS_GERACAO = 256
+
+class LocalTTLCache:
+    """
+    LRU thread-safe com expiração por item (relógio monotônico).
+    Guarda os objetos já decodificados: quem lê NÃO deve mutar o valor retornado.
+
+    Para popular a partir de uma leitura remota sem perder uma invalidação que chegue
+    durante ela: capture `geracao(chave)` antes da leitura e passe-a ao `set`, que
+    descarta o valor se a chave foi invalidada (ou o cache limpo) nesse meio-tempo.
+    """
+
+    def __init__(self, max_itens: int, ttl: float):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoca = 0
+        self._geracoes = [0] * FAIXAS_GERACAO
+
+    def _geracao(self, chave: Hashable) -> tuple[int, int]:
+        return self._epoca, self._geracoes[hash(chave) % FAIXAS_GERACAO]
+
+    def geracao(self, chave: Hashable) -> tuple[int, int]:
+        with self._lock:
+            return self._geracao(chave)
+
+    def get(self, chave: Hashable) -> Any | None:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+
+            expira_em, valor = item
+            if expira_em <= time.monotonic():
+                del self._itens[chave]
+                return None
+
+            self._itens.move_to_end(chave)
+            return valor
+
+    def set(self, chave: Hashable, valor: Any, ttl: float | None = None,
+            geracao: tuple[int, int] | None = None) -> bool:
+        """:return: False se `geracao` foi informada e a chave foi invalidada desde então"""
+        expira_em = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if geracao is not None and geracao != self._geracao(chave):
+                return False
+            self._itens[chave] = (expira_em, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+            return True
+
+    def invalidate(self, chave: Hashable) -> None:
+        with self._lock:
+            self._itens.pop(chave, None)
+            self._geracoes[hash(chave) % FAIXAS_GERACAO] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._itens.clear()
+            self._epoca += 1
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+# Tier L1 dos perfis de usuário (L2 = cache:user_profile:* no Redis)
+perfis_locais = LocalTTLCache(
+    max_itens=LOCAL_PROFILE_CACHE_MAX_ITENS,
+    ttl=LOCAL_PROFILE_CACHE_TTL,
+)
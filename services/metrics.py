@@ -18,6 +18,11 @@ def registrar_evento(
     Esta função substitui a antiga lógica que usava o ORM.
     """
     
+    if not cliente_id:
+        # O BaaS rejeita: cliente_id vazio é reservado ao total GLOBAL do rollup diário
+        logger.warning(f"Métrica {tipo_metrica} descartada: cliente_id vazio (event_id={event_id}).")
+        return {'status': 'FAILURE', 'message': 'cliente_id vazio.'}
+
     payload = {
         'cliente_id': cliente_id,
         'event_id': event_id,
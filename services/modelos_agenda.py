@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+from datetime import date
+from functools import lru_cache
+
+from services.local_cache import LocalTTLCache
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MODELOS DE AGENDA: EXPEDIENTE, PAUSAS, FERIADOS E DURAÇÃO DOS SLOTS
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# Fonte única de "quando a clínica atende". Origem do modelo ativo, em ordem:
+#   1. Redis (AGENDA_MODELO_REDIS_KEY), publicado pelo BaaS a cada alteração em
+#      ConfiguracaoAgenda (chatbot_api/signals.py);
+#   2. AGENDA_MODELO_JSON (JSON inline) ou AGENDA_MODELO_PATH (arquivo JSON);
+#   3. MODELO_PADRAO (seg-sáb 07:00-20:00, slots de 60 min, domingo fechado).
+#
+# Formato:
+#   {
+#     "nome": "padrao",
+#     "duracao_slot_min": 60,           # duração padrão da consulta
+#     "passo_min": 60,                  # espaçamento entre inícios (padrão: a duração)
+#     "duracoes": {"sab": 30},          # duração por dia da semana (opcional)
+#     "expediente": {"seg": [["07:00", "20:00"]], ..., "dom": []},
+#     "pausas": {"*": [["12:00", "13:00"]]},   # "*" vale para todos os dias
+#     "feriados": ["12-25", "2026-11-20"]      # MM-DD (todo ano) ou AAAA-MM-DD
+#   }
+#
+# A grade de inícios (bitmap de minutos, ver services/disponibilidade.py) é calculada uma
+# vez por (modelo, dia da semana, duração) e memoizada; feriados só zeram a grade do dia.
+
+DIAS_SEMANA = ("seg", "ter", "qua", "qui", "sex", "sab", "dom")
+MINUTOS_DIA = 24 * 60
+
+AGENDA_MODELO_REDIS_KEY = "agenda:modelo_ativo"
+AGENDA_MODELO_JSON = os.environ.get('AGENDA_MODELO_JSON')
+AGENDA_MODELO_PATH = os.environ.get('AGENDA_MODELO_PATH')
+AGENDA_MODELO_CACHE_TTL = float(os.environ.get('AGENDA_MODELO_CACHE_TTL', 60))
+
+MODELO_PADRAO = {
+    "nome": "padrao",
+    "duracao_slot_min": 60,
+    "passo_min": 60,
+    "expediente": {dia: [["07:00", "20:00"]] for dia in DIAS_SEMANA[:6]},
+    "pausas": {},
+    "feriados": [],
+}
+
+def _minuto(hora: str) -> int:
+    """'HH:MM' -> minuto do dia ('24:00' é aceito como fim do dia)."""
+    horas, minutos = hora.split(":")
+    valor = int(horas) * 60 + int(minutos)
+    if not 0 <= valor <= MINUTOS_DIA or not 0 <= int(minutos) < 60:
+        raise ValueError(f"Horário fora do dia: '{hora}'")
+    return valor
+
+def _intervalos(lista) -> tuple:
+    intervalos = []
+    for inicio, fim in lista or []:
+        inicio_min, fim_min = _minuto(inicio), _minuto(fim)
+        if fim_min <= inicio_min:
+            raise ValueError(f"Intervalo inválido: {inicio}-{fim}")
+        intervalos.append((inicio_min, fim_min))
+    return tuple(sorted(intervalos))
+
+def _por_dia(config: dict | None) -> tuple:
+    """{"seg": [...], "*": [...]} -> tupla com os intervalos de cada dia (seg..dom)."""
+    config = config or {}
+    desconhecidos = set(config) - set(DIAS_SEMANA) - {"*"}
+    if desconhecidos:
+        raise ValueError(f"Dias da semana desconhecidos: {sorted(desconhecidos)}")
+    return tuple(_intervalos(config.get(dia, config.get("*"))) for dia in DIAS_SEMANA)
+
+class ModeloAgenda:
+    """
+    Modelo de agenda imutável e hashable (chave dos caches de grade).
+    Use `ModeloAgenda.de_dict` para montar a partir da configuração.
+    """
+
+    def __init__(self, nome: str, expediente: tuple, pausas: tuple, feriados: frozenset,
+                 duracoes: tuple, passo_min: int | None):
+        self.nome = nome
+        self.expediente = expediente
+        self.pausas = pausas
+        self.feriados = feriados
+        self.duracoes = duracoes
+        self.passo_min = passo_min
+        self._chave = (nome, expediente, pausas, feriados, duracoes, passo_min)
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "ModeloAgenda":
+        """:raises ValueError: configuração inválida"""
+        try:
+            duracao_padrao = int(dados.get("duracao_slot_min", 60))
+            duracoes_config = dados.get("duracoes", {})
+            duracoes = tuple(int(duracoes_config.get(dia, duracao_padrao)) for dia in DIAS_SEMANA)
+            passo = dados.get("passo_min")
+            passo_min = int(passo) if passo else None
+            feriados = frozenset(str(f) for f in dados.get("feriados", []))
+            for feriado in feriados:
+                date.fromisoformat(feriado if len(feriado) == 10 else f"2000-{feriado}")
+            expediente = _por_dia(dados.get("expediente"))
+            pausas = _por_dia(dados.get("pausas"))
+        except (TypeError, AttributeError) as e:
+            raise ValueError(f"Modelo de agenda mal formado: {e}") from e
+
+        if any(d <= 0 for d in duracoes) or (passo_min is not None and passo_min <= 0):
+            raise ValueError("Duração e passo dos slots devem ser positivos.")
+        return cls(str(dados.get("nome", "sem_nome")), expediente, pausas, feriados, duracoes, passo_min)
+
+    def __hash__(self):
+        return hash(self._chave)
+
+    def __eq__(self, outro):
+        return isinstance(outro, ModeloAgenda) and self._chave == outro._chave
+
+    def __repr__(self):
+        return f"ModeloAgenda({self.nome!r})"
+
+    def feriado(self, dia: date) -> bool:
+        return dia.isoformat() in self.feriados or dia.strftime("%m-%d") in self.feriados
+
+    def fechado(self, dia: date) -> bool:
+        return self.feriado(dia) or not self.expediente[dia.weekday()]
+
+    def duracao(self, dia: date) -> int:
+        return self.duracoes[dia.weekday()]
+
+    def janela(self, dia: date) -> tuple[int, int] | None:
+        """(primeiro minuto, último minuto) de expediente no dia, ou None se fechado."""
+        if self.fechado(dia):
+            return None
+        intervalos = self.expediente[dia.weekday()]
+        return intervalos[0][0], max(fim for _, fim in intervalos)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# GRADES MEMOIZADAS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _segmentos_abertos(modelo: ModeloAgenda, dia_semana: int) -> list[tuple[int, int]]:
+    """Expediente do dia menos as pausas (os inícios se realinham após cada pausa)."""
+    segmentos = []
+    for inicio, fim in modelo.expediente[dia_semana]:
+        cortes = [(inicio, fim)]
+        for p_inicio, p_fim in modelo.pausas[dia_semana]:
+            cortes = [
+                parte
+                for a, b in cortes
+                for parte in ((a, min(b, p_inicio)), (max(a, p_fim), b))
+                if parte[1] > parte[0]
+            ]
+        segmentos.extend(cortes)
+    return sorted(segmentos)
+
+@lru_cache(maxsize=256)
+def grade_semanal(modelo: ModeloAgenda, dia_semana: int, duracao_min: int) -> int:
+    """Bitmap dos inícios permitidos num dia da semana (0=seg) para slots de `duracao_min`."""
+    passo = modelo.passo_min or duracao_min
+    inicios = 0
+    for inicio, fim in _segmentos_abertos(modelo, dia_semana):
+        for minuto in range(inicio, fim - duracao_min + 1, passo):
+            inicios |= 1 << minuto
+    return inicios
+
+@lru_cache(maxsize=256)
+def horarios_semanais(modelo: ModeloAgenda, dia_semana: int, duracao_min: int) -> tuple[str, ...]:
+    """Mesma grade de `grade_semanal` formatada em HH:MM."""
+    bits = grade_semanal(modelo, dia_semana, duracao_min)
+    return tuple(f"{m // 60:02d}:{m % 60:02d}" for m in range(MINUTOS_DIA) if bits >> m & 1)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MODELO ATIVO (Redis -> config -> padrão)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_modelo_local = LocalTTLCache(max_itens=1, ttl=AGENDA_MODELO_CACHE_TTL)
+
+def _modelo_da_config() -> dict:
+    if AGENDA_MODELO_JSON:
+        return json.loads(AGENDA_MODELO_JSON)
+    if AGENDA_MODELO_PATH:
+        with open(AGENDA_MODELO_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    return MODELO_PADRAO
+
+def _modelo_do_redis() -> dict | None:
+    try:
+        from services.redis_client import get_redis_client
+
+        bruto = get_redis_client().get(AGENDA_MODELO_REDIS_KEY)
+        return json.loads(bruto) if bruto else None
+    except Exception as e:
+        logger.warning(f"⚠️ Modelo de agenda indisponível no Redis, usando configuração local: {e}")
+        return None
+
+def carregar_modelo() -> ModeloAgenda:
+    """Lê o modelo ativo das fontes, sem cache. Modelo inválido cai para o padrão."""
+    for origem, obter in (("redis", _modelo_do_redis), ("config", _modelo_da_config)):
+        try:
+            dados = obter()
+            if dados:
+                return ModeloAgenda.de_dict(dados)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Modelo de agenda inválido ({origem}): {e}")
+    return ModeloAgenda.de_dict(MODELO_PADRAO)
+
+def modelo_ativo() -> ModeloAgenda:
+    """Modelo ativo com cache local de AGENDA_MODELO_CACHE_TTL segundos."""
+    modelo = _modelo_local.get("ativo")
+    if modelo is None:
+        modelo = carregar_modelo()
+        _modelo_local.set("ativo", modelo)
+    return modelo
+
+def publicar_modelo(dados: dict | None) -> None:
+    """
+    Publica (ou remove, com None) o modelo ativo no Redis. Chamado pelo BaaS.
+
+    :raises ValueError: configuração inválida (nada é publicado)
+    """
+    from services.redis_client import get_redis_client
+
+    r = get_redis_client()
+    if dados is None:
+        r.delete(AGENDA_MODELO_REDIS_KEY)
+    else:
+        ModeloAgenda.de_dict(dados)
+        r.set(AGENDA_MODELO_REDIS_KEY, json.dumps(dados))
+    _modelo_local.clear()
+
+def grade_do_dia(dia: date, duracao_min: int | None = None, modelo: ModeloAgenda | None = None) -> int:
+    """Bitmap dos inícios permitidos na data (0 em feriados e dias sem expediente)."""
+    modelo = modelo or modelo_ativo()
+    if modelo.feriado(dia):
+        return 0
+    return grade_semanal(modelo, dia.weekday(), duracao_min or modelo.duracao(dia))
+
+def horarios_do_dia(dia: date, duracao_min: int | None = None, modelo: ModeloAgenda | None = None) -> tuple[str, ...]:
+    modelo = modelo or modelo_ativo()
+    if modelo.feriado(dia):
+        return ()
+    return horarios_semanais(modelo, dia.weekday(), duracao_min or modelo.duracao(dia))
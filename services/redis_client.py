@@ -1,7 +1,22 @@
 import redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
 import logging
 import os
 import json
+import threading
+import time
+
+from services.local_cache import perfis_locais
+from services.tracing import rastrear
+from services.redis_codec import (
+    SCHEMA_PERFIL,
+    CodecVersaoIncompativel,
+    codificar,
+    decodificar,
+    codificar_campo_sessao,
+    decodificar_campo_sessao,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -13,8 +28,115 @@ REDIS_DB = int(os.environ.get('REDIS_DB', 0))
 # ----------------------------------------------------
 # --- NOVAS CONSTANTES ---
 # ----------------------------------------------------
-USER_PROFILE_CACHE_TTL = 60 * 180
+# O BaaS publica invalidações a cada mudança em UserRegister (chatbot_api/signals.py),
+# então o TTL pode ser longo (24h). Invalidações que não chegam ao Redis (disjuntor aberto)
+# ficam pendentes no processo do BaaS e são reenviadas na primeira invalidação seguinte.
+USER_PROFILE_CACHE_TTL = int(os.environ.get('USER_PROFILE_CACHE_TTL', 60 * 60 * 24))
 USER_PROFILE_CACHE_PREFIX = "cache:user_profile:"
+USER_PROFILE_INVALIDATION_CHANNEL = "cache:user_profile:invalidacoes"
+
+# Geração por chat_id, incrementada (INCR) junto com o DEL de cada invalidação. Quem busca
+# o perfil no BaaS lê a geração antes do fetch e só grava o cache se ela não mudou: um fetch
+# iniciado antes do commit (dado antigo) não regrava o perfil; um iniciado depois grava.
+USER_PROFILE_GERACAO_PREFIX = "geracao:user_profile:"
+USER_PROFILE_GERACAO_TTL = int(os.environ.get('USER_PROFILE_GERACAO_TTL', 3600))
+
+# Invalidação roda no on_commit de toda escrita em UserRegister: cliente próprio com timeouts
+# curtos e disjuntor (após uma falha, pula o Redis por INVALIDACAO_PAUSA_S) para um Redis
+# fora do ar não segurar as requisições do BaaS.
+INVALIDACAO_TIMEOUT_S = float(os.environ.get('INVALIDACAO_TIMEOUT_S', 0.5))
+INVALIDACAO_PAUSA_S = float(os.environ.get('INVALIDACAO_PAUSA_S', 30))
+INVALIDACAO_PENDENTES_MAX = int(os.environ.get('INVALIDACAO_PENDENTES_MAX', 10000))
+_redis_invalidacao = None
+_invalidacao_suspensa_ate = 0.0
+_invalidacoes_pendentes: dict[str, None] = {}  # ordem de chegada (descarta as mais antigas)
+_pendentes_lock = threading.Lock()
+
+# Cache negativo: chat_id sem registro no BaaS (apagado no register_user via signal)
+USER_PROFILE_NEGATIVE_TTL = int(os.environ.get('USER_PROFILE_NEGATIVE_TTL', 60))
+PERFIL_NAO_ENCONTRADO = {"status": "NOT_FOUND"}
+
+# Single-flight entre processos: só quem detém o lock busca o perfil no BaaS
+USER_PROFILE_LOCK_PREFIX = "lock:user_profile:"
+USER_PROFILE_LOCK_TTL_MS = 5000
+
+def _get_redis_invalidacao():
+    """Cliente dedicado à invalidação (conecta sob demanda, sem ping, timeouts curtos)."""
+    global _redis_invalidacao
+    if _redis_invalidacao is None:
+        _redis_invalidacao = redis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            socket_connect_timeout=INVALIDACAO_TIMEOUT_S,
+            socket_timeout=INVALIDACAO_TIMEOUT_S,
+            retry=Retry(NoBackoff(), 0),  # redis-py recente retenta com backoff por padrão
+        )
+    return _redis_invalidacao
+
+def _guardar_pendentes(chat_ids: list[str]) -> None:
+    """Guarda invalidações não entregues para reenvio (limitado a INVALIDACAO_PENDENTES_MAX)."""
+    with _pendentes_lock:
+        for chat_id in chat_ids:
+            _invalidacoes_pendentes.pop(chat_id, None)
+            _invalidacoes_pendentes[chat_id] = None
+        excesso = len(_invalidacoes_pendentes) - INVALIDACAO_PENDENTES_MAX
+        for chat_id in list(_invalidacoes_pendentes)[:max(excesso, 0)]:
+            del _invalidacoes_pendentes[chat_id]
+    if excesso > 0:
+        logger.error(f"❌ {excesso} invalidações pendentes descartadas: staleness limitada pelo TTL do cache.")
+
+def _retirar_pendentes() -> list[str]:
+    with _pendentes_lock:
+        pendentes = list(_invalidacoes_pendentes)
+        _invalidacoes_pendentes.clear()
+    return pendentes
+
+def invalidar_perfis_usuario(chat_ids) -> int:
+    """
+    Remove o cache de perfil dos chat_ids informados (um único pipeline DEL),
+    avança a geração de cada um e publica os IDs no canal de invalidação para caches
+    locais dos processos.
+    Falhas de Redis são apenas logadas: invalidação nunca deve quebrar a escrita no DB.
+    Com o disjuntor aberto a chamada retorna na hora e os IDs ficam pendentes; eles vão
+    junto com a primeira invalidação entregue depois que o disjuntor fechar.
+
+    :param chat_ids: Iterável de chat_ids
+    :return: Quantidade de chaves removidas
+    """
+    global _invalidacao_suspensa_ate
+    chat_ids = [c for c in dict.fromkeys(chat_ids) if c]
+    if not chat_ids:
+        return 0
+
+    # O próprio processo não espera o eco do pub/sub para esquecer o perfil
+    for chat_id in chat_ids:
+        perfis_locais.invalidate(chat_id)
+
+    if time.monotonic() < _invalidacao_suspensa_ate:
+        _guardar_pendentes(chat_ids)
+        logger.warning(f"⚠️ Redis indisponível (disjuntor aberto): invalidação de {chat_ids} adiada.")
+        return 0
+
+    lote = list(dict.fromkeys(chat_ids + _retirar_pendentes()))
+    try:
+        pipe = _get_redis_invalidacao().pipeline(transaction=False)
+        pipe.delete(*[USER_PROFILE_CACHE_PREFIX + chat_id for chat_id in lote])
+        for chat_id in lote:
+            pipe.incr(USER_PROFILE_GERACAO_PREFIX + chat_id)
+            pipe.expire(USER_PROFILE_GERACAO_PREFIX + chat_id, USER_PROFILE_GERACAO_TTL)
+        pipe.publish(USER_PROFILE_INVALIDATION_CHANNEL, json.dumps(lote))
+        removidas = pipe.execute()[0]
+        logger.info(f"🗑️ Cache de perfil invalidado para {len(lote)} usuário(s) ({removidas} chave(s) removida(s)).")
+        return removidas
+    except Exception as e:
+        _guardar_pendentes(lote)
+        _invalidacao_suspensa_ate = time.monotonic() + INVALIDACAO_PAUSA_S
+        logger.warning(
+            f"⚠️ Falha ao invalidar cache de perfil para {chat_ids}: {e}. "
+            f"Invalidações suspensas por {INVALIDACAO_PAUSA_S:.0f}s."
+        )
+        return 0
 
 # 🎯 NOVO: Função para invalidar o cache de perfil
 def delete_user_profile_cache(chat_id: str):
@@ -22,19 +144,8 @@ def delete_user_profile_cache(chat_id: str):
     Deleta o cache de perfil do usuário, forçando o sistema a recarregar
     os dados (incluindo agendamentos) do BaaS na próxima consulta.
     """
-    # Pega o cliente Redis, que será 'None' se a conexão falhou
-    r = get_redis_client() 
-    
-    if r is None:
-        logger.warning("⚠️ Redis indisponível. Falha ao deletar cache de perfil.")
-        return
-
-    # A chave deve ser a mesma usada para SETAR o cache (ex: 'cache:user_profile:...')
-    key = f"cache:user_profile:{chat_id}"
-    
-    # O método 'delete' retorna o número de chaves deletadas (0 ou 1)
-    # ⚠️ CORREÇÃO: Usando a variável 'r' (o resultado de get_redis_client())
-    result = r.delete(key) 
+    # DEL + PUBLISH no canal de invalidação (ver invalidar_perfis_usuario)
+    result = invalidar_perfis_usuario([chat_id])
     
     if result > 0:
         logger.info(f"🗑️ Cache de perfil DELETADO com sucesso para {chat_id}.")
@@ -42,15 +153,32 @@ def delete_user_profile_cache(chat_id: str):
         # Isso não é um erro, apenas significa que o cache já havia expirado/não existia.
         logger.info(f"ℹ️ Tentativa de deleção do cache para {chat_id}, mas a chave não existia.")
 
+@rastrear("redis.get_user_profile_cache")
 def get_user_profile_cache(chat_id: str) -> dict | None:
-    """Busca o perfil de usuário do cache Redis."""
+    """
+    Busca o perfil de usuário em dois níveis: LRU local (objeto já decodificado)
+    e, em caso de miss, Redis (populando o nível local).
+    O dict retornado é compartilhado pelo cache local: não deve ser mutado.
+    """
+    local = perfis_locais.get(chat_id)
+    if local is not None:
+        return local
+
+    iniciar_listener_invalidacao_perfis()
     key = USER_PROFILE_CACHE_PREFIX + chat_id
+    # Invalidação (pub/sub) que chegue entre o GET e o set local não pode ser perdida
+    geracao_local = perfis_locais.geracao(chat_id)
     
     try:
         cached_data = get_redis_client().get(key)
         if cached_data:
-            # Deserializa o JSON de volta para um dicionário Python
-            return json.loads(cached_data) 
+            # Decodifica (msgpack/JSON versionado ou JSON legado); schema antigo conta como miss
+            data = decodificar(cached_data, SCHEMA_PERFIL)
+            perfis_locais.set(chat_id, data, geracao=geracao_local)
+            return data
+    except CodecVersaoIncompativel:
+        logger.info(f"ℹ️ Cache de perfil de {chat_id} em schema antigo. Tratando como miss.")
+        return None
     except Exception as e:
         logger.error(f"❌ Falha ao buscar cache para {chat_id}: {e}")
         # Em caso de erro, apenas retorna None e deixa o fluxo ir para o DB
@@ -58,18 +186,149 @@ def get_user_profile_cache(chat_id: str) -> dict | None:
     
     return None
 
-def set_user_profile_cache(chat_id: str, data: dict):
-    """Salva o perfil de usuário no cache Redis com um TTL."""
+def geracao_perfil_cache(chat_id: str) -> int | None:
+    """
+    Geração atual do perfil (0 se nunca invalidado). Ler ANTES de buscar no BaaS e
+    repassar a `set_user_profile_cache`. None se o Redis falhar (grava sem checagem).
+    """
+    try:
+        return int(get_redis_client().get(USER_PROFILE_GERACAO_PREFIX + chat_id) or 0)
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao ler a geração do perfil de {chat_id}: {e}")
+        return None
+
+# SET só se a geração não mudou desde o início do fetch (KEYS[1]=perfil, KEYS[2]=geração)
+_LUA_SET_MESMA_GERACAO = """
+if ARGV[3] ~= '' and (redis.call('GET', KEYS[2]) or '0') ~= ARGV[3] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+@rastrear("redis.set_user_profile_cache")
+def set_user_profile_cache(chat_id: str, data: dict, ttl: int | None = None, geracao: int | None = None) -> bool:
+    """
+    Salva o perfil de usuário no cache Redis com um TTL (e no nível local).
+
+    :param geracao: valor de `geracao_perfil_cache` lido antes do fetch. Se o perfil foi
+                    invalidado desde então, não grava (o dado pode ser anterior ao commit).
+    :return: True se gravou
+    """
     key = USER_PROFILE_CACHE_PREFIX + chat_id
+    ttl = ttl or USER_PROFILE_CACHE_TTL
+    geracao_local = perfis_locais.geracao(chat_id)
     
     try:
-        # Serializa o dicionário para uma string JSON antes de salvar no Redis
-        serialized_data = json.dumps(data) 
-        # Define a chave, o valor e o TTL
-        get_redis_client().set(key, serialized_data, ex=USER_PROFILE_CACHE_TTL)
+        # Serializa com o codec ativo (msgpack por padrão) e cabeçalho de versão
+        serialized_data = codificar(data, SCHEMA_PERFIL)
+        gravado = get_redis_client().eval(
+            _LUA_SET_MESMA_GERACAO, 2, key, USER_PROFILE_GERACAO_PREFIX + chat_id,
+            serialized_data, ttl, '' if geracao is None else str(geracao),
+        )
+        if not gravado:
+            logger.info(f"ℹ️ Perfil de {chat_id} invalidado durante a busca: cache não regravado.")
+            return False
+        perfis_locais.set(chat_id, data, ttl=min(ttl, perfis_locais.ttl), geracao=geracao_local)
+        return True
     except Exception as e:
         # Erros no cache não devem parar a aplicação, apenas logamos.
         logger.warning(f"⚠️ Falha ao salvar cache para {chat_id}: {e}")
+        return False
+
+def set_user_profile_negative_cache(chat_id: str, geracao: int | None = None) -> bool:
+    """Marca o chat_id como NÃO registrado por um TTL curto (evita HTTP repetido no cadastro)."""
+    return set_user_profile_cache(chat_id, PERFIL_NAO_ENCONTRADO, ttl=USER_PROFILE_NEGATIVE_TTL, geracao=geracao)
+
+def is_perfil_nao_encontrado(data: dict | None) -> bool:
+    return bool(data) and data.get('status') == PERFIL_NAO_ENCONTRADO['status']
+
+# --- Single-Flight: Lock Distribuído por chat_id ---
+
+# Libera o lock apenas se ainda for o dono (evita apagar o lock de outro processo após expirar)
+_LUA_LIBERAR_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+def adquirir_lock_perfil(chat_id: str) -> str | None:
+    """
+    Tenta adquirir o lock de busca do perfil (SET NX PX).
+
+    :return: Token do dono se adquirido; None se outro processo já está buscando.
+             Se o Redis falhar, retorna um token mesmo assim (degrada para busca direta).
+    """
+    token = os.urandom(8).hex()
+    try:
+        adquirido = get_redis_client().set(
+            USER_PROFILE_LOCK_PREFIX + chat_id, token, nx=True, px=USER_PROFILE_LOCK_TTL_MS
+        )
+        return token if adquirido else None
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao adquirir lock de perfil para {chat_id}: {e}")
+        return token
+
+def liberar_lock_perfil(chat_id: str, token: str):
+    try:
+        get_redis_client().eval(_LUA_LIBERAR_LOCK, 1, USER_PROFILE_LOCK_PREFIX + chat_id, token)
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao liberar lock de perfil para {chat_id}: {e}")
+
+def aguardar_user_profile_cache(chat_id: str, timeout: float = 3.0, intervalo: float = 0.05) -> dict | None:
+    """Aguarda (polling) o dono do lock popular o cache. Retorna None se o tempo esgotar."""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        data = get_user_profile_cache(chat_id)
+        if data is not None:
+            return data
+        time.sleep(intervalo)
+    return None
+
+# --- Listener de Invalidação (Pub/Sub) para o Cache Local ---
+
+_listener_iniciado = False
+_listener_lock = threading.Lock()
+
+def _escutar_invalidacoes_perfis():
+    """
+    Loop do thread daemon: assina o canal de invalidação e remove os chat_ids do LRU local.
+    Ao (re)conectar limpa o nível local inteiro, pois mensagens podem ter sido perdidas.
+    """
+    while True:
+        try:
+            pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(USER_PROFILE_INVALIDATION_CHANNEL)
+            perfis_locais.clear()
+            logger.info(f"📡 Escutando invalidações de perfil em '{USER_PROFILE_INVALIDATION_CHANNEL}'.")
+
+            for message in pubsub.listen():
+                if message.get('type') != 'message':
+                    continue
+                for chat_id in json.loads(message['data']):
+                    perfis_locais.invalidate(chat_id)
+
+        except Exception as e:
+            logger.warning(f"⚠️ Listener de invalidação de perfil caiu ({e}). Reconectando em 5s...")
+            perfis_locais.clear()
+            time.sleep(5)
+
+def iniciar_listener_invalidacao_perfis():
+    """Inicia (uma única vez por processo, sob demanda) o thread de invalidação do cache local."""
+    global _listener_iniciado
+    if _listener_iniciado:
+        return
+
+    with _listener_lock:
+        if _listener_iniciado:
+            return
+        threading.Thread(
+            target=_escutar_invalidacoes_perfis,
+            name="perfil-cache-invalidacao",
+            daemon=True,
+        ).start()
+        _listener_iniciado = True
 
 def get_redis_client():
     """
@@ -106,6 +365,7 @@ def get_history_key(chat_id: str) -> str:
 
 TTL_TWO_HOURS = 7200
 
+@rastrear("redis.add_message_to_history")
 def add_message_to_history(chat_id: str, sender: str, message: str) -> int:
     """
     Adiciona uma mensagem ao histórico do usuário (Bot ou User) 
@@ -126,6 +386,7 @@ def add_message_to_history(chat_id: str, sender: str, message: str) -> int:
     # 3. Retorna o novo tamanho da lista, mantendo a assinatura original da função
     return new_size
 
+@rastrear("redis.get_recent_history")
 def get_recent_history(chat_id: str, limit: int = 10) -> list:
     """Retorna as N mensagens mais recentes do histórico."""
     r = get_redis_client() # Assume que r agora entrega BYTES
@@ -147,19 +408,38 @@ def get_full_history(chat_id: str) -> list:
 def get_session_key(chat_id: str) -> str:
     return f"session:{chat_id}"
 
+SESSION_FIELD_STEP = "registration_step"
+
 def get_session_state(chat_id: str) -> dict:
-    """Recupera os dados de estado da sessão do usuário."""
+    """Recupera os dados de estado da sessão do usuário (chaves str, valores já decodificados)."""
     r = get_redis_client() # <<< OBTÉM A CONEXÃO AQUI
     state = r.hgetall(get_session_key(chat_id))
-    return state
+    return {
+        campo.decode('utf-8'): decodificar_campo_sessao(valor)
+        for campo, valor in state.items()
+    }
+
+def get_session_field(chat_id: str, field: str):
+    """Lê um único campo da sessão (HGET) já decodificado, ou None."""
+    r = get_redis_client()
+    return decodificar_campo_sessao(r.hget(get_session_key(chat_id), field))
 
+@rastrear("redis.get_session_step")
+def get_session_step(chat_id: str) -> str | None:
+    """Etapa ativa do fluxo (registration_step) do usuário, ou None."""
+    return get_session_field(chat_id, SESSION_FIELD_STEP)
+
+@rastrear("redis.update_session_state")
 def update_session_state(chat_id: str, **kwargs):
-    """Atualiza estado da sessão"""
+    """Atualiza estado da sessão (um único HSET com todos os campos)"""
+    if not kwargs:
+        return
+
     r = get_redis_client()
-    session_key = f"session:{chat_id}"
-    
-    for field, value in kwargs.items():
-        r.hset(session_key, field, str(value))
+    r.hset(
+        get_session_key(chat_id),
+        mapping={field: codificar_campo_sessao(value) for field, value in kwargs.items()},
+    )
     
     logger.info(f"Estado atualizado: {chat_id} -> {kwargs}")
 
@@ -169,19 +449,6 @@ def set_session_ttl(chat_id: str, ttl_seconds: int = 3600):
     r.expire(get_session_key(chat_id), ttl_seconds)
     logger.info(f"⏰ TTL de {ttl_seconds}s definido para sessão de {chat_id}")
 
-def check_and_set_message_id(message_id: str) -> bool:
-    """
-    Verifica se o ID da mensagem já foi processado.
-    Se não, armazena o ID e retorna True. O ID expira em 60 segundos (TTL).
-
-    :param message_id: O ID único da mensagem.
-    :return: True se a mensagem é NOVA, False se for DUPLICADA.
-    """
-    r = get_redis_client()
-    key = f"processed_msg:{message_id}"
-    is_new = r.set(key, 1, ex=60, nx=True)
-    return is_new is not None # Se for 'None', é porque já existia (duplicado)
-
 #FINALIZAÇÃO:
 def delete_session_state(chat_id: str):
     """Remove o estado de sessão temporário do usuário."""
@@ -0,0 +1,86 @@
+import json
+import logging
+import os
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - fallback quando msgpack não está instalado
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CODEC DE VALORES DO REDIS (perfis em cache e campos de sessão)
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# Formato: MAGIC (1 byte) + ID do codec (1 byte) + versão do schema (1 byte) + corpo
+# Valores sem o MAGIC são tratados como legado (JSON/str gravados antes do codec).
+
+MAGIC = b'\x00'
+CODEC_JSON = b'j'
+CODEC_MSGPACK = b'm'
+
+# Versões de schema: incremente quando o formato do objeto mudar de forma incompatível
+SCHEMA_PERFIL = 1
+SCHEMA_SESSAO = 1
+
+class CodecVersaoIncompativel(ValueError):
+    """Valor gravado com outra versão de schema: deve ser tratado como cache miss."""
+
+def _codec_padrao() -> bytes:
+    preferido = os.environ.get('REDIS_CODEC', 'msgpack').lower()
+    if preferido == 'msgpack' and msgpack is not None:
+        return CODEC_MSGPACK
+    return CODEC_JSON
+
+CODEC_ATIVO = _codec_padrao()
+
+def codificar(obj, versao: int, codec: bytes | None = None) -> bytes:
+    """Serializa `obj` com o codec ativo (ou o informado) e prefixa o cabeçalho versionado."""
+    codec = codec or CODEC_ATIVO
+    if codec == CODEC_MSGPACK:
+        corpo = msgpack.packb(obj, use_bin_type=True)
+    else:
+        corpo = json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return MAGIC + codec + bytes((versao,)) + corpo
+
+def decodificar(bruto: bytes, versao: int):
+    """
+    Desserializa um valor gravado por `codificar` (ou JSON legado).
+
+    :raises CodecVersaoIncompativel: se a versão do schema gravada for diferente de `versao`
+    :raises ValueError: se o valor estiver corrompido ou o codec não estiver disponível
+    """
+    if not bruto.startswith(MAGIC):
+        return json.loads(bruto)
+
+    codec, versao_gravada, corpo = bruto[1:2], bruto[2], bruto[3:]
+    if versao_gravada != versao:
+        raise CodecVersaoIncompativel(f"schema v{versao_gravada} != v{versao}")
+
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Valor gravado com msgpack, mas o pacote não está instalado.")
+        return msgpack.unpackb(corpo, raw=False)
+    if codec == CODEC_JSON:
+        return json.loads(corpo)
+    raise ValueError(f"Codec desconhecido: {codec!r}")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CAMPOS DE SESSÃO (HASH session:{chat_id})
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# Strings são gravadas cruas em UTF-8 (menor payload e legíveis no redis-cli);
+# os demais tipos passam pelo codec e voltam com o tipo original.
+
+def codificar_campo_sessao(valor) -> bytes:
+    if isinstance(valor, str):
+        return valor.encode('utf-8')
+    return codificar(valor, SCHEMA_SESSAO)
+
+def decodificar_campo_sessao(bruto: bytes | None):
+    if bruto is None:
+        return None
+    if bruto.startswith(MAGIC):
+        return decodificar(bruto, SCHEMA_SESSAO)
+    return bruto.decode('utf-8')
@@ -2,23 +2,25 @@ import os
 import datetime
 from datetime import datetime, timedelta, timezone
 import logging
-logger = logging.getLogger(__name__)
 
-try:
-    from google.oauth2 import service_account
-    from googleapiclient.discovery import build
-except ImportError:
-    logging.warning("Bibliotecas Google API não encontradas. Usando mocks para compilação.")
-    class service_account:
-        @staticmethod
-        def Credentials(): pass
-    def build(): pass
+from services.disponibilidade import (
+    GOOGLE_CALENDAR_ID,
+    GOOGLE_CALENDAR_IDS,
+    AgendaDisponibilidade,
+    agendas_livres_no_intervalo,
+    primeiro_minuto_permitido,
+    referencia_evento,
+    separar_referencia_evento,
+)
+from services.google_calendar import GOOGLE_CREDENTIALS_PATH, obter_servico_calendar
+from services.modelos_agenda import grade_do_dia, horarios_do_dia, modelo_ativo
+from services.slot_holds import liberar_slot, segurar_slot
+from services.tracing import rastrear
+
+logger = logging.getLogger(__name__)
 
 BR_TIMEZONE = timezone(timedelta(hours=-3))
 
-GOOGLE_CALENDAR_ID = os.environ.get('GOOGLE_CALENDAR_ID', 'maiconwantuil@gmail.com')
-CALENDAR_SCOPE = ['https://www.googleapis.com/auth/calendar'] 
-GOOGLE_CREDENTIALS_PATH = os.environ.get('GOOGLE_CREDENTIALS_PATH', 'caminho/para/o/seu-arquivo-de-credenciais.json')
 calendar_id = GOOGLE_CALENDAR_ID 
 
 class ToolException(Exception):
@@ -27,13 +29,18 @@ class ToolException(Exception):
 
 def validar_dia_nao_domingo(data_str: str) -> dict:
     """
-    Valida se a data fornecida é um Domingo. Retorna status dict.
-    (NÃO FAZ I/O DE REDIS)
+    Valida se há expediente na data (dia da semana aberto e não feriado, segundo o
+    modelo de agenda ativo). Retorna status dict. O nome é mantido por compatibilidade.
     """
     try:
-        data_consulta = datetime.strptime(data_str, "%d/%m/%Y")
-        if data_consulta.weekday() == 6:  # 6 é Domingo
-            return {"status": "FAILURE", "message": "Não fazemos agendamentos aos domingos. Por favor, escolha outro dia."}
+        data_consulta = datetime.strptime(data_str, "%d/%m/%Y").date()
+        modelo = modelo_ativo()
+        if modelo.feriado(data_consulta):
+            return {"status": "FAILURE", "message": "Não atendemos nesta data (feriado). Por favor, escolha outro dia."}
+        if modelo.fechado(data_consulta):
+            if data_consulta.weekday() == 6:
+                return {"status": "FAILURE", "message": "Não fazemos agendamentos aos domingos. Por favor, escolha outro dia."}
+            return {"status": "FAILURE", "message": "Não atendemos neste dia da semana. Por favor, escolha outro dia."}
         
         return {"status": "SUCCESS", "message": "Data válida."}
     except ValueError:
@@ -56,20 +63,13 @@ def validar_data_nao_passada(data_str: str) -> dict:
         return {"status": "ERROR", "message": "Formato de data inválido. Use DD/MM/AAAA."}
 
 
-def gerar_horarios_disponiveis() -> list:
+def gerar_horarios_disponiveis(data: str | None = None, duracao_minutos: int | None = None) -> list:
     """
-    Gera uma lista de slots de 60 minutos (HH:MM) dentro do horário de trabalho (7:00h às 20:00h).
+    Lista os inícios de slot (HH:MM) do expediente do dia (padrão: hoje), segundo o modelo
+    de agenda ativo. A grade vem memoizada por (modelo, dia da semana, duração).
     """
-    horarios = []
-    start_time = datetime.strptime("07:00", "%H:%M")
-    end_time = datetime.strptime("20:00", "%H:%M")
-    
-    current_time = start_time
-    while current_time < end_time:
-        horarios.append(current_time.strftime("%H:%M"))
-        current_time += timedelta(minutes=60)
-        
-    return horarios
+    dia = datetime.strptime(data, "%Y-%m-%d").date() if data else datetime.now(BR_TIMEZONE).date()
+    return list(horarios_do_dia(dia, duracao_minutos))
 
 def is_slot_busy(slot_time_str: str, busy_blocks: list, data: str, duration_minutos: int) -> bool:
     """Verifica se o slot de agendamento (HH:MM) se sobrepõe a qualquer bloco ocupado."""
@@ -89,54 +89,64 @@ def is_slot_busy(slot_time_str: str, busy_blocks: list, data: str, duration_minu
             
     return False
 
+@rastrear("calendar.buscar_disponibilidade_escalonada")
 def buscar_disponibilidade_escalonada(
     service, 
     limite_slots: int = 3, 
-    duracao_minutos: int = 60,
+    duracao_minutos: int | None = None,
     margens_dias: list[int] = None
 ) -> dict:
     """
     Busca os próximos slots livres usando a estratégia escalonada (4->10->30 dias),
-    ignorando explicitamente qualquer dia que seja Domingo.
-    
-    (Lógica externa de iteração - SRP)
+    ignorando dias sem expediente no modelo de agenda (domingos, feriados...).
+
+    Cada margem carrega só os dias ainda não vistos com UMA consulta freebusy para todas
+    as agendas (no máximo 3 chamadas ao Google) e um slot vale se QUALQUER profissional
+    estiver livre.
     """
     if not service:
         return {"status": "ERROR", "message": "Erro: Objeto de serviço do Google Calendar não inicializado."}
     if margens_dias is None:
         margens_dias = [4, 10, 30] 
-        
-    hoje = datetime.now(BR_TIMEZONE).date()
+
+    agora = datetime.now(BR_TIMEZONE)
+    hoje = agora.date()
+    agenda = AgendaDisponibilidade()
     slots_sugeridos = []
+    dias_vistos = 0
     for margem in margens_dias:
-        logging.info(f"Iniciando busca flexível: Margem de +{margem} dias (sem domingos).")
-        for i in range(margem):
+        if margem <= dias_vistos:
+            continue
+        logging.info(f"Iniciando busca flexível: Margem de +{margem} dias (sem dias fechados).")
+        inicio_janela = hoje + timedelta(days=dias_vistos)
+        try:
+            agenda.carregar(service, inicio_janela, hoje + timedelta(days=margem - 1))
+        except Exception as e:
+            logging.error(f"Erro no freebusy da margem de {margem} dias: {e}")
+            break
+
+        for i in range(dias_vistos, margem):
             data_atual = hoje + timedelta(days=i)
-            if data_atual.weekday() == 6: 
-                logging.debug(f"⏭️ Pulando {data_atual.strftime('%Y-%m-%d')} - É Domingo.")
-                continue       
             data_str = data_atual.strftime("%Y-%m-%d")
-            resultado = ServicesCalendar.buscar_horarios_disponiveis(
-                service=service, 
-                data=data_str, 
-                duracao_minutos=duracao_minutos
+            horarios = agenda.horarios_livres(
+                data_atual, duracao_minutos,
+                a_partir_de_min=primeiro_minuto_permitido(data_atual, agora)
             )
-            
-            if resultado['status'] == 'SUCCESS':
-                for hora in resultado['available_slots']:
-                    data_hora_iso = f"{data_str}T{hora}:00-03:00"
-                    data_hr_obj = datetime.strptime(f"{data_str} {hora}", "%Y-%m-%d %H:%M")
-                    data_hr_legivel = data_hr_obj.strftime("%d/%m - %H:%M")
-                    slots_sugeridos.append({
-                        'iso_time': data_hora_iso,
-                        'legivel': data_hr_legivel
-                    })
-                    if len(slots_sugeridos) >= limite_slots:
-                        logging.info(f"Limite de {limite_slots} slots atingido na margem de {margem} dias.")
-                        return {
-                            "status": "SUCCESS", 
-                            "available_slots": slots_sugeridos
-                        }
+            for hora in horarios:
+                data_hora_iso = f"{data_str}T{hora}:00-03:00"
+                data_hr_obj = datetime.strptime(f"{data_str} {hora}", "%Y-%m-%d %H:%M")
+                data_hr_legivel = data_hr_obj.strftime("%d/%m - %H:%M")
+                slots_sugeridos.append({
+                    'iso_time': data_hora_iso,
+                    'legivel': data_hr_legivel
+                })
+                if len(slots_sugeridos) >= limite_slots:
+                    logging.info(f"Limite de {limite_slots} slots atingido na margem de {margem} dias.")
+                    return {
+                        "status": "SUCCESS", 
+                        "available_slots": slots_sugeridos
+                    }
+        dias_vistos = margem
 
     if slots_sugeridos:
         return {"status": "SUCCESS", "available_slots": slots_sugeridos}
@@ -168,12 +178,8 @@ class ServicesCalendar:
         logging.info(f"Tentando inicializar serviço com arquivo em: {GOOGLE_CREDENTIALS_PATH}")
         
         try:
-            credentials = service_account.Credentials.from_service_account_file(
-                GOOGLE_CREDENTIALS_PATH, 
-                scopes=CALENDAR_SCOPE
-            )
-            
-            ServicesCalendar.service = build('calendar', 'v3', credentials=credentials)
+            # Discovery estático + credenciais em cache do processo (services/google_calendar.py)
+            ServicesCalendar.service = obter_servico_calendar()
             logging.info("Serviço do Google Calendar inicializado com sucesso.")
             return True
             
@@ -183,11 +189,15 @@ class ServicesCalendar:
             return False
 
     @staticmethod
+    @rastrear("calendar.buscar_eventos_do_dia")
     def buscar_eventos_do_dia(service, data: str) -> list:
-        """Busca todos os eventos ocupados no dia especificado (events().list())."""
+        """Busca todos os eventos ocupados no expediente do dia especificado (events().list())."""
         try:
-            time_min = f'{data}T07:00:00-03:00'
-            time_max = f'{data}T20:00:00-03:00'
+            janela = modelo_ativo().janela(datetime.strptime(data, "%Y-%m-%d").date())
+            if not janela:
+                return []
+            time_min = f'{data}T{janela[0] // 60:02d}:{janela[0] % 60:02d}:00-03:00'
+            time_max = f'{data}T{janela[1] // 60:02d}:{janela[1] % 60:02d}:00-03:00'
 
             events_result = service.events().list(
                 calendarId=calendar_id,
@@ -202,9 +212,12 @@ class ServicesCalendar:
             return []
 
     @staticmethod
-    def buscar_horarios_disponiveis(service, data: str, duracao_minutos: int = 60):
+    @rastrear("calendar.buscar_horarios_disponiveis")
+    def buscar_horarios_disponiveis(service, data: str, duracao_minutos: int | None = None):
         """
-        Calcula os horários disponíveis (livres) usando o endpoint freebusy do Google. 
+        Calcula os horários disponíveis (livres) usando o endpoint freebusy do Google.
+        Um horário está livre se QUALQUER profissional (GOOGLE_CALENDAR_IDS) estiver livre.
+        Sem `duracao_minutos`, usa a duração de slot do modelo de agenda para o dia.
         """
         try:
             try:
@@ -212,37 +225,11 @@ class ServicesCalendar:
             except ValueError:
                 return {"status": "ERROR", "message": f"Formato inválido para a data: '{data}'. Use 'YYYY-MM-DD'. "}
 
-            time_min = f'{data}T07:00:00-03:00'
-            time_max = f'{data}T20:00:00-03:00'
-            query_body = {
-                "timeMin": time_min,
-                "timeMax": time_max,
-                "items": [{"id": calendar_id}]
-            }
-            freebusy_response = service.freebusy().query(body=query_body).execute()
-            busy_blocks = freebusy_response.get('calendars', {}).get(calendar_id, {}).get('busy', [])
-            horarios = gerar_horarios_disponiveis() 
-            livres = []
-            hoje = datetime.now(BR_TIMEZONE).date()
-            now_with_margin = datetime.now(BR_TIMEZONE) + timedelta(minutes=30)
-            past_margin_passed = False 
-            
-            for h in horarios:
-                is_busy = is_slot_busy(h, busy_blocks, data, duracao_minutos)
-                
-                if not is_busy:
-                    if data_date_obj == hoje:
-                        if past_margin_passed:
-                            livres.append(h)
-                            continue 
-
-                        slot_dt = datetime.strptime(f"{data}T{h}:00", "%Y-%m-%dT%H:%M:%S").replace(tzinfo=BR_TIMEZONE)
-                        if slot_dt >= now_with_margin:
-                            livres.append(h)
-                            past_margin_passed = True 
-                    
-                    else:
-                        livres.append(h)
+            agenda = AgendaDisponibilidade().carregar(service, data_date_obj, data_date_obj)
+            livres = agenda.horarios_livres(
+                data_date_obj, duracao_minutos,
+                a_partir_de_min=primeiro_minuto_permitido(data_date_obj, datetime.now(BR_TIMEZONE))
+            )
 
             if not livres:
                 return {"status": "SUCCESS", "available_slots": [], "message": f"Não há horários disponíveis para {data}. "}
@@ -257,6 +244,7 @@ class ServicesCalendar:
 
 
     @staticmethod
+    @rastrear("calendar.criar_evento")
     def criar_evento(
         service, 
         start_time_str: str, 
@@ -266,9 +254,19 @@ class ServicesCalendar:
         time_zone: str = 'America/Sao_Paulo'
     ):
         """
-        Cria um novo evento de 1 hora de duração (60 minutos) na agenda principal.
-        
-        Inclui a verificação de disponibilidade de último segundo (chamando buscar_horarios_disponiveis).
+        Cria um novo evento (duração do slot no modelo de agenda) na agenda do primeiro
+        profissional livre no horário (ordem de GOOGLE_CALENDAR_IDS).
+
+        Antes do insert: (1) o horário precisa estar na grade do modelo (sem I/O) e, para
+        cada agenda, (2) o slot é reservado no Redis (services/slot_holds.py) e (3) só então
+        uma consulta freebusy do intervalo do slot confirma a agenda livre. Quem não obtém
+        a reserva passa para a próxima agenda, o que impede dois atendimentos/réplicas de
+        criarem evento no mesmo slot.
+
+        Em caso de sucesso, a reserva segue no retorno (`reserva`) e NÃO deve ser liberada
+        após o commit: ela expira sozinha (TTL acima do atraso do freebusy). O chamador só a
+        libera com `liberar_slot` se desfizer o evento.
+        O `event_id` retornado é a referência a ser salva como gcal_id (ver referencia_evento).
         """
         if not service:
             return {"status": "ERROR", "message": "Erro: Objeto de serviço do Google Calendar não inicializado."}
@@ -278,23 +276,45 @@ class ServicesCalendar:
         except ValueError:
             return {"status": "ERROR", "message": f"Formato inválido para start_time_str: '{start_time_str}'. Use o formato ISO 8601 completo."}
 
-        data_str = start_dt.strftime("%Y-%m-%d")
-        hora_str = start_dt.strftime("%H:%M")
-        disponiveis = ServicesCalendar.buscar_horarios_disponiveis(
-            service=service, 
-            data=data_str, 
-            duracao_minutos=60 
+        start_local = start_dt.astimezone(BR_TIMEZONE) if start_dt.tzinfo else start_dt.replace(tzinfo=BR_TIMEZONE)
+        dia = start_local.date()
+        inicio_min = start_local.hour * 60 + start_local.minute
+        modelo = modelo_ativo()
+        DURACAO_MINUTOS = modelo.duracao(dia)
+        indisponivel = {
+            "status": "ERROR", 
+            "message": f"❌ O horário {start_local.strftime('%H:%M')} do dia {start_dt.strftime('%d/%m/%Y')} não está mais disponível."
+        }
+
+        na_grade = (
+            grade_do_dia(dia, DURACAO_MINUTOS, modelo) >> inicio_min & 1
+            and inicio_min >= primeiro_minuto_permitido(dia, datetime.now(BR_TIMEZONE))
         )
-        
-        if disponiveis['status'] == 'ERROR' or hora_str not in disponiveis.get('available_slots', []):
+        if not na_grade:
+            logging.warning(f"❌ Tentativa de agendamento fora da grade: {start_time_str}")
+            return indisponivel
+
+        fim_local = start_local + timedelta(minutes=DURACAO_MINUTOS)
+        agenda_escolhida, reserva = None, None
+        for calendar_id in GOOGLE_CALENDAR_IDS:
+            reserva = segurar_slot(calendar_id, start_local, fim_local, chat_id)
+            if not reserva:
+                continue
+            try:
+                livre = bool(agendas_livres_no_intervalo(service, [calendar_id], start_local, fim_local))
+            except Exception as e:
+                logging.error(f"Erro na verificação de disponibilidade (freebusy) da agenda {calendar_id}: {e}")
+                livre = False
+            if livre:
+                agenda_escolhida = calendar_id
+                break
+            liberar_slot(reserva)
+
+        if not agenda_escolhida:
             logging.warning(f"❌ Tentativa de agendamento em slot indisponível: {start_time_str}")
-            return {
-                "status": "ERROR", 
-                "message": f"❌ O horário {hora_str} do dia {start_dt.strftime('%d/%m/%Y')} não está mais disponível."
-            }
+            return indisponivel
         
-        logging.info(f"✅ Slot {start_time_str} confirmado como disponível.")
-        DURACAO_MINUTOS = 60
+        logging.info(f"✅ Slot {start_time_str} confirmado e reservado (agenda {agenda_escolhida}).")
         end_dt = start_dt + timedelta(minutes=DURACAO_MINUTOS)
         end_time_str = end_dt.isoformat()
         final_summary = f"CONSUL Nome:{name} - Cliente ID:{chat_id}"
@@ -320,33 +340,37 @@ class ServicesCalendar:
 
         try:
             event = service.events().insert(
-                calendarId=calendar_id, 
+                calendarId=agenda_escolhida, 
                 body=event_body,
             ).execute()
             
             return {
                 "status": "SUCCESS", 
                 "event_link": event.get('htmlLink'), 
-                "event_id": event.get('id'),
-                "start_time": start_time_str
+                "event_id": referencia_evento(agenda_escolhida, event.get('id')),
+                "start_time": start_time_str,
+                "reserva": reserva,
             }
             
         except Exception as e:
             logging.error(f"Erro ao criar evento na agenda: {e}")
+            liberar_slot(reserva)
             return {"status": "ERROR", "message": f"Falha ao criar o evento na agenda: {e}"}
         
     @staticmethod
+    @rastrear("calendar.deletar_evento")
     def deletar_evento(service, event_id: str):
         """
-        Deleta um evento do Google Calendar pelo ID.
+        Deleta um evento do Google Calendar pelo ID (ou referência "agenda|id").
         """
         if not service:
             return {"status": "ERROR", "message": "Serviço de calendário não inicializado."}
             
         try:
+            agenda_evento, id_evento = separar_referencia_evento(event_id)
             service.events().delete(
-                calendarId=calendar_id,
-                eventId=event_id
+                calendarId=agenda_evento,
+                eventId=id_evento
             ).execute()
             
             logging.info(f"Evento {event_id} deletado do Google Calendar com sucesso.")
@@ -358,9 +382,52 @@ class ServicesCalendar:
                 return {"status": "SUCCESS", "message": "Evento já não existia no Google Calendar."}
                 
             return {"status": "ERROR", "message": f"Erro ao deletar evento: {e}"}
-        
+
+    # Limite de chamadas por requisição batch da API do Google Calendar
+    LOTE_MAXIMO_BATCH = 50
+
+    @staticmethod
+    @rastrear("calendar.deletar_eventos_em_lote")
+    def deletar_eventos_em_lote(service, event_ids: list) -> dict:
+        """
+        Deleta vários eventos com requisições batch HTTP (até 50 deletes por round trip).
+        Evento inexistente (404/410) conta como removido, como em `deletar_evento`.
+        Aceita ids puros e referências "agenda|id" (a agenda de cada evento vem da referência).
+
+        :return: {"removidos": [event_id, ...], "falhas": {event_id: mensagem}}
+        """
+        removidos, falhas = [], {}
+        if not service:
+            return {"removidos": removidos, "falhas": {eid: "Serviço de calendário não inicializado." for eid in event_ids}}
+
+        # request_id posicional: referências com e-mail da agenda não são Content-IDs seguros
+        def registrar(request_id, response, exception):
+            event_id = event_ids[int(request_id)]
+            status_http = getattr(getattr(exception, 'resp', None), 'status', None)
+            if exception is None or status_http in (404, 410):
+                removidos.append(event_id)
+            else:
+                falhas[event_id] = str(exception)
+
+        lote = ServicesCalendar.LOTE_MAXIMO_BATCH
+        for inicio in range(0, len(event_ids), lote):
+            batch = service.new_batch_http_request(callback=registrar)
+            for indice in range(inicio, min(inicio + lote, len(event_ids))):
+                agenda_evento, id_evento = separar_referencia_evento(event_ids[indice])
+                batch.add(service.events().delete(calendarId=agenda_evento, eventId=id_evento), request_id=str(indice))
+            try:
+                batch.execute()
+            except Exception as e:
+                logging.error(f"Erro no batch de remoção de eventos: {e}")
+                for event_id in event_ids[inicio:inicio + lote]:
+                    if event_id not in removidos:
+                        falhas.setdefault(event_id, str(e))
+
+        logging.info(f"🗑️ Batch de remoção: {len(removidos)} removidos, {len(falhas)} falhas.")
+        return {"removidos": removidos, "falhas": falhas}
+
     @staticmethod
-    def buscar_proximos_disponiveis(service, limite_slots: int = 3, duracao_minutos: int = 60) -> dict:
+    def buscar_proximos_disponiveis(service, limite_slots: int = 3, duracao_minutos: int | None = None) -> dict:
         """
         Calcula os próximos slots livres usando a estratégia de busca escalonada padrão,
         delegando a lógica de iteração e validação de domingo para a função externa.
@@ -381,7 +448,6 @@ class ServicesCalendar:
         resultado_tool = ServicesCalendar.buscar_proximos_disponiveis(
             service=service, 
             limite_slots=11, 
-            duracao_minutos=60 
         )
         try:
             if resultado_tool.get("status") == "SUCCESS":
@@ -0,0 +1,106 @@
+import logging
+import os
+from datetime import datetime, timedelta
+
+from services.tracing import rastrear
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# RESERVA CURTA DE SLOT (SET NX PX) DA CHECAGEM ATÉ O EVENTO APARECER NO FREEBUSY
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# DB 0 | hold:slot:{calendar_id}:{YYYY-MM-DDTHH:MM} (horário de Brasília) | TTL curto
+#
+# A reserva é tomada ANTES da checagem de freebusy e cobre todas as células da grade
+# (SLOT_HOLD_CELULA_MIN) que o slot [inicio, fim) toca: slots sobrepostos que começam em
+# minutos diferentes disputam ao menos uma célula em comum. As células são reservadas
+# juntas num script Lua (tudo ou nada).
+#
+# Depois do insert a reserva NÃO é liberada: o evento recém-criado pode levar alguns
+# segundos para aparecer no freebusy, e é a reserva que cobre essa janela. Por isso o TTL
+# fica bem acima desse atraso de propagação. Só liberamos explicitamente quando o evento
+# não foi criado (ou foi desfeito). A liberação só apaga as chaves cujo token ainda é o
+# do dono (reserva expirada e retomada por outro fica intacta).
+
+SLOT_HOLD_PREFIX = "hold:slot:"
+SLOT_HOLD_TTL_MS = int(os.environ.get('SLOT_HOLD_TTL_MS', 120000))
+SLOT_HOLD_CELULA_MIN = int(os.environ.get('SLOT_HOLD_CELULA_MIN', 15))
+
+_LUA_SEGURAR_RESERVA = """
+for _, chave in ipairs(KEYS) do
+    if redis.call('EXISTS', chave) == 1 then
+        return 0
+    end
+end
+for _, chave in ipairs(KEYS) do
+    redis.call('SET', chave, ARGV[1], 'PX', ARGV[2])
+end
+return 1
+"""
+
+_LUA_LIBERAR_RESERVA = """
+local liberadas = 0
+for _, chave in ipairs(KEYS) do
+    if redis.call('GET', chave) == ARGV[1] then
+        liberadas = liberadas + redis.call('DEL', chave)
+    end
+end
+return liberadas
+"""
+
+def chaves_slot(calendar_id: str, inicio: datetime, fim: datetime) -> list[str]:
+    """Uma chave por célula da grade que o intervalo [inicio, fim) toca."""
+    celula = max(SLOT_HOLD_CELULA_MIN, 1)
+    atual = inicio.replace(second=0, microsecond=0)
+    atual -= timedelta(minutes=(atual.hour * 60 + atual.minute) % celula)
+    chaves = []
+    while atual < fim:
+        chaves.append(f"{SLOT_HOLD_PREFIX}{calendar_id}:{atual.strftime('%Y-%m-%dT%H:%M')}")
+        atual += timedelta(minutes=celula)
+    return chaves
+
+@rastrear("redis.segurar_slot")
+def segurar_slot(calendar_id: str, inicio: datetime, fim: datetime, dono: str,
+                 ttl_ms: int | None = None) -> dict | None:
+    """
+    Tenta reservar todas as células do slot de uma vez.
+
+    :param inicio: início do slot já no horário de Brasília
+    :param fim: fim do slot (exclusivo), no mesmo fuso
+    :param dono: identificação de quem reserva (ex: chat_id), gravada no token para diagnóstico
+    :return: {"chaves", "token"} se reservado; None se outro processo detém alguma célula.
+             Se o Redis falhar, devolve a reserva mesmo assim (degrada para a checagem
+             de freebusy, como antes das reservas).
+    """
+    reserva = {"chaves": chaves_slot(calendar_id, inicio, fim), "token": f"{dono}:{os.urandom(8).hex()}"}
+    try:
+        from services.redis_client import get_redis_client
+
+        adquirido = get_redis_client().eval(
+            _LUA_SEGURAR_RESERVA, len(reserva["chaves"]), *reserva["chaves"],
+            reserva["token"], ttl_ms or SLOT_HOLD_TTL_MS,
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao reservar {reserva['chaves']}: {e}. Seguindo sem reserva.")
+        return reserva
+
+    if not adquirido:
+        logger.info(f"🔒 Slot {calendar_id} {inicio.strftime('%Y-%m-%dT%H:%M')} já reservado por outro atendimento.")
+        return None
+    return reserva
+
+def liberar_slot(reserva: dict | None) -> bool:
+    """Libera as células que ainda forem do dono (compare-and-delete em Lua)."""
+    if not reserva:
+        return False
+
+    try:
+        from services.redis_client import get_redis_client
+
+        return bool(get_redis_client().eval(
+            _LUA_LIBERAR_RESERVA, len(reserva["chaves"]), *reserva["chaves"], reserva["token"]
+        ))
+    except Exception as e:
+        logger.warning(f"⚠️ Falha ao liberar a reserva {reserva['chaves']}: {e}")
+        return False
@@ -0,0 +1,107 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PERFIL DE INICIALIZAÇÃO (python -X importtime)
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# Sobe um processo filho com `-X importtime`, importa o módulo do worker e cria a
+# instância (tempo até "pronto para o BLPOP"). O stderr do filho traz uma linha por
+# módulo importado: "import time: <self us> | <cumulativo us> | <módulo indentado>".
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SCRIPT_FILHO = """
+import json, sys, time
+sys.path[:0] = {caminhos!r}
+t0 = time.perf_counter()
+import {modulo} as alvo
+t1 = time.perf_counter()
+erro = None
+try:
+    alvo.{classe}()
+except Exception as e:
+    erro = f"{{type(e).__name__}}: {{e}}"
+t2 = time.perf_counter()
+print("@@PERFIL@@" + json.dumps({{"import_s": t1 - t0, "instancia_s": t2 - t1, "erro": erro}}))
+"""
+
+def parse_importtime(saida: str) -> list[dict]:
+    """:return: [{modulo, self_us, cumulativo_us, nivel}] de cada linha `import time:`."""
+    modulos = []
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:"):
+            continue
+        partes = linha[len("import time:"):].split("|")
+        if len(partes) != 3 or not partes[0].strip().isdigit():
+            continue  # cabeçalho "self [us] | cumulative | imported package"
+        nome = partes[2].rstrip()
+        modulos.append({
+            "modulo": nome.strip(),
+            "self_us": int(partes[0]),
+            "cumulativo_us": int(partes[1]),
+            "nivel": (len(nome) - len(nome.lstrip())) // 2,
+        })
+    return modulos
+
+def perfilar_inicializacao(modulo: str, classe: str, caminhos: list[str] | None = None, top: int = 25) -> dict:
+    """
+    Mede a importação de `modulo` e a criação de `classe()` num processo limpo.
+
+    :param caminhos: entradas extras de sys.path (ex: raiz do projeto e workers/)
+    :return: {"import_s", "instancia_s", "erro", "modulos": top por tempo próprio, "pacotes": top cumulativo}
+    """
+    caminhos = caminhos or [RAIZ_PROJETO, os.path.join(RAIZ_PROJETO, 'workers')]
+    script = _SCRIPT_FILHO.format(caminhos=caminhos, modulo=modulo, classe=classe)
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        capture_output=True, text=True, cwd=RAIZ_PROJETO,
+    )
+
+    resumo = {"import_s": None, "instancia_s": None, "erro": None}
+    for linha in processo.stdout.splitlines():
+        if linha.startswith("@@PERFIL@@"):
+            resumo = json.loads(linha[len("@@PERFIL@@"):])
+    if resumo["import_s"] is None:
+        ultima_linha = (processo.stderr.strip().splitlines() or ["sem saída"])[-1]
+        resumo["erro"] = f"processo filho falhou (código {processo.returncode}): {ultima_linha}"
+
+    modulos = parse_importtime(processo.stderr)
+    resumo["modulos"] = sorted(modulos, key=lambda m: m["self_us"], reverse=True)[:top]
+    # Pacotes de primeiro nível (nível 0): o custo total de cada import direto
+    resumo["pacotes"] = sorted(
+        (m for m in modulos if m["nivel"] == 0), key=lambda m: m["cumulativo_us"], reverse=True
+    )[:top]
+    return resumo
+
+def imprimir_perfil(resumo: dict):
+    print("== Perfil de inicialização ==")
+    if resumo["import_s"] is not None:
+        total = resumo["import_s"] + resumo["instancia_s"]
+        print(f"import do módulo: {resumo['import_s'] * 1000:8.1f} ms")
+        print(f"criação do worker: {resumo['instancia_s'] * 1000:7.1f} ms")
+        print(f"pronto para consumir a fila em {total * 1000:.1f} ms")
+    if resumo["erro"]:
+        print(f"⚠️ {resumo['erro']}")
+
+    print("\n-- Imports de primeiro nível (cumulativo) --")
+    for m in resumo["pacotes"]:
+        print(f"{m['cumulativo_us'] / 1000:9.1f} ms  {m['modulo']}")
+
+    print("\n-- Módulos mais caros (tempo próprio) --")
+    for m in resumo["modulos"]:
+        print(f"{m['self_us'] / 1000:9.1f} ms  {m['modulo']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de inicialização de um worker (-X importtime).")
+    parser.add_argument('--modulo', default="whatsapp_worker")
+    parser.add_argument('--classe', default="WhatsAppWorker")
+    parser.add_argument('--top', type=int, default=25)
+    args = parser.parse_args()
+    imprimir_perfil(perfilar_inicializacao(args.modulo, args.classe, top=args.top))
+
+if __name__ == '__main__':
+    main()
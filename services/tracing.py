@@ -0,0 +1,229 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+logger = logging.getLogger("tracing")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TRACING PONTA A PONTA (webhook -> fila -> worker -> resposta no WhatsApp)
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# O gateway gera (ou propaga do header `traceparent`) o trace_id e o grava no envelope.
+# O worker abre o span raiz com esse trace_id; os spans filhos (Redis, BaaS, Groq,
+# Calendar, WAHA) herdam o contexto via contextvars e o trace é exportado ao fechar a raiz.
+#
+# TRACING_EXPORTER: none (padrão) | console | file | otlp
+#   file -> TRACING_FILE (JSON Lines no formato OTLP/JSON, legível pelo collector)
+#   otlp -> OTEL_EXPORTER_OTLP_ENDPOINT (+ /v1/traces, OTLP/HTTP JSON)
+
+TRACING_EXPORTER = os.environ.get('TRACING_EXPORTER', 'none').lower()
+TRACING_FILE = os.environ.get('TRACING_FILE', '/tmp/traces.jsonl')
+OTLP_ENDPOINT = os.environ.get('OTEL_EXPORTER_OTLP_ENDPOINT', 'http://otel-collector:4318')
+SERVICE_NAME = os.environ.get('OTEL_SERVICE_NAME', 'whatsapp-worker')
+
+_trace_atual = contextvars.ContextVar('trace_atual', default=None)
+_span_atual = contextvars.ContextVar('span_atual', default=None)
+
+def _novo_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+def tracing_ativo() -> bool:
+    return TRACING_EXPORTER != 'none'
+
+def trace_id_atual() -> str | None:
+    trace = _trace_atual.get()
+    return trace['trace_id'] if trace else None
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SPANS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _registrar(nome: str, inicio_ns: int, fim_ns: int, span_id: str, pai_id: str | None,
+               atributos: dict, erro: str | None = None):
+    trace = _trace_atual.get()
+    if trace is None:
+        return
+    trace['spans'].append({
+        'nome': nome,
+        'span_id': span_id,
+        'pai_id': pai_id,
+        'inicio_ns': inicio_ns,
+        'fim_ns': fim_ns,
+        'atributos': atributos,
+        'erro': erro,
+    })
+
+@contextmanager
+def span(nome: str, **atributos):
+    """Span filho do span atual. Sem trace ativo é um no-op (custo de um ContextVar.get)."""
+    if _trace_atual.get() is None:
+        yield
+        return
+
+    span_id = _novo_id(8)
+    pai_id = _span_atual.get()
+    token = _span_atual.set(span_id)
+    inicio_ns = time.time_ns()
+    erro = None
+    try:
+        yield
+    except Exception as e:
+        erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _span_atual.reset(token)
+        _registrar(nome, inicio_ns, time.time_ns(), span_id, pai_id, atributos, erro)
+
+def registrar_span(nome: str, inicio_ns: int, fim_ns: int, **atributos):
+    """Registra um span já medido (ex: espera na fila, calculada a partir do received_at)."""
+    if _trace_atual.get() is None:
+        return
+    _registrar(nome, inicio_ns, fim_ns, _novo_id(8), _span_atual.get(), atributos)
+
+@contextmanager
+def iniciar_trace(nome: str, trace_id: str | None = None, **atributos):
+    """
+    Abre o span RAIZ de um trace (um por mensagem processada) e exporta ao final.
+    Com TRACING_EXPORTER=none não faz nada.
+    """
+    if not tracing_ativo():
+        yield None
+        return
+
+    trace = {'trace_id': trace_id or _novo_id(16), 'spans': []}
+    token_trace = _trace_atual.set(trace)
+    try:
+        with span(nome, **atributos):
+            yield trace['trace_id']
+    finally:
+        _trace_atual.reset(token_trace)
+        _exportar(trace)
+
+def rastrear(nome: str):
+    """Decorator: executa a função dentro de `span(nome)`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _trace_atual.get() is None:
+                return func(*args, **kwargs)
+            with span(nome):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def rastrear_cliente_groq(client, agente: str):
+    """Instrumenta `client.chat.completions.create` desta instância com um span por chamada."""
+    completions = client.chat.completions
+    create_original = completions.create
+
+    @functools.wraps(create_original)
+    def create(*args, **kwargs):
+        with span("groq.chat_completion", agente=agente, modelo=kwargs.get('model')):
+            return create_original(*args, **kwargs)
+
+    completions.create = create
+    return client
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# EXPORTADORES (console / arquivo / OTLP-HTTP JSON) EM THREAD DE FUNDO
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _valor_otlp(valor) -> dict:
+    if isinstance(valor, bool):
+        return {'boolValue': valor}
+    if isinstance(valor, int):
+        return {'intValue': str(valor)}
+    if isinstance(valor, float):
+        return {'doubleValue': valor}
+    return {'stringValue': str(valor)}
+
+def para_otlp(trace: dict) -> dict:
+    """Converte o trace no corpo de um ExportTraceServiceRequest (OTLP/JSON)."""
+    spans = []
+    for s in trace['spans']:
+        otlp_span = {
+            'traceId': trace['trace_id'],
+            'spanId': s['span_id'],
+            'name': s['nome'],
+            'kind': 1,
+            'startTimeUnixNano': str(s['inicio_ns']),
+            'endTimeUnixNano': str(s['fim_ns']),
+            'attributes': [
+                {'key': k, 'value': _valor_otlp(v)} for k, v in s['atributos'].items() if v is not None
+            ],
+            'status': {'code': 2, 'message': s['erro']} if s['erro'] else {'code': 1},
+        }
+        if s['pai_id']:
+            otlp_span['parentSpanId'] = s['pai_id']
+        spans.append(otlp_span)
+
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{'scope': {'name': 'chatbot.tracing'}, 'spans': spans}],
+        }]
+    }
+
+def _exportar_console(trace: dict):
+    spans = sorted(trace['spans'], key=lambda s: s['inicio_ns'])
+    if not spans:
+        return
+    inicio = spans[0]['inicio_ns']
+    linhas = [f"🔎 trace {trace['trace_id']}"]
+    for s in spans:
+        duracao_ms = (s['fim_ns'] - s['inicio_ns']) / 1e6
+        deslocamento_ms = (s['inicio_ns'] - inicio) / 1e6
+        marca = " ❌" if s['erro'] else ""
+        linhas.append(f"   +{deslocamento_ms:8.1f}ms {duracao_ms:8.1f}ms  {s['nome']}{marca}")
+    logger.info("\n".join(linhas))
+
+def _exportar_arquivo(trace: dict):
+    with open(TRACING_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(para_otlp(trace)) + "\n")
+
+def _exportar_otlp(trace: dict):
+    requests.post(f"{OTLP_ENDPOINT.rstrip('/')}/v1/traces", json=para_otlp(trace), timeout=2)
+
+_EXPORTADORES = {
+    'console': _exportar_console,
+    'file': _exportar_arquivo,
+    'otlp': _exportar_otlp,
+}
+
+_fila_exportacao = queue.Queue(maxsize=1000)
+_thread_exportacao = None
+_thread_lock = threading.Lock()
+
+def _loop_exportacao():
+    exportador = _EXPORTADORES.get(TRACING_EXPORTER)
+    while True:
+        trace = _fila_exportacao.get()
+        try:
+            exportador(trace)
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao exportar trace {trace['trace_id']} ({TRACING_EXPORTER}): {e}")
+
+def _exportar(trace: dict):
+    """Enfileira o trace para o thread exportador (nunca bloqueia o processamento)."""
+    global _thread_exportacao
+    if TRACING_EXPORTER not in _EXPORTADORES:
+        return
+
+    if _thread_exportacao is None:
+        with _thread_lock:
+            if _thread_exportacao is None:
+                _thread_exportacao = threading.Thread(target=_loop_exportacao, name="tracing-export", daemon=True)
+                _thread_exportacao.start()
+
+    try:
+        _fila_exportacao.put_nowait(trace)
+    except queue.Full:
+        logger.warning("⚠️ Fila de exportação de traces cheia. Trace descartado.")
@@ -3,6 +3,9 @@ import requests
 import json
 import logging
 
+from services.tracing import rastrear
+from services.worker_metrics import WAHA_FALHAS_ENVIO
+
 logger = logging.getLogger(__name__)
 
 class Waha():
@@ -19,6 +22,7 @@ class Waha():
             'X-Api-Key': self.waha_api_chave
         }
 
+    @rastrear("waha.start_typing")
     def start_typing(self, chat_id: str):
         """Envia o sinal 'digitando...' (typing) para o chat via WAHA API."""
         url = f"{self.__api_url}/api/{self.waha_instance}/presence"
@@ -31,6 +35,7 @@ class Waha():
             # Falha visual (typing) não deve gerar erro crítico
             pass 
 
+    @rastrear("waha.stop_typing")
     def stop_typing(self, chat_id: str):
         """Envia o sinal 'pausado' (paused) para limpar o status 'digitando...'."""
         url = f"{self.__api_url}/api/{self.waha_instance}/presence"
@@ -41,6 +46,7 @@ class Waha():
             requests.post(url, json=payload, headers=self.__get_headers(), timeout=1)
         except Exception:
             pass
+    @rastrear("waha.send_whatsapp_message")
     def send_whatsapp_message(self, chat_id, message):
         """ Envia uma mensagem de texto via API WAHA. """
         url = f"{self.__api_url}/api/sendText"
@@ -74,6 +80,7 @@ class Waha():
             
         except requests.exceptions.RequestException as e:
             logger.error(f"❌ Erro ao enviar mensagem para WAHA: {e}")
+            WAHA_FALHAS_ENVIO.labels(operacao='send_text').inc()
             if response is not None and response.status_code == 401:
                 logger.error("ERRO 401: Verifique se o WAHA_API_KEY está correto.")
             return None
@@ -182,6 +189,7 @@ class Waha():
 
             return False # Falhou na configuração, aborta
         
+    @rastrear("waha.send_support_contact")
     def send_support_contact(self, chat_id: str):
         """
         Envia APENAS o seu contato de suporte para o usuário.
@@ -205,4 +213,5 @@ class Waha():
         try:
             requests.post(url, headers=self.__get_headers(), json=payload, timeout=5)
         except Exception as e:
-            logger.error(f"❌ Falha ao enviar contato de suporte: {e}")
\ No newline at end of file
+            logger.error(f"❌ Falha ao enviar contato de suporte: {e}")
+            WAHA_FALHAS_ENVIO.labels(operacao='send_contact').inc()
\ No newline at end of file
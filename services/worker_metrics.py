@@ -0,0 +1,110 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, start_http_server
+except ImportError:
+    logging.warning("prometheus_client não encontrado. Métricas do worker desativadas.")
+    Counter = Gauge = Histogram = start_http_server = None
+
+logger = logging.getLogger("worker-metrics")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MÉTRICAS PROMETHEUS DO WORKER (porta 9091 no docker-compose)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+WORKER_METRICS_PORT = int(os.environ.get('WORKER_METRICS_PORT', 9091))
+
+# Buckets pensados para um turno de chat: Redis/BaaS (ms) até Groq + Calendar (dezenas de s)
+BUCKETS_PROCESSAMENTO = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 34, 60)
+
+class _MetricaNula:
+    """Fallback sem prometheus_client: mesma interface, nenhum efeito."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def set_function(self, *args, **kwargs):
+        pass
+
+if Counter is not None:
+    FILA_TAMANHO = Gauge(
+        'whatsapp_fila_tamanho',
+        'Mensagens aguardando na fila new_user_queue (lido no scrape).',
+    )
+    MENSAGENS_PROCESSADAS = Counter(
+        'whatsapp_mensagens_processadas_total',
+        'Mensagens retiradas da fila, por resultado.',
+        ['resultado'],
+    )
+    PROCESSAMENTO_SEGUNDOS = Histogram(
+        'whatsapp_processamento_segundos',
+        'Tempo de processamento por agente e etapa do fluxo.',
+        ['agente', 'etapa'],
+        buckets=BUCKETS_PROCESSAMENTO,
+    )
+    REENFILEIRADAS = Counter(
+        'whatsapp_mensagens_reenfileiradas_total',
+        'Mensagens devolvidas à fila após falha no processamento.',
+    )
+    DUPLICATAS_DESCARTADAS = Counter(
+        'whatsapp_duplicatas_descartadas_total',
+        'Mensagens descartadas pela checagem de idempotência do worker.',
+    )
+    WAHA_FALHAS_ENVIO = Counter(
+        'whatsapp_waha_falhas_envio_total',
+        'Falhas ao enviar para o WAHA, por operação.',
+        ['operacao'],
+    )
+    LLM_CHAMADAS = Counter(
+        'whatsapp_llm_chamadas_total',
+        'Chamadas ao LLM por agente e caminho que serviu a resposta (primario, retry, hedge, fallback, falha).',
+        ['agente', 'caminho'],
+    )
+else:
+    FILA_TAMANHO = MENSAGENS_PROCESSADAS = PROCESSAMENTO_SEGUNDOS = _MetricaNula()
+    REENFILEIRADAS = DUPLICATAS_DESCARTADAS = WAHA_FALHAS_ENVIO = _MetricaNula()
+    LLM_CHAMADAS = _MetricaNula()
+
+@contextmanager
+def medir_processamento(agente: str, etapa: str | None):
+    """Observa a duração do bloco no histograma (agente, etapa)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        PROCESSAMENTO_SEGUNDOS.labels(agente=agente, etapa=etapa or 'nenhuma').observe(time.perf_counter() - inicio)
+
+def iniciar_servidor_metricas(redis_client, nome_fila: str, porta: int = WORKER_METRICS_PORT) -> bool:
+    """
+    Sobe o endpoint HTTP /metrics (thread daemon do prometheus_client) e registra
+    o gauge do tamanho da fila, avaliado com LLEN a cada scrape.
+
+    :return: True se o servidor foi iniciado
+    """
+    if start_http_server is None:
+        return False
+
+    def tamanho_fila():
+        try:
+            return redis_client.llen(nome_fila)
+        except Exception:
+            return float('nan')
+
+    FILA_TAMANHO.set_function(tamanho_fila)
+    try:
+        start_http_server(porta)
+    except OSError as e:
+        logger.error(f"❌ Não foi possível abrir o endpoint de métricas na porta {porta}: {e}")
+        return False
+
+    logger.info(f"📈 Métricas Prometheus disponíveis em :{porta}/metrics")
+    return True
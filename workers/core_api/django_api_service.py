@@ -5,6 +5,8 @@ import logging
 import os
 from typing import Optional, Dict
 
+from services.tracing import rastrear
+
 logger = logging.getLogger(__name__)
 
 # Configuração de ambiente (Ajuste conforme a rede Docker)
@@ -22,13 +24,19 @@ class DjangoApiService:
     """
     
     @staticmethod
-    def get_user_data(chat_id: str) -> Optional[Dict]:
-        """Busca dados de registro de usuário (e agendamentos) via API JSON."""
+    @rastrear("baas.get_user_data")
+    def get_user_data(chat_id: str, distinguir_404: bool = False) -> Optional[Dict]:
+        """
+        Busca dados de registro de usuário (e agendamentos) via API JSON.
+
+        :param distinguir_404: Se True, usuário inexistente retorna {"status": "NOT_FOUND"}
+                               (e None fica reservado para erros de comunicação)
+        """
         url = f"{DJANGO_BAAS_URL}user/{chat_id}/"
         try:
             response = requests.get(url, headers=AUTH_HEADERS, timeout=5)
             if response.status_code == 404:
-                return None
+                return {"status": "NOT_FOUND"} if distinguir_404 else None
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -36,6 +44,7 @@ class DjangoApiService:
             return None 
             
     @staticmethod
+    @rastrear("baas.save_appointment")
     def save_appointment(payload: Dict) -> Dict:
         """Salva um novo agendamento, DELEGANDO a lógica de slots/transação ao BaaS."""
         url = f"{DJANGO_BAAS_URL}agendamentos/salvar/"
@@ -56,6 +65,7 @@ class DjangoApiService:
             return {"status": "ERROR", "message": "Falha de comunicação com o BaaS. Tente novamente."}
             
     @staticmethod
+    @rastrear("baas.cancel_appointment")
     def cancel_appointment(payload: Dict) -> Dict:
         """Limpa o slot de agendamento no DB via API JSON (Delegate)."""
         url = f"{DJANGO_BAAS_URL}agendamentos/cancelar/"
@@ -68,6 +78,7 @@ class DjangoApiService:
             return {"status": "ERROR", "message": "Falha de comunicação com o BaaS. Tente novamente."}
             
     @staticmethod
+    @rastrear("baas.register_user")
     def register_user(payload: Dict) -> Dict:
         """Registra um novo usuário no DB via API JSON (Delegate)."""
         url = f"{DJANGO_BAAS_URL}user/register/"
@@ -83,6 +94,7 @@ class DjangoApiService:
             return {"status": "ERROR", "message": "Falha de comunicação com o BaaS."}
     
     @staticmethod
+    @rastrear("baas.log_metric")
     def log_metric(payload: Dict) -> Dict:
         """Envia um log de métrica para o BaaS via API JSON (Delegate)."""
         url = f"{DJANGO_BAAS_URL}metrics/log/"
@@ -98,6 +110,7 @@ class DjangoApiService:
             return {"status": "HTTP_FAILURE", "message": f"Falha de comunicação: {e}"}
             
     @staticmethod
+    @rastrear("baas.cleanup_expired_appointments")
     def cleanup_expired_appointments() -> Dict:
         """
         Chama o endpoint de limpeza agendada no BaaS.
@@ -105,7 +118,9 @@ class DjangoApiService:
         url = f"{DJANGO_BAAS_URL}cleanup/" # Assumindo que você usou o URL /api/v1/cleanup/
         try:
             # Tarefa de background pode ter um timeout maior
-            response = requests.post(url, headers=AUTH_HEADERS, timeout=30) 
+            # Endpoint interno (percorre a tabela inteira): exige X-Internal-Token
+            headers = {**AUTH_HEADERS, 'X-Internal-Token': os.environ.get('BAAS_TOKEN_INTERNO', '')}
+            response = requests.post(url, headers=headers, timeout=30) 
             response.raise_for_status() 
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -1,6 +1,7 @@
-import os
 import json
-from groq import Groq
+
+from core_ia.services_agents.llm_client import ClienteLLM
+from core_ia.services_agents.llm_profiles import perfil
 from core_ia.services_agents.prompts_agents import prompt_consul_cancel
 from core_ia.services_agents.consulta_services_ia import ConsultaService
 
@@ -15,7 +16,8 @@ logger = logging.getLogger(__name__)
 class Agent_cancel:
     def __init__(self):
         try:
-            self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+            self.llm = ClienteLLM(agente="consul_cancel", perfil=perfil("cancel"))
+            self.perfil = self.llm.perfil
         except Exception as e:
             raise EnvironmentError("GROQ_API_KEY não configurada.") from e
     
@@ -47,10 +49,8 @@ class Agent_cancel:
         
         try:
             # --- Chamada LLM ---
-            chat_completion = self.client.chat.completions.create(
-                messages=mensagens,
-                model="llama-3.3-70b-versatile",
-                temperature=0.1,
+            chat_completion = self.llm.completar(
+                mensagens,
                 tools=TOOLS_CANCEL,
                 tool_choice="auto"
             )
@@ -118,10 +118,7 @@ class Agent_cancel:
                         "content": str(tool_content)
                     })
                     
-                final_response = self.client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
-                    messages=mensagens
-                )
+                final_response = self.llm.completar(mensagens)
                 return final_response.choices[0].message.content
 
             return response_message.content
@@ -1,9 +1,11 @@
-import os
 import json 
-from groq import Groq
+
+from core_ia.services_agents.llm_client import ClienteLLM
+from core_ia.services_agents.llm_profiles import perfil
 
 from services.metrics import registrar_evento
 from services.service_api_calendar import ServicesCalendar, validar_data_nao_passada, validar_dia_nao_domingo
+from services.slot_holds import liberar_slot
 from services.redis_client import delete_history, delete_session_state, update_session_state
 
 from core_ia.services_agents.tool_reset import finalizar_user, REROUTE_COMPLETED_STATUS, RESET_SIGNAL
@@ -15,8 +17,6 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-groq_service = Groq()
-services_calendar = ServicesCalendar()
 AGENT_DATE_SEARCH = "AGENT_DATE_SEARCH"
 AGENT_DATE_CONFIRM = "AGENT_DATE_CONFIRM"
 
@@ -27,7 +27,8 @@ class Agent_date():
     """
     def __init__(self, router_agent_instance):
         try:
-            self.client = Groq(api_key=os.environ. get("GROQ_API_KEY"))
+            self.llm = ClienteLLM(agente="date", perfil=perfil("date"))
+            self.perfil = self.llm.perfil
             ServicesCalendar.inicializar_servico()
             self.calendar_services = ServicesCalendar()
             self.router_agent = router_agent_instance
@@ -59,12 +60,10 @@ class Agent_date():
         ]
         
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=mensagens,
-                model="llama-3.3-70b-versatile",
+            chat_completion = self.llm.completar(
+                mensagens,
                 tools=tool_schema,
                 tool_choice="auto",
-                temperature=0.0, 
             )
 
             response_message = chat_completion.choices[0].message
@@ -119,7 +118,7 @@ class Agent_date():
 
                         validacao_domingo = validar_dia_nao_domingo(data_para_validacao)
                         if not validacao_domingo.get("status") == "SUCCESS":
-                            return "Não agendamos consultas aos domingos. Por favor, escolha outro dia."
+                            return validacao_domingo.get("message", "Não atendemos neste dia. Por favor, escolha outro dia.")
                         
                         function_args['chat_id'] = chat_id
                         function_args['name'] = user_name
@@ -136,12 +135,15 @@ class Agent_date():
                                 google_event_id=gcal_event_id,
                                 start_time_iso=start_time_iso 
                             )
+                            # A reserva do slot não é liberada após o commit: ela cobre o atraso até
+                            # o evento aparecer no freebusy e expira sozinha (SLOT_HOLD_TTL_MS)
                             if baas_result.get("status") != "SUCCESS":
                                 error_message = baas_result.get('message', 'Erro desconhecido ao salvar no BaaS.')
                                 ServicesCalendar.deletar_evento(
                                     ServicesCalendar.service, 
                                     gcal_event_id
                                 )
+                                liberar_slot(resultado_tool.get("reserva"))
 
                                 registrar_evento(
                                     cliente_id=chat_id,
@@ -199,7 +201,7 @@ Fique tranquilo(a), enviaremos um lembrete próximo ao dia do evento."""
 
                         validacao_domingo = validar_dia_nao_domingo(data_para_validacao)
                         if not validacao_domingo.get('status') == 'SUCCESS':
-                            return "Não agendamos consultas aos domingos. Por favor, escolha outro dia."
+                            return validacao_domingo.get("message", "Não atendemos neste dia. Por favor, escolha outro dia.")
                         
                         resultado_tool = ServicesCalendar.buscar_horarios_disponiveis(ServicesCalendar.service, **function_args)
 
@@ -247,10 +249,7 @@ Qual horário deseja agendar? (Informe o horário no formato HH:MM)""")
                         }
                     )
                     
-                final_completion = self.client.chat.completions. create(
-                    model="llama-3.3-70b-versatile",
-                    messages=mensagens 
-                )
+                final_completion = self.llm.completar(mensagens)
             
                 return final_completion.choices[0].message.content
             
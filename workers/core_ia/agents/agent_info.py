@@ -1,15 +1,11 @@
-import os
-from groq import Groq
+from core_ia.services_agents.llm_client import ClienteLLM
+from core_ia.services_agents.llm_profiles import perfil
 from core_ia.services_agents.prompts_agents import prompt_info
-from services.service_api_calendar import ServicesCalendar
 import logging 
 
 logger = logging.getLogger(__name__) 
 
 
-groq_service = Groq()
-services_calendar = ServicesCalendar()
-
 class Agent_info():
     """
     Classe de serviço dedicada a interagir com a API da Groq, usando o histórico completo (history_str)
@@ -17,7 +13,8 @@ class Agent_info():
     """
     def __init__(self):
         try:
-            self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+            self.llm = ClienteLLM(agente="info", perfil=perfil("info"))
+            self.perfil = self.llm.perfil
         except Exception as e:
             raise EnvironmentError("A variável GROQ_API_KEY não está configurada.") from e
     
@@ -38,11 +35,7 @@ class Agent_info():
         ]
         
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=mensagens,
-                model="llama-3.3-70b-versatile",
-                temperature=0.0 , 
-            )
+            chat_completion = self.llm.completar(mensagens)
 
             response_message = chat_completion.choices[0].message
             resposta_ia = response_message.content
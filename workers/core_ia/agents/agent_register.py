@@ -1,8 +1,9 @@
-import os
 import json 
-from groq import Groq
 
-from services.redis_client import delete_history, delete_session_state
+from core_ia.services_agents.llm_client import ClienteLLM
+from core_ia.services_agents.llm_profiles import perfil
+
+from services.redis_client import delete_history, delete_session_state, delete_user_profile_cache
 from services.metrics import registrar_evento
 
 from core_ia.services_agents.prompts_agents import prompt_register
@@ -10,8 +11,6 @@ from core_ia.services_agents.tool_reset import REROUTE_COMPLETED_STATUS
 from core_ia.services_agents.tools_schemas import REGISTRATION_TOOL_SCHEMA
 from core_api.django_api_service import DjangoApiService
 
-groq_service = Groq()
-
 def api_register_user_tool(chat_id: str, name: str) -> dict:
     """
     Função Helper para ser chamada pelo Agent (LLM).
@@ -21,6 +20,8 @@ def api_register_user_tool(chat_id: str, name: str) -> dict:
     payload = {"chat_id": chat_id, "name": name}
     response = DjangoApiService.register_user(payload)
     if response and response.get('status') == 'SUCCESS':
+        # Remove o cache negativo (NOT_FOUND) já neste processo, sem esperar o pub/sub do BaaS
+        delete_user_profile_cache(chat_id)
         registrar_evento(
             cliente_id=chat_id,
             event_id=f"registro_{chat_id}",
@@ -38,7 +39,8 @@ class Agent_register():
     """
     def __init__(self):
         try:
-            self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+            self.llm = ClienteLLM(agente="register", perfil=perfil("register"))
+            self.perfil = self.llm.perfil
         except Exception as e:
             raise EnvironmentError("A variável GROQ_API_KEY não está configurada.") from e
     
@@ -62,12 +64,10 @@ class Agent_register():
         ]
         
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=mensagens,
-                model="llama-3.3-70b-versatile",
+            chat_completion = self.llm.completar(
+                mensagens,
                 tools=[REGISTRATION_TOOL_SCHEMA],
                 tool_choice="auto",
-                temperature=0.1 , 
             )
 
             response_message = chat_completion.choices[0].message
@@ -112,10 +112,7 @@ Seja bem vindo {nome_usuario}! Como posso te ajudar hoje?"""
                         }
                     )
                     
-                final_completion = self.client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
-                    messages=mensagens 
-                )
+                final_completion = self.llm.completar(mensagens)
             
                 return final_completion.choices[0].message.content
             
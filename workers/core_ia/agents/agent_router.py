@@ -1,14 +1,15 @@
-import os
-from groq import Groq
+from core_ia.services_agents.llm_client import ClienteLLM
+from core_ia.services_agents.llm_profiles import perfil
 from core_ia.services_agents.prompts_agents import prompt_router
 import logging
-groq_service = Groq()
+
 logger = logging.getLogger(__name__)
 
 class Agent_router():
     def __init__(self):
         try:
-            self.client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+            self.llm = ClienteLLM(agente="router", perfil=perfil("router"))
+            self.perfil = self.llm.perfil
             self.prompt = prompt_router
         except Exception as e:
             raise EnvironmentError("A variável GROQ_API_KEY não está configurada.") from e
@@ -16,6 +17,7 @@ class Agent_router():
     def route_intent(self, message: str) -> str:
         """
         Gera uma resposta simples da IA para uma única mensagem do usuário, ou retorna a função a ser chamada.
+        A saída é sempre um dos rótulos de ROTAS_ROUTER (perfil "router", formato enum).
         
         :param message: O histórico completo da conversa como uma string.
         :return: A string de resposta (texto ou chamada de função).
@@ -33,12 +35,8 @@ class Agent_router():
         ]
         
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=mensagens,
-                model="llama-3.3-70b-versatile",
-                temperature=0.0 , 
-            )
-            return chat_completion.choices[0].message.content
+            chat_completion = self.llm.completar(mensagens)
+            return self.perfil.interpretar(chat_completion.choices[0].message.content)
             
         except Exception as e:
             logger.error(f"Erro CRÍTICO no Agent_router (Groq): {e}", exc_info=True)
@@ -1,29 +1,78 @@
+import importlib
+import logging 
+
 from services.redis_client import update_session_state
 
-from core_ia.agents.agent_register import Agent_register
-from core_ia.agents.agent_date import Agent_date
-from core_ia.agents.agent_router import Agent_router
-from core_ia.agents.agent_consul_cancel import Agent_cancel
-from core_ia.agents.agent_info import Agent_info
 from core_ia.utils.user_data_service import get_user_name_from_db
-import logging 
+from services.worker_metrics import medir_processamento
 
 logger = logging.getLogger(__name__)
 
 REROUTE_SIGNAL = "__FORCE_ROUTE_INTENT__" 
 MENSAGEM_ERRO_SUPORTE = "Desculpe, ocorreu um erro técnico inesperado no nosso sistema de IA. Por favor, entre em contato diretamente com nosso suporte."
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# CARREGAMENTO SOB DEMANDA DOS AGENTES
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# Os módulos dos agentes importam groq (e o agente de data, o Google Calendar).
+# Importar e instanciar tudo no boot atrasa a réplica em começar a consumir a fila;
+# cada agente é importado/criado no primeiro uso e reaproveitado depois.
+
+AGENTES = {
+    'registration_agent': ('core_ia.agents.agent_register', 'Agent_register'),
+    'date_agent': ('core_ia.agents.agent_date', 'Agent_date'),
+    'router_agent': ('core_ia.agents.agent_router', 'Agent_router'),
+    'agent_consul_cancel': ('core_ia.agents.agent_consul_cancel', 'Agent_cancel'),
+    'agent_info': ('core_ia.agents.agent_info', 'Agent_info'),
+}
+
+def aquecer_modulos_agentes():
+    """Importa os módulos dos agentes (sem instanciar). Seguro em thread de fundo."""
+    for nome_modulo, _ in AGENTES.values():
+        try:
+            importlib.import_module(nome_modulo)
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao pré-carregar {nome_modulo}: {e}")
+            return
+    logger.info("🔥 Módulos dos agentes pré-carregados.")
+
 class agent_service(): 
     """
     Serviço de IA minimalista. Atua como proxy entre o Worker e o Roteador de Agentes.
     Gerencia o estado e formata o histórico para a API Groq.
     """
     def __init__(self):
-        self.registration_agent = Agent_register()
-        self.date_agent = Agent_date(router_agent_instance=self) 
-        self.router_agent = Agent_router()
-        self.agent_consul_cancel = Agent_cancel()
-        self.agent_info = Agent_info()
+        self._agentes = {}
+
+    def _agente(self, atributo: str):
+        agente = self._agentes.get(atributo)
+        if agente is None:
+            nome_modulo, nome_classe = AGENTES[atributo]
+            classe = getattr(importlib.import_module(nome_modulo), nome_classe)
+            agente = classe(router_agent_instance=self) if atributo == 'date_agent' else classe()
+            self._agentes[atributo] = agente
+        return agente
+
+    @property
+    def registration_agent(self):
+        return self._agente('registration_agent')
+
+    @property
+    def date_agent(self):
+        return self._agente('date_agent')
+
+    @property
+    def router_agent(self):
+        return self._agente('router_agent')
+
+    @property
+    def agent_consul_cancel(self):
+        return self._agente('agent_consul_cancel')
+
+    @property
+    def agent_info(self):
+        return self._agente('agent_info')
         
     def router(self, history_str: str, chat_id: str, step_decode: str = None, reroute_signal: str = None) -> str:
         """
@@ -43,29 +92,36 @@ class agent_service():
             if user_name:
                 if step_decode: 
                     if step_decode in ['AGENT_DATE_SEARCH', 'AGENT_DATE_CONFIRM']:
-                        response = self.date_agent.generate_date(step_decode, history_str, chat_id, user_name)
+                        with medir_processamento('date', step_decode):
+                            response = self.date_agent.generate_date(step_decode, history_str, chat_id, user_name)
                     
                     elif step_decode == 'AGENT_CAN_VERIF':
-                        response = self.agent_consul_cancel.generate_cancel(history_str, chat_id)
+                        with medir_processamento('cancel', step_decode):
+                            response = self.agent_consul_cancel.generate_cancel(history_str, chat_id)
                     return response
                         
                 else: 
-                    response = self.router_agent.route_intent(history_str)
+                    with medir_processamento('router', None):
+                        response = self.router_agent.route_intent(history_str)
                     if response == 'ativar_agent_atendimento_humano':
                         update_session_state(chat_id, registration_step='HUMANE_SERVICE')
                         return "Ok, solicitação detectada com sucesso. Um de nossos agentes entrará em contato com você em breve. A partir de agora, nosso bot LLM não processará mais suas mensagens."
                     if response == 'ativar_agent_marc':
                         update_session_state(chat_id, registration_step='AGENT_DATE_SEARCH')
-                        response = self.date_agent.generate_date('AGENT_DATE_SEARCH', history_str, chat_id, user_name)
+                        with medir_processamento('date', 'AGENT_DATE_SEARCH'):
+                            response = self.date_agent.generate_date('AGENT_DATE_SEARCH', history_str, chat_id, user_name)
                         
                     elif response == 'ativar_agent_ver_cancel':
                         update_session_state(chat_id, registration_step='AGENT_CAN_VERIF')
-                        response = self.agent_consul_cancel.generate_cancel(history_str, chat_id)
+                        with medir_processamento('cancel', 'AGENT_CAN_VERIF'):
+                            response = self.agent_consul_cancel.generate_cancel(history_str, chat_id)
                     elif response == 'ativar_agent_info':
-                        response = self.agent_info.generate_info(history_str, user_name)
+                        with medir_processamento('info', None):
+                            response = self.agent_info.generate_info(history_str, user_name)
                     return response
             else:      
-                response = self.registration_agent.generate_register(history_str, chat_id)
+                with medir_processamento('register', None):
+                    response = self.registration_agent.generate_register(history_str, chat_id)
 
             return response
             
@@ -0,0 +1,234 @@
+import contextvars
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import groq
+
+from core_ia.services_agents.llm_profiles import PerfilLLM
+from services.tracing import rastrear_cliente_groq, registrar_span
+from services.worker_metrics import LLM_CHAMADAS
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CLIENTE LLM: PRAZO POR CHAMADA, HEDGE, RETRY COM JITTER E MODELO RESERVA
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# Uma chamada `completar` nunca passa de perfil.deadline_s:
+#   1. Modelo principal. Se não responder até o p{LLM_HEDGE_PERCENTIL} das latências
+#      recentes do modelo, dispara uma 2ª requisição idêntica (hedge) e usa a primeira
+#      resposta que chegar.
+#   2. 429/5xx/timeout/conexão -> nova tentativa com backoff exponencial + jitter
+#      (respeita Retry-After), até LLM_MAX_TENTATIVAS por modelo.
+#   3. Esgotado o principal (ou LLM_FRACAO_PRINCIPAL do prazo), segue para perfil.fallback.
+# O caminho que serviu a resposta vai para o span "llm.completar" e para a métrica
+# whatsapp_llm_chamadas_total{agente, caminho}, e fica em `ClienteLLM.ultimo_caminho`.
+#
+# As requisições rodam num pool compartilhado com o contexto copiado, então o span
+# "groq.chat_completion" (rastrear_cliente_groq) continua dentro do trace da mensagem.
+# Uma requisição abandonada (perdeu o hedge ou estourou o prazo) é cancelada se ainda
+# estiver na fila; se já começou, termina sozinha, limitada pelo timeout HTTP passado a ela.
+# Por isso o pool (LLM_POOL_THREADS) fica bem acima de 2x as chamadas simultâneas, e o
+# hedge não é disparado com o pool cheio (só aumentaria a fila) nem em chamadas com
+# `tools` (respostas de tool call são mais longas e o hedge dobraria o custo delas).
+
+LLM_MAX_TENTATIVAS = int(os.environ.get('LLM_MAX_TENTATIVAS', 3))
+LLM_BACKOFF_BASE_S = float(os.environ.get('LLM_BACKOFF_BASE_S', 0.5))
+LLM_BACKOFF_MAX_S = float(os.environ.get('LLM_BACKOFF_MAX_S', 4.0))
+LLM_FRACAO_PRINCIPAL = float(os.environ.get('LLM_FRACAO_PRINCIPAL', 0.6))
+
+LLM_HEDGE_ATIVO = os.environ.get('LLM_HEDGE_ATIVO', 'true').lower() == 'true'
+LLM_HEDGE_PERCENTIL = float(os.environ.get('LLM_HEDGE_PERCENTIL', 95))
+LLM_HEDGE_LIMIAR_INICIAL_S = float(os.environ.get('LLM_HEDGE_LIMIAR_INICIAL_S', 4.0))
+LLM_HEDGE_AMOSTRAS_MIN = 20
+LLM_JANELA_LATENCIAS = 200
+
+STATUS_RETENTAVEIS = {408, 409, 429}
+
+LLM_POOL_THREADS = int(os.environ.get('LLM_POOL_THREADS', 32))
+_pool = ThreadPoolExecutor(max_workers=LLM_POOL_THREADS, thread_name_prefix="llm")
+
+class PrazoEsgotado(TimeoutError):
+    """Nenhuma resposta do LLM dentro do prazo da chamada."""
+
+class _Latencias:
+    """Janela das latências de sucesso por modelo (base do limiar de hedge)."""
+
+    def __init__(self):
+        self._por_modelo: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, modelo: str, segundos: float):
+        with self._lock:
+            self._por_modelo.setdefault(modelo, deque(maxlen=LLM_JANELA_LATENCIAS)).append(segundos)
+
+    def limiar_hedge(self, modelo: str) -> float:
+        with self._lock:
+            amostras = sorted(self._por_modelo.get(modelo, ()))
+        if len(amostras) < LLM_HEDGE_AMOSTRAS_MIN:
+            return LLM_HEDGE_LIMIAR_INICIAL_S
+        posicao = max(0, min(len(amostras) - 1, math.ceil(LLM_HEDGE_PERCENTIL / 100 * len(amostras)) - 1))
+        return amostras[posicao]
+
+latencias = _Latencias()
+
+class _Ocupacao:
+    """Requisições submetidas ao pool e ainda não concluídas (em execução ou na fila)."""
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def entrar(self):
+        with self._lock:
+            self.total += 1
+
+    def sair(self, _futuro=None):
+        with self._lock:
+            self.total -= 1
+
+    def livre(self) -> bool:
+        with self._lock:
+            return self.total < LLM_POOL_THREADS
+
+ocupacao = _Ocupacao()
+
+def _status_http(erro: Exception) -> int | None:
+    return getattr(erro, 'status_code', None)
+
+def retentavel(erro: Exception) -> bool:
+    """429/5xx/408/409, timeout ou falha de conexão: vale tentar de novo."""
+    if isinstance(erro, (PrazoEsgotado, groq.APIConnectionError)):
+        return True
+    status = _status_http(erro)
+    return status is not None and (status in STATUS_RETENTAVEIS or status >= 500)
+
+def espera_backoff(tentativa: int, erro: Exception | None = None) -> float:
+    """Full jitter: uniforme em [0, min(max, base * 2^(tentativa-1))]; Retry-After tem prioridade."""
+    resposta = getattr(erro, 'response', None)
+    retry_after = getattr(resposta, 'headers', {}).get('retry-after') if resposta is not None else None
+    try:
+        if retry_after:
+            return min(float(retry_after), LLM_BACKOFF_MAX_S)
+    except ValueError:
+        pass
+    return random.uniform(0, min(LLM_BACKOFF_MAX_S, LLM_BACKOFF_BASE_S * 2 ** (tentativa - 1)))
+
+class ClienteLLM:
+    """
+    Cliente Groq de um agente, com a política de prazo/hedge/retry/fallback do perfil.
+    O retry do SDK fica desligado (max_retries=0): a política é toda daqui.
+    """
+
+    def __init__(self, agente: str, perfil: PerfilLLM, client=None):
+        self.agente = agente
+        self.perfil = perfil
+        self.client = client or groq.Groq(api_key=os.environ.get("GROQ_API_KEY"), max_retries=0)
+        rastrear_cliente_groq(self.client, agente=agente)
+        self.ultimo_caminho = None
+
+    def completar(self, mensagens: list, **extras):
+        """
+        `chat.completions.create` com os parâmetros do perfil (+ extras, ex: tools).
+
+        :raises PrazoEsgotado: nenhum modelo respondeu dentro de perfil.deadline_s
+        :raises groq.APIStatusError: erro não retentável (ex: 400) ou última falha dos modelos
+        """
+        inicio_ns = time.time_ns()
+        inicio = time.monotonic()
+        prazo_final = inicio + self.perfil.deadline_s
+        modelos = [self.perfil.modelo] + ([self.perfil.fallback] if self.perfil.fallback else [])
+
+        tentativas, ultimo_erro, caminho, modelo = 0, None, 'falha', self.perfil.modelo
+        try:
+            for indice, modelo in enumerate(modelos):
+                ultimo_modelo = indice == len(modelos) - 1
+                prazo_modelo = prazo_final if ultimo_modelo else inicio + self.perfil.deadline_s * LLM_FRACAO_PRINCIPAL
+
+                for tentativa in range(1, LLM_MAX_TENTATIVAS + 1):
+                    if time.monotonic() >= prazo_modelo:
+                        break
+                    tentativas += 1
+                    try:
+                        resposta, hedge = self._com_hedge(modelo, mensagens, extras, prazo_modelo)
+                    except Exception as e:
+                        if not retentavel(e) and _status_http(e) != 404:
+                            raise
+                        ultimo_erro = e
+                        logger.warning(
+                            f"⚠️ LLM {self.agente}/{modelo} falhou (tentativa {tentativa}): {type(e).__name__}: {e}"
+                        )
+                        if _status_http(e) == 404:
+                            break  # modelo inexistente/desativado: direto para o reserva
+                        espera = espera_backoff(tentativa, e)
+                        if time.monotonic() + espera >= prazo_modelo:
+                            break
+                        time.sleep(espera)
+                        continue
+
+                    if indice > 0:
+                        caminho = 'fallback'
+                    elif hedge:
+                        caminho = 'hedge'
+                    else:
+                        caminho = 'primario' if tentativa == 1 else 'retry'
+                    return resposta
+
+            raise ultimo_erro or PrazoEsgotado(f"LLM {self.agente} sem resposta em {self.perfil.deadline_s}s")
+        finally:
+            self.ultimo_caminho = caminho
+            LLM_CHAMADAS.labels(agente=self.agente, caminho=caminho).inc()
+            registrar_span(
+                "llm.completar", inicio_ns, time.time_ns(),
+                agente=self.agente, perfil=self.perfil.nome, caminho=caminho, modelo=modelo, tentativas=tentativas,
+            )
+            if caminho not in ('primario', 'falha'):
+                logger.info(f"🔁 LLM {self.agente} servido via {caminho} ({modelo}, {tentativas} tentativa(s)).")
+
+    def _requisitar(self, parametros: dict, timeout: float):
+        inicio = time.monotonic()
+        resposta = self.client.chat.completions.create(**parametros, timeout=timeout)
+        latencias.registrar(parametros['model'], time.monotonic() - inicio)
+        return resposta
+
+    def _submeter(self, parametros: dict, prazo: float):
+        contexto = contextvars.copy_context()
+        ocupacao.entrar()
+        futuro = _pool.submit(contexto.run, self._requisitar, parametros, max(prazo - time.monotonic(), 0.1))
+        futuro.add_done_callback(ocupacao.sair)
+        return futuro
+
+    def _com_hedge(self, modelo: str, mensagens: list, extras: dict, prazo: float):
+        """:return: (resposta, veio_do_hedge)"""
+        parametros = {**self.perfil.parametros(), **extras, "model": modelo, "messages": mensagens}
+        principal = self._submeter(parametros, prazo)
+        pendentes = {principal}
+
+        if LLM_HEDGE_ATIVO and "tools" not in extras:
+            limiar = latencias.limiar_hedge(modelo)
+            feitos, _ = wait(pendentes, timeout=min(limiar, max(prazo - time.monotonic(), 0)))
+            if not feitos and prazo - time.monotonic() > 0 and ocupacao.livre():
+                logger.info(f"⏱️ LLM {self.agente}/{modelo} acima de {limiar:.2f}s: disparando requisição de hedge.")
+                pendentes.add(self._submeter(parametros, prazo))
+
+        erro = None
+        try:
+            while pendentes:
+                feitos, pendentes = wait(pendentes, timeout=max(prazo - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+                if not feitos:
+                    break
+                for futuro in feitos:
+                    if futuro.exception() is None:
+                        return futuro.result(), futuro is not principal
+                    erro = futuro.exception()
+        finally:
+            for futuro in pendentes:
+                futuro.cancel()  # só tem efeito se ainda estiver na fila do pool
+
+        raise erro or PrazoEsgotado(f"LLM {self.agente}/{modelo} sem resposta no prazo")
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PERFIS DE LLM POR AGENTE (modelo, max_tokens, temperatura, formato da resposta)
+# ═══════════════════════════════════════════════════════════════════════════════
+#
+# Modelo pequeno e rápido para roteamento/classificação (saída = um rótulo); modelo
+# grande para os agentes com tool calling e texto ao usuário. Cada perfil tem ainda o
+# prazo total da chamada e o modelo reserva usados por llm_client.ClienteLLM.
+# Sobrescritas por ambiente:
+#   LLM_MODELO_RAPIDO / LLM_MODELO_GRANDE / LLM_MODELO_FALLBACK  -> modelos de cada camada
+#   LLM_PERFIL_<AGENTE>_MODELO / _MAX_TOKENS / _TEMPERATURA / _DEADLINE_S  -> ajuste de um perfil
+#
+# Formatos:
+#   "texto" -> resposta livre
+#   "json"  -> response_format json_object (o prompt precisa pedir JSON)
+#   "enum"  -> texto curto normalizado para um dos `opcoes` (ou `padrao` se nada bater)
+
+MODELO_RAPIDO = os.environ.get('LLM_MODELO_RAPIDO', 'llama-3.1-8b-instant')
+MODELO_GRANDE = os.environ.get('LLM_MODELO_GRANDE', 'llama-3.3-70b-versatile')
+MODELO_FALLBACK = os.environ.get('LLM_MODELO_FALLBACK', 'llama-3.1-8b-instant')
+
+ROTAS_ROUTER = (
+    'ativar_agent_marc',
+    'ativar_agent_ver_cancel',
+    'ativar_agent_atendimento_humano',
+    'ativar_agent_info',
+)
+ROTA_PADRAO = 'ativar_agent_info'
+
+FORMATOS = ("texto", "json", "enum")
+
+class PerfilLLM:
+    """Parâmetros de chamada de um agente ao LLM."""
+
+    def __init__(self, nome: str, modelo: str, max_tokens: int, temperatura: float = 0.0,
+                 formato: str = "texto", opcoes: tuple = (), padrao: str | None = None,
+                 deadline_s: float = 25.0, fallback: str | None = None):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de resposta desconhecido: {formato}")
+        self.nome = nome
+        self.modelo = modelo
+        self.max_tokens = max_tokens
+        self.temperatura = temperatura
+        self.formato = formato
+        self.opcoes = opcoes
+        self.padrao = padrao
+        self.deadline_s = deadline_s
+        self.fallback = fallback if fallback != modelo else None
+
+    def com(self, **alteracoes) -> "PerfilLLM":
+        """Cópia com campos alterados (ex: variantes na avaliação offline)."""
+        campos = {k: getattr(self, k) for k in ("nome", "modelo", "max_tokens", "temperatura", "formato", "opcoes", "padrao",
+                                                "deadline_s", "fallback")}
+        campos.update(alteracoes)
+        return PerfilLLM(**campos)
+
+    def parametros(self) -> dict:
+        """kwargs para `client.chat.completions.create` (sem messages/tools)."""
+        parametros = {
+            "model": self.modelo,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperatura,
+        }
+        if self.formato == "json":
+            parametros["response_format"] = {"type": "json_object"}
+        return parametros
+
+    def interpretar(self, conteudo: str | None):
+        """Converte a resposta bruta conforme o formato (enum fora das opções -> padrao)."""
+        if self.formato == "json":
+            try:
+                return json.loads(conteudo or "{}")
+            except json.JSONDecodeError:
+                logger.warning(f"⚠️ Perfil {self.nome}: resposta não é JSON válido: {conteudo!r}")
+                return {}
+        if self.formato == "enum":
+            texto = (conteudo or "").strip().strip("`'\".").strip()
+            if texto in self.opcoes:
+                return texto
+            # Modelo pequeno às vezes cerca o rótulo com texto: aceita se houver exatamente um
+            encontrados = [opcao for opcao in self.opcoes if opcao in (conteudo or "")]
+            if len(encontrados) == 1:
+                return encontrados[0]
+            logger.warning(f"⚠️ Perfil {self.nome}: rótulo inválido {conteudo!r}, usando {self.padrao}.")
+            return self.padrao
+        return conteudo
+
+    def __repr__(self):
+        return f"PerfilLLM({self.nome!r}, modelo={self.modelo!r}, max_tokens={self.max_tokens})"
+
+def _do_ambiente(perfil: PerfilLLM) -> PerfilLLM:
+    prefixo = f"LLM_PERFIL_{perfil.nome.upper()}_"
+    alteracoes = {}
+    if os.environ.get(prefixo + "MODELO"):
+        alteracoes["modelo"] = os.environ[prefixo + "MODELO"]
+    if os.environ.get(prefixo + "MAX_TOKENS"):
+        alteracoes["max_tokens"] = int(os.environ[prefixo + "MAX_TOKENS"])
+    if os.environ.get(prefixo + "TEMPERATURA"):
+        alteracoes["temperatura"] = float(os.environ[prefixo + "TEMPERATURA"])
+    if os.environ.get(prefixo + "DEADLINE_S"):
+        alteracoes["deadline_s"] = float(os.environ[prefixo + "DEADLINE_S"])
+    return perfil.com(**alteracoes) if alteracoes else perfil
+
+PERFIS = {
+    perfil.nome: _do_ambiente(perfil)
+    for perfil in (
+        # Só emite um rótulo de ROTAS_ROUTER: modelo pequeno, poucos tokens
+        PerfilLLM("router", MODELO_RAPIDO, max_tokens=16, formato="enum", opcoes=ROTAS_ROUTER, padrao=ROTA_PADRAO,
+                  deadline_s=8.0, fallback=MODELO_GRANDE),
+        PerfilLLM("info", MODELO_GRANDE, max_tokens=600, fallback=MODELO_FALLBACK),
+        PerfilLLM("register", MODELO_GRANDE, max_tokens=400, temperatura=0.1, fallback=MODELO_FALLBACK),
+        PerfilLLM("date", MODELO_GRANDE, max_tokens=400, fallback=MODELO_FALLBACK),
+        PerfilLLM("cancel", MODELO_GRANDE, max_tokens=400, temperatura=0.1, fallback=MODELO_FALLBACK),
+    )
+}
+
+def perfil(nome: str) -> PerfilLLM:
+    """:raises KeyError: agente sem perfil registrado"""
+    return PERFIS[nome]
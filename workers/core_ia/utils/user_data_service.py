@@ -1,37 +1,88 @@
 import logging
+import threading
 # ⭐️ Dependências Externas (Isso garante que o módulo é independente)
 from core_api.django_api_service import DjangoApiService 
-from services.redis_client import get_user_profile_cache, set_user_profile_cache
+from services.redis_client import (
+    get_user_profile_cache,
+    set_user_profile_cache,
+    set_user_profile_negative_cache,
+    geracao_perfil_cache,
+    is_perfil_nao_encontrado,
+    adquirir_lock_perfil,
+    liberar_lock_perfil,
+    aguardar_user_profile_cache,
+)
 
 logger = logging.getLogger(__name__)
 
+# Locks "listrados" por chat_id: coalescem misses concorrentes dentro do processo sem crescer sem limite
+_LOCKS_LOCAIS = [threading.Lock() for _ in range(64)]
+
+def _lock_local(chat_id: str) -> threading.Lock:
+    return _LOCKS_LOCAIS[hash(chat_id) % len(_LOCKS_LOCAIS)]
+
+def _resultado_do_cache(cached_user_data: dict) -> dict | None:
+    # Cache negativo: usuário sabidamente não registrado
+    if is_perfil_nao_encontrado(cached_user_data):
+        logger.info("ℹ️ Usuário marcado como NÃO registrado no cache (negativo).")
+        return None
+    return cached_user_data
+
+def _buscar_perfil_no_baas(chat_id: str) -> dict | None:
+    """Busca no BaaS e popula o cache (positivo ou negativo). Erros HTTP não são cacheados."""
+    logger.info(f"⏳ User data para {chat_id} não encontrado no cache. Buscando via HTTP...")
+    # Lida antes do HTTP: se o perfil mudar durante a busca, o resultado não vai para o cache
+    geracao = geracao_perfil_cache(chat_id)
+    db_response = DjangoApiService.get_user_data(chat_id, distinguir_404=True)
+
+    if db_response and db_response.get('status') == 'SUCCESS':
+        # 3. SALVAR NO CACHE
+        set_user_profile_cache(chat_id, db_response, geracao=geracao)
+        logger.info(f"💾 User data de {chat_id} salvo no cache.")
+        return db_response
+
+    if is_perfil_nao_encontrado(db_response):
+        set_user_profile_negative_cache(chat_id, geracao=geracao)
+        logger.info(f"🚫 Usuário {chat_id} não registrado no BaaS (cache negativo gravado).")
+        return None
+
+    logger.warning(f"⚠️ Erro HTTP ao buscar {chat_id} no BaaS.")
+    return None
+
 def get_user_data_full_cached(chat_id: str) -> dict | None:
     """
     Função central que busca dados COMPLETOS (incluindo agendamentos) no BaaS, 
-    utilizando o Redis Cache como primeira linha.
+    utilizando o cache em dois níveis (LRU local + Redis) como primeira linha.
     """
     
-    # 1. TENTAR LER DO CACHE REDIS
+    # 1. TENTAR LER DO CACHE (LOCAL -> REDIS)
     cached_user_data = get_user_profile_cache(chat_id)
     
     if cached_user_data:
-        logger.info(f"✅ User data COMPLETO para {chat_id} ENCONTRADO no Redis Cache.")
-        return cached_user_data
+        logger.info(f"✅ User data COMPLETO para {chat_id} ENCONTRADO no cache.")
+        return _resultado_do_cache(cached_user_data)
 
-    # 2. SE NÃO ESTIVER NO CACHE, BUSCAR NO DJANGO (Cache Miss)
-    logger.info(f"⏳ User data para {chat_id} não encontrado no cache. Buscando via HTTP...")
-    
+    # 2. SE NÃO ESTIVER NO CACHE, BUSCAR NO DJANGO (Cache Miss) COM SINGLE-FLIGHT
     try:
-        db_response = DjangoApiService.get_user_data(chat_id) 
-        
-        if db_response and db_response.get('status') == 'SUCCESS':
-            # 3. SALVAR NO CACHE
-            set_user_profile_cache(chat_id, db_response) 
-            logger.info(f"💾 User data de {chat_id} salvo no cache com TTL de 3h.")
-            return db_response
-            
-        logger.warning(f"⚠️ Usuário {chat_id} não encontrado no BaaS ou erro HTTP.")
-        return None 
+        with _lock_local(chat_id):
+            # Outro thread deste processo pode ter populado o cache enquanto esperávamos
+            cached_user_data = get_user_profile_cache(chat_id)
+            if cached_user_data:
+                return _resultado_do_cache(cached_user_data)
+
+            token = adquirir_lock_perfil(chat_id)
+            if token is None:
+                # Outro processo já está buscando: aguarda o resultado dele
+                cached_user_data = aguardar_user_profile_cache(chat_id)
+                if cached_user_data:
+                    return _resultado_do_cache(cached_user_data)
+                logger.warning(f"⏱️ Timeout aguardando busca concorrente de {chat_id}. Buscando diretamente.")
+
+            try:
+                return _buscar_perfil_no_baas(chat_id)
+            finally:
+                if token:
+                    liberar_lock_perfil(chat_id, token)
 
     except Exception as e:
         logger.error(f"❌ Erro CRÍTICO HTTP ao buscar dados de user para {chat_id}: {e}", exc_info=True)
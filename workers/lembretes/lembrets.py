@@ -5,8 +5,8 @@ from datetime import datetime, timedelta, timezone
 # from workers.lembretes.redis_lembrets import lembrete_ja_enviado
 # from services.metrics import registrar_evento
 
-from google.oauth2. service_account import Credentials
-from googleapiclient.discovery import build
+from services.disponibilidade import GOOGLE_CALENDAR_IDS
+from services.google_calendar import obter_servico_calendar
 from services.waha_api import Waha
 import re
 
@@ -22,16 +22,10 @@ logging.basicConfig(
 logger = logging.getLogger("celery-reminder") 
 
 TTL_TWO_HOURS = 7200
-GOOGLE_CREDENTIALS_PATH = os.getenv("GOOGLE_CREDENTIALS_PATH")
-GOOGLE_CALENDAR_ID = os.getenv("GOOGLE_CALENDAR_ID")
 
 def get_google_service():
-    # ... (sua função) ...
-    credentials = Credentials.from_service_account_file(
-        GOOGLE_CREDENTIALS_PATH,
-        scopes=['https://www.googleapis.com/auth/calendar']
-    )
-    return build('calendar', 'v3', credentials=credentials)
+    # Serviço e credenciais em cache do processo: o tick do Celery não refaz discovery nem token
+    return obter_servico_calendar()
 
 def buscar_eventos(service, antecedencia_horas=2):
     # ... (sua função) ...
@@ -39,15 +33,19 @@ def buscar_eventos(service, antecedencia_horas=2):
     start_check = now + timedelta(hours=antecedencia_horas)
     end_check = start_check + timedelta(minutes=20)
 
-    events_result = service.events().list(
-        calendarId=GOOGLE_CALENDAR_ID,
-        timeMin=start_check.isoformat(),
-        timeMax=end_check.isoformat(),
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
-    
-    return events_result.get('items', [])
+    # Uma listagem por agenda de profissional (GOOGLE_CALENDAR_IDS)
+    eventos = []
+    for calendar_id in GOOGLE_CALENDAR_IDS:
+        events_result = service.events().list(
+            calendarId=calendar_id,
+            timeMin=start_check.isoformat(),
+            timeMax=end_check.isoformat(),
+            singleEvents=True,
+            orderBy='startTime'
+        ).execute()
+        eventos.extend(events_result.get('items', []))
+
+    return eventos
 
 def send_whatsapp_message(phone_number, message):
     # ... (sua função) ...
@@ -2,20 +2,32 @@
 Worker independente para processar fila do WhatsApp - VERSÃO COM FLUXO DO WEBHOOK FUNCIONAL
 """
 
-import json
+import argparse
 import logging
+import os
+import threading
+import time
 
 
 from services.redis_client import (
     add_message_to_history, 
     get_recent_history,
     get_redis_client,
-    check_and_set_message_id,
-    get_session_state, 
+    get_session_step, 
     delete_history
 )
 from services.waha_api import Waha
-from workers.core_ia.ia_core import agent_service
+from services.envelope import decodificar_item_fila, tempo_na_fila_ms
+from services.tracing import iniciar_trace, registrar_span
+from services.idempotency import carimbado_pelo_gateway, registrar_evento_unico, liberar_evento
+from services.worker_metrics import (
+    DUPLICATAS_DESCARTADAS,
+    MENSAGENS_PROCESSADAS,
+    REENFILEIRADAS,
+    iniciar_servidor_metricas,
+    medir_processamento,
+)
+from workers.core_ia.ia_core import agent_service, aquecer_modulos_agentes
 from core_ia.services_agents.tool_reset import REROUTE_COMPLETED_STATUS
 
 logging.basicConfig(
@@ -24,6 +36,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger("whatsapp-worker")
 QUEUE_NAME = "new_user_queue"
+# Pré-carrega os módulos dos agentes (groq, googleapiclient...) em segundo plano após o boot
+PRELOAD_AGENTES = os.environ.get('WORKER_PRELOAD_AGENTES', 'true').lower() == 'true'
 
 class WhatsAppWorker:
     def __init__(self): 
@@ -46,36 +60,54 @@ class WhatsAppWorker:
         Lógica: Decodificar -> Duplicata Check -> Processar -> Re-enfileirar (se falhar).
         """
         try:
-            main_data = json.loads(raw_json_payload.decode('utf-8'))
+            # Envelope compacto do gateway (ou webhook WAHA legado) -> mensagem normalizada
+            main_data, mensagem = decodificar_item_fila(raw_json_payload)
         except Exception as e:
             logger.error(f"❌ Erro ao decodificar JSON: {e}")
+            MENSAGENS_PROCESSADAS.labels(resultado='json_invalido').inc()
             return 
 
+        # Trace ponta a ponta: o trace_id vem do gateway (envelope) e a espera na fila vira um span
+        with iniciar_trace("worker.processar_mensagem", trace_id=mensagem["trace_id"], message_type=mensagem["type"]):
+            espera_ms = tempo_na_fila_ms(mensagem)
+            if espera_ms is not None:
+                agora_ns = time.time_ns()
+                registrar_span("fila.espera", agora_ns - int(espera_ms * 1e6), agora_ns)
+            with medir_processamento('worker', 'total'):
+                self._processar_mensagem(raw_json_payload, main_data, mensagem)
+
+    def _processar_mensagem(self, raw_json_payload, main_data: dict, mensagem: dict):
+        chat_id = message_id = None
+        checado_pelo_gateway = False
         try:
-            message_data = main_data.get("payload", {})
-            chat_id = message_data.get("from")
-            message_text = message_data.get("body", "").strip()
-            message_id = message_data.get("id")
-            message_type = message_data.get("_data", {}).get("type")
+            chat_id = mensagem["chat_id"]
+            message_text = mensagem["body"]
+            message_id = mensagem["message_id"]
+            message_type = mensagem["type"]
             
             if not message_id:
                 logger.warning("Payload sem message_id válido. Descartando (Ex: Notificação de leitura).")
+                MENSAGENS_PROCESSADAS.labels(resultado='sem_id').inc()
                 return 
             
-            if not check_and_set_message_id(message_id):
-                logger.warning(f"⚠️ Duplicata ID: {message_id} descartada pelo Worker (SETNX falhou).")
+            # Idempotência única (DB 3): o gateway já registrou o ID se carimbou o payload
+            checado_pelo_gateway = carimbado_pelo_gateway(main_data, message_id)
+            if not checado_pelo_gateway and not registrar_evento_unico(message_id):
+                logger.warning(f"⚠️ Duplicata ID: {message_id} descartada pelo Worker.")
+                DUPLICATAS_DESCARTADAS.inc()
+                MENSAGENS_PROCESSADAS.labels(resultado='duplicata').inc()
                 return 
             
             if message_type != 'chat':
                 friendly_message = "Olá! Por favor, *envie sua mensagem como texto digitado* para que eu possa processá-la. Não consigo processar áudios, imagens, vídeos ou outros formatos no momento. Obrigado pela compreensão!"
                 self.service_waha.send_whatsapp_message(chat_id, friendly_message)
                 logger.info(f"Tipo de mensagem '{message_type}' detectado e rejeitado para {chat_id}. Worker finalizado.")
+                MENSAGENS_PROCESSADAS.labels(resultado='tipo_nao_suportado').inc()
                 return
             
-            session_data = get_session_state(chat_id)
-            step_bytes = session_data.get(b'registration_step') 
-            active_step_decode = step_bytes.decode('utf-8') if step_bytes else None
+            active_step_decode = get_session_step(chat_id)
             if active_step_decode == 'HUMANE_SERVICE':
+                MENSAGENS_PROCESSADAS.labels(resultado='atendimento_humano').inc()
                 return
             add_message_to_history(chat_id, "User", message_text)
 
@@ -96,20 +128,24 @@ class WhatsAppWorker:
                 self.service_waha.send_whatsapp_message(chat_id, final_bot_response)   
 
                 logger.info(f"Processamento de RE-ROTEAMENTO BEM-SUCEDIDO para {chat_id}. Worker finalizado.")
+                MENSAGENS_PROCESSADAS.labels(resultado='sucesso').inc()
                 return
             
             if response == ACTIVATION_MESSAGE:
                 self.service_waha.send_whatsapp_message(chat_id, response) 
                 delete_history(chat_id) 
                 logger.info(f"Handover para {chat_id} COMPLETO. Histórico DELETADO e ciclo de Worker finalizado.")
+                MENSAGENS_PROCESSADAS.labels(resultado='handover').inc()
                 return
 
             self.service_waha.send_whatsapp_message(chat_id, response)
             add_message_to_history(chat_id, "Bot", response)
             logger.info(f"Processamento para {chat_id} BEM-SUCEDIDO. Histórico Bot SALVO.")
+            MENSAGENS_PROCESSADAS.labels(resultado='sucesso').inc()
             
         except Exception as e:
             logger.error(f"❌ Falha CRÍTICA no processamento para {chat_id}: {e}", exc_info=True)
+            MENSAGENS_PROCESSADAS.labels(resultado='erro').inc()
             MENSAGEM_ERRO_FATAL = "Nosso sistema de comunicação e fila de mensagens está com falhas. Por favor, entre em contato diretamente com nosso suporte."
 
             try:
@@ -118,7 +154,11 @@ class WhatsAppWorker:
             except Exception as waha_e:
                 logger.error(f"Falha ao enviar mensagem de suporte via WAHA: {waha_e}")
 
+            # Sem carimbo do gateway o ID foi registrado aqui: libera para o retry não virar "duplicata"
+            if message_id and not checado_pelo_gateway:
+                liberar_evento(message_id)
             self.redis_client.rpush(QUEUE_NAME, raw_json_payload)
+            REENFILEIRADAS.inc()
             logger.warning(f"♻️ Mensagem {message_id} re-enfileirada para reprocessamento.")
             raise 
 
@@ -136,10 +176,13 @@ class WhatsAppWorker:
 
             except Exception as e:
                 logger.error(f"❌ Erro no loop de escuta (worker): {e}")
-                import time; time.sleep(5)
+                time.sleep(5)
                 
     def run(self):
         logger.info("🚀 WhatsApp Worker INICIADO - Versão Corrigida")
+        iniciar_servidor_metricas(self.redis_client, QUEUE_NAME)
+        if PRELOAD_AGENTES:
+            threading.Thread(target=aquecer_modulos_agentes, name="preload-agentes", daemon=True).start()
         try:
             self.listen_queue()
         except KeyboardInterrupt:
@@ -149,5 +192,15 @@ class WhatsAppWorker:
             raise
 
 if __name__ == "__main__":
-    worker = WhatsAppWorker()
-    worker.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Worker da fila new_user_queue.")
+    parser.add_argument('--perfil-inicializacao', action='store_true',
+                        help="mede o tempo de import/criação do worker por módulo (-X importtime) e sai")
+    parser.add_argument('--top', type=int, default=25)
+    args = parser.parse_args()
+
+    if args.perfil_inicializacao:
+        from services.startup_profile import imprimir_perfil, perfilar_inicializacao
+        imprimir_perfil(perfilar_inicializacao("whatsapp_worker", "WhatsAppWorker", top=args.top))
+    else:
+        worker = WhatsAppWorker()
+        worker.run()
\ No newline at end of file